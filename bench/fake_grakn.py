@@ -0,0 +1,362 @@
+"""In-memory stand-in for the Grakn client API used by the loaders.
+
+Implements just enough of `GraknClient` / `Session` / transaction /
+concept API for `src/migrate.py` and `src/ontology.py` to run without a
+server. Every call that would be a gRPC request counts as a round trip,
+and `commit()` sleeps for a configurable latency, so loaders can be
+compared by round trips per row and by wall clock time.
+
+Nothing is stored apart from the schema labels, queries are not
+evaluated: `define` records the labels it defines and `undefine` drops
+them, `match $x sub <type>; get;` returns them, `match $x sub $y; get;`
+and `match $x datatype <name>; get;` describe them, any other `match ...
+get` returns no answers and `insert` returns a single answer binding
+every inserted variable to a new concept.
+
+"""
+import collections
+import itertools
+import re
+import threading
+import time
+
+from grakn.client import DataType
+
+ATTRIBUTE_TYPES = {
+    'name': DataType.STRING,
+    'status': DataType.STRING,
+    'value': DataType.STRING,
+    'campaign-id': DataType.LONG,
+    'campaign-name': DataType.STRING,
+    'aw-campaign-type': DataType.STRING,
+    'adgroup-id': DataType.LONG,
+    'adgroup-name': DataType.STRING,
+    'aw-adgroup-type': DataType.STRING,
+    'criterion-id': DataType.LONG,
+    'criterion-name': DataType.STRING,
+    'crit-key': DataType.LONG,
+    'parent-id': DataType.LONG,
+    'partition-type': DataType.STRING,
+    'dimension-type': DataType.STRING,
+    'dimension-value': DataType.STRING,
+    'item-id': DataType.STRING,
+    'title': DataType.STRING,
+    'depth': DataType.LONG,
+}
+
+_ids = itertools.count(1)
+_insert = re.compile(r'^insert$', re.M)
+_insert_vars = re.compile(r'(\$t\d+)\b')
+_define = re.compile(r'^([\w-]+) sub ([\w-]+)', re.M)
+_match_sub = re.compile(r'^match \$x sub ([\w-]+); get;$')
+_match_datatype = re.compile(r'^match \$x datatype (\w+); get;$')
+
+
+class RoundTrips:
+    """Thread-safe round trip counter, by request kind."""
+
+    def __init__(self):
+        self.counts = collections.Counter()
+        self._lock = threading.Lock()
+
+    def __call__(self, kind: str):
+        with self._lock:
+            self.counts[kind] += 1
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def reset(self):
+        with self._lock:
+            self.counts.clear()
+
+
+class FakeServer:
+    """Shared state of all fake clients: schema labels and counters."""
+
+    def __init__(self, commit_latency: float = 0.0):
+        self.commit_latency = commit_latency
+        self.round_trips = RoundTrips()
+        self.attribute_types = dict(ATTRIBUTE_TYPES)
+        self.types = {label: 'attribute' for label in ATTRIBUTE_TYPES}
+        self.keyspaces = set()
+
+    def define(self, query: str):
+        for label, sup in _define.findall(query):
+            self.types[label] = self.types.get(sup, sup)
+
+    def undefine(self, query: str):
+        for label, _ in _define.findall(query):
+            self.types.pop(label, None)
+
+    def meta_type(self, label: str) -> str:
+        return self.types.get(label, 'entity')
+
+    def client(self, uri: str = 'localhost:48555') -> 'FakeClient':
+        return FakeClient(uri, server=self)
+
+
+class FakeConcept:
+
+    def __init__(self, tx, label=None, kind='type', value=None):
+        self._tx = tx
+        self._label = label
+        self._kind = kind
+        self._value = value
+        self.id = f'V{next(_ids)}'
+
+    def _rt(self, name):
+        self._tx.server.round_trips(f'concept.{name}')
+
+    def label(self):
+        self._rt('label')
+        return self._label
+
+    def value(self):
+        self._rt('value')
+        return self._value
+
+    def data_type(self):
+        self._rt('data_type')
+        return self._tx.server.attribute_types.get(self._label)
+
+    def type(self):
+        self._rt('type')
+        return FakeConcept(self._tx, self._label)
+
+    def sup(self):
+        self._rt('sup')
+        return FakeConcept(self._tx, self._tx.server.meta_type(self._label))
+
+    def is_abstract(self):
+        self._rt('is_abstract')
+        return False
+
+    def create(self, value=None):
+        self._rt('create')
+        kind = 'attribute' if value is not None else 'thing'
+        return FakeConcept(self._tx, self._label, kind, value)
+
+    def is_thing(self):
+        return self._kind in ('thing', 'attribute')
+
+    def is_attribute_type(self):
+        return self._label in self._tx.server.attribute_types
+
+    def is_entity_type(self):
+        return self._kind == 'type' and not self.is_attribute_type()
+
+    def is_relation_type(self):
+        return False
+
+    def is_rule(self):
+        return False
+
+    def keys(self):
+        self._rt('keys')
+        return iter(())
+
+    def attributes(self):
+        self._rt('attributes')
+        return iter(())
+
+    def playing(self):
+        self._rt('playing')
+        return iter(())
+
+    def roles(self):
+        self._rt('roles')
+        return iter(())
+
+    def _call(self, *args, **kwargs):
+        return self
+
+    def __getattr__(self, name):
+        # has, plays, relates, sup, is_abstract, assign, ...
+        if name.startswith('_'):
+            raise AttributeError(name)
+        self._rt(name)
+        return self._call
+
+
+class FakeAnswer:
+
+    def __init__(self, concepts):
+        self._concepts = concepts
+
+    def map(self):
+        return self._concepts
+
+    def get(self, var):
+        return self._concepts[var]
+
+
+class FakeTransaction:
+
+    def __init__(self, session, write: bool):
+        self.session = session
+        self.server = session.server
+        self.write = write
+        self.server.round_trips('transaction.open')
+        # one concept per schema label, as in a real transaction
+        self._types = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _rt(self, name):
+        self.server.round_trips(f'tx.{name}')
+
+    def _type(self, label):
+        if label not in self._types:
+            self._types[label] = FakeConcept(self, label)
+        return self._types[label]
+
+    def get_schema_concept(self, label):
+        self._rt('get_schema_concept')
+        return FakeConcept(self, label)
+
+    def get_concept(self, concept_id):
+        self._rt('get_concept')
+        return FakeConcept(self, kind='thing')
+
+    def put_attribute_type(self, label, data_type):
+        self._rt('put_attribute_type')
+        self.server.attribute_types[label] = data_type
+        return FakeConcept(self, label)
+
+    def put_entity_type(self, label):
+        self._rt('put_entity_type')
+        return FakeConcept(self, label)
+
+    def put_relation_type(self, label):
+        self._rt('put_relation_type')
+        return FakeConcept(self, label)
+
+    def put_role(self, label):
+        self._rt('put_role')
+        return FakeConcept(self, label)
+
+    def query(self, query: str):
+        self._rt('query')
+        if query.startswith('define'):
+            self.server.define(query)
+            return iter(())
+        if query.startswith('undefine'):
+            self.server.undefine(query)
+            return iter(())
+
+        match_sub = _match_sub.match(query)
+        if match_sub:
+            kind = match_sub.group(1)
+            return iter([
+                FakeAnswer({'x': FakeConcept(self, label)})
+                for label, meta in self.server.types.items()
+                if meta == kind])
+
+        if query == 'match $x sub $y; get;':
+            # `sub` is reflexive and transitive
+            types = dict(
+                self.server.types, thing='thing', entity='thing',
+                relation='thing', attribute='thing')
+            return iter([
+                FakeAnswer({'x': self._type(label), 'y': self._type(sup)})
+                for label, meta in types.items()
+                for sup in dict.fromkeys((label, meta, 'thing'))])
+
+        match_datatype = _match_datatype.match(query)
+        if match_datatype:
+            name = match_datatype.group(1)
+            return iter([
+                FakeAnswer({'x': self._type(label)})
+                for label, data_type in self.server.attribute_types.items()
+                if data_type.name.lower() == name])
+
+        insert = _insert.search(query)
+        if insert is None:
+            return iter(())
+        return iter([FakeAnswer({
+            var[1:]: FakeConcept(self, kind='thing')
+            for var in _insert_vars.findall(query, insert.end())})])
+
+    def commit(self):
+        self._rt('commit')
+        if self.server.commit_latency:
+            time.sleep(self.server.commit_latency)
+
+    def close(self):
+        pass
+
+
+class FakeTransactionBuilder:
+
+    def __init__(self, session):
+        self.session = session
+
+    def read(self):
+        return FakeTransaction(self.session, write=False)
+
+    def write(self):
+        return FakeTransaction(self.session, write=True)
+
+
+class FakeSession:
+
+    def __init__(self, server: FakeServer, keyspace: str):
+        self.server = server
+        self.keyspace = keyspace
+        server.keyspaces.add(keyspace)
+        server.round_trips('session.open')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def transaction(self):
+        return FakeTransactionBuilder(self)
+
+    def close(self):
+        pass
+
+
+class FakeKeyspaces:
+
+    def __init__(self, server: FakeServer):
+        self.server = server
+
+    def retrieve(self):
+        self.server.round_trips('keyspaces.retrieve')
+        return sorted(self.server.keyspaces)
+
+    def delete(self, keyspace):
+        self.server.round_trips('keyspaces.delete')
+        self.server.keyspaces.discard(keyspace)
+
+
+class FakeClient:
+    """Drop-in for `grakn.client.GraknClient`."""
+
+    def __init__(self, uri: str = 'localhost:48555', server=None):
+        self.uri = uri
+        self.server = server or FakeServer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def session(self, keyspace: str) -> FakeSession:
+        return FakeSession(self.server, keyspace)
+
+    def keyspaces(self) -> FakeKeyspaces:
+        return FakeKeyspaces(self.server)
+
+    def close(self):
+        pass
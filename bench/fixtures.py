@@ -0,0 +1,154 @@
+"""Synthetic account DB fixtures on SQLite.
+
+Binds the Adspert account models read by `src/migrate.py` to a SQLite
+database and fills it with a deterministic account of a given size:
+
+* `n` product partitions in trees of 100 per ad group (a root, 9 category
+  subdivisions with 10 brand units each),
+* `n / 100` ad groups in `n / 1000` shopping campaigns,
+* `n` offers over `n / 2` distinct items, i.e. most items are offered in
+  two ad groups, with 3 product dimensions per item.
+
+The database file is named after a hash of this module, so a changed
+fixture is built again instead of reusing a stale file.
+
+"""
+import hashlib
+import os
+
+from peewee import SqliteDatabase
+from peewee import chunked
+
+from adspert.database.models.account import AdGroup
+from adspert.database.models.account import AdwordsOffer
+from adspert.database.models.account import Campaign
+from adspert.database.models.account import ProductDimension
+from adspert.database.models.account import ProductPartition
+
+MODELS = [Campaign, AdGroup, ProductPartition, AdwordsOffer, ProductDimension]
+
+SCALES = {
+    '1k': 1000,
+    '100k': 100000,
+    '1m': 1000000,
+}
+
+PARTITIONS_PER_ADGROUP = 100
+CATEGORIES = 9
+BRANDS = 10
+
+
+def bind(path: str) -> SqliteDatabase:
+    db = SqliteDatabase(path, pragmas={'journal_mode': 'wal'})
+    db.bind(MODELS, bind_refs=False, bind_backrefs=False)
+    return db
+
+
+def campaign_rows(n: int):
+    for c in range(max(1, n // 1000)):
+        yield {
+            Campaign.campaign_id: 1000 + c,
+            Campaign.campaign_name: f'Shopping {c}',
+            Campaign.aw_campaign_type: 'SHOPPING',
+            Campaign.status: 'Active',
+        }
+
+
+def adgroup_rows(n: int):
+    campaigns = max(1, n // 1000)
+    for a in range(max(1, n // PARTITIONS_PER_ADGROUP)):
+        yield {
+            AdGroup.adgroup_id: 100000 + a,
+            AdGroup.adgroup_name: f'Ad Group {a}',
+            AdGroup.campaign_id: 1000 + a % campaigns,
+            AdGroup.status: 'Active',
+            AdGroup.aw_adgroup_type: 'SHOPPING_PRODUCT_ADS',
+        }
+
+
+def partition_rows(n: int):
+    criterion_id = 10 ** 9
+    for a in range(max(1, n // PARTITIONS_PER_ADGROUP)):
+        adgroup_id = 100000 + a
+        root = criterion_id = criterion_id + 1
+        yield {
+            ProductPartition.criterion_id: root,
+            ProductPartition.adgroup_id: adgroup_id,
+            ProductPartition.dimension_type: None,
+            ProductPartition.dimension_value: None,
+            ProductPartition.partition_type: 'Subdivision',
+            ProductPartition.parent_id: None,
+        }
+        for c in range(CATEGORIES):
+            category = criterion_id = criterion_id + 1
+            yield {
+                ProductPartition.criterion_id: category,
+                ProductPartition.adgroup_id: adgroup_id,
+                ProductPartition.dimension_type: 'ProductType',
+                ProductPartition.dimension_value: f'category {c}',
+                ProductPartition.partition_type: 'Subdivision',
+                ProductPartition.parent_id: root,
+            }
+            for b in range(BRANDS):
+                criterion_id += 1
+                yield {
+                    ProductPartition.criterion_id: criterion_id,
+                    ProductPartition.adgroup_id: adgroup_id,
+                    ProductPartition.dimension_type: 'ProductBrand',
+                    ProductPartition.dimension_value: f'brand {b}',
+                    ProductPartition.partition_type: 'Unit',
+                    ProductPartition.parent_id: category,
+                }
+
+
+def offer_rows(n: int):
+    items = max(1, n // 2)
+    adgroups = max(1, n // PARTITIONS_PER_ADGROUP)
+    for o in range(n):
+        # the second offer of an item goes to the next ad group
+        yield {
+            AdwordsOffer.adgroup_id: 100000 + (o + o // items) % adgroups,
+            AdwordsOffer.item_id: f'item-{o % items:08d}',
+        }
+
+
+def dimension_rows(n: int):
+    for i in range(max(1, n // 2)):
+        item_id = f'item-{i:08d}'
+        for dimension_type, value in (
+                ('ProductType', f'category {i % CATEGORIES}'),
+                ('ProductBrand', f'brand {i % BRANDS}'),
+                ('ProductCondition', 'new')):
+            yield {
+                ProductDimension.item_id: item_id,
+                ProductDimension.dimension_type: dimension_type,
+                ProductDimension.dimension_value: value,
+            }
+
+
+def fixture_path(data_dir: str, scale: str) -> str:
+    """The database file of `scale` for the current fixture rows."""
+    with open(__file__, 'rb') as f:
+        digest = hashlib.sha1(f.read()).hexdigest()[:12]
+    return os.path.join(data_dir, f'adw-bench-{scale}-{digest}.sqlite')
+
+
+def create(path: str, n: int) -> SqliteDatabase:
+    """Create (or reuse) the fixture database for `n` partitions."""
+    exists = os.path.exists(path)
+    db = bind(path)
+    if exists:
+        return db
+
+    db.create_tables(MODELS)
+    for model, rows in (
+            (Campaign, campaign_rows(n)),
+            (AdGroup, adgroup_rows(n)),
+            (ProductPartition, partition_rows(n)),
+            (AdwordsOffer, offer_rows(n)),
+            (ProductDimension, dimension_rows(n))):
+        with db.atomic():
+            for chunk in chunked(rows, 100):
+                model.insert_many(chunk).execute()
+
+    return db
@@ -0,0 +1,171 @@
+"""Import throughput benchmarks.
+
+Runs the `src/migrate.py` loaders and `src/ontology.py` `apply_schema`
+against synthetic SQLite fixtures (see `fixtures`) and an in-memory Grakn
+stand-in (see `fake_grakn`), and reports per case:
+
+    rows/s, round trips per row, commits and peak Python memory
+
+Example::
+
+    python bench/run.py --scale 1k 100k --latency-ms 5
+
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), 'src'))
+
+from tabulate import tabulate  # noqa: E402
+
+import fake_grakn  # noqa: E402
+import fixtures  # noqa: E402
+import migrate  # noqa: E402
+import ontology  # noqa: E402
+import pooling  # noqa: E402
+import schema  # noqa: E402
+from source import ReadConfig  # noqa: E402
+from state import StateStore  # noqa: E402
+from writer import BatchConfig  # noqa: E402
+
+KEYSPACE = 'bench'
+
+
+def bench_campaigns(session, batch, read):
+    return migrate.load_campaign_data(
+        session, ('SHOPPING', ), False, batch=batch, read=read).rows
+
+
+def bench_adgroups(session, batch, read):
+    return migrate.load_adgroup_data(session, batch=batch, read=read).rows
+
+
+def bench_partitions(session, batch, read):
+    return migrate.load_product_partition_data(
+        session, batch=batch, read=read).rows
+
+
+def bench_products(session, batch, read):
+    return migrate.load_product_data(session, batch=batch, read=read).rows
+
+
+def bench_partitions_subset(session, batch, read):
+    adgroup_ids = tuple(migrate.select_partition_adgroup_ids()[::2])
+    return migrate.load_product_partition_data(
+        session, adgroup_ids, batch=batch, read=read).rows
+
+
+def bench_products_subset(session, batch, read):
+    adgroup_ids = tuple(migrate.select_partition_adgroup_ids()[::2])
+    return migrate.load_product_data(
+        session, adgroup_ids, batch=batch, read=read).rows
+
+
+def bench_apply_schema(session, batch, read):
+    with contextlib.redirect_stdout(io.StringIO()):
+        ontology.apply_schema(
+            KEYSPACE, 'shopping', snapshot_dir=tempfile.gettempdir())
+    return 1
+
+
+def bench_apply_schema_unchanged(session, batch, read):
+    store = StateStore(':memory:')
+    store.save_schema_fingerprint(
+        'localhost', KEYSPACE, 'shopping',
+        schema.schema_fingerprint(schema.compile_schema('shopping')))
+    ontology.apply_schema(
+        KEYSPACE, 'shopping', store, snapshot_dir=tempfile.gettempdir())
+    return 1
+
+
+def bench_describe(session, batch, read):
+    ontology.describe_schema(
+        KEYSPACE, refresh=True, snapshot_dir=tempfile.gettempdir())
+    return 1
+
+
+CASES = {
+    'campaigns': bench_campaigns,
+    'adgroups': bench_adgroups,
+    'partitions': bench_partitions,
+    'products': bench_products,
+    'partitions_subset': bench_partitions_subset,
+    'products_subset': bench_products_subset,
+    'apply_schema': bench_apply_schema,
+    'apply_schema_unchanged': bench_apply_schema_unchanged,
+    'describe': bench_describe,
+}
+
+
+def run_case(name, server, batch, read):
+    server.round_trips.reset()
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    with server.client().session(keyspace=KEYSPACE) as session:
+        rows = CASES[name](session, batch, read)
+
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    trips = server.round_trips
+    return {
+        'case': name,
+        'rows': rows,
+        'seconds': round(elapsed, 3),
+        'rows/s': round(rows / elapsed) if elapsed else 0,
+        'round trips/row': round(trips.total / rows, 3) if rows else 0,
+        'commits': trips.counts['tx.commit'],
+        'peak MiB': round(peak / 2 ** 20, 1),
+    }
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    '--scale', nargs='*', default=['1k'], choices=fixtures.SCALES)
+parser.add_argument(
+    '--case', dest='cases', nargs='*', default=list(CASES), choices=CASES)
+parser.add_argument('--latency-ms', dest='latency_ms', type=float, default=2)
+parser.add_argument(
+    '--batch-size', dest='batch_size', type=int,
+    default=BatchConfig().size)
+parser.add_argument(
+    '--page-size', dest='page_size', type=int,
+    default=ReadConfig().page_size)
+parser.add_argument(
+    '--data-dir', dest='data_dir', default=tempfile.gettempdir())
+
+
+def main(args):
+    server = fake_grakn.FakeServer(commit_latency=args.latency_ms / 1000)
+    pooling.GraknClient = server.client
+
+    batch = BatchConfig(size=args.batch_size)
+    read = ReadConfig(page_size=args.page_size)
+
+    results = []
+    for scale in args.scale:
+        path = fixtures.fixture_path(args.data_dir, scale)
+        fixtures.create(path, fixtures.SCALES[scale])
+
+        for name in args.cases:
+            result = run_case(name, server, batch, read)
+            results.append(dict(scale=scale, **result))
+            print(
+                f"{scale} {name}: {result['rows']} rows in "
+                f"{result['seconds']}s", file=sys.stderr)
+
+    print(tabulate(results, headers='keys'))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(parser.parse_args()))
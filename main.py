@@ -60,7 +60,7 @@ if __name__ == '__main__':
         'node_type': ShoppingCampaignNode.NodeType.GENDER
     })
 
-    [sc.create_node(d) for d in data_list]
+    sc.create_nodes(data_list)
     sc.show(line_type="ascii-em")
 
     print sc.get_category_level(9)
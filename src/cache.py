@@ -0,0 +1,165 @@
+"""Schema concept caches and concept indexes for the loaders.
+
+Grakn concepts are bound to the transaction they were fetched in, so two
+levels of caching are used:
+
+* `SchemaCache` lives as long as a session and remembers, per label,
+  whether the schema concept exists and which datatype it has.
+* `CachedTransaction` wraps a single transaction (one batch) and answers
+  `data_type` from the session cache, which the Graql compiler needs
+  to render attribute values.
+
+Applying a schema calls `invalidate()`, which drops every session cache
+created before it.
+
+`ConceptIndex` maps key values of a handful of shared instances (e.g. the
+`ProductDimension` per dimension type) to concept ids, so loaders do not
+have to match them per row.
+
+"""
+import logging
+import threading
+import weakref
+from typing import Any
+from typing import Dict
+from typing import Optional
+
+from grakn.client import Session
+
+from graql import Ref
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+
+_generation = 0
+_session_caches = weakref.WeakKeyDictionary()
+
+
+def invalidate():
+    """Forget all cached schema information, e.g. after a schema apply."""
+    global _generation
+    _generation += 1
+    log.debug('Schema caches invalidated.')
+
+
+def session_cache(session: Session) -> 'SchemaCache':
+    """Return the schema cache of `session`, creating it if required."""
+    cache = _session_caches.get(session)
+    if cache is None or cache.generation != _generation:
+        cache = _session_caches[session] = SchemaCache()
+    return cache
+
+
+class SchemaCache:
+    """Schema labels resolved once per session."""
+
+    def __init__(self):
+        self.generation = _generation
+        self.exists: Dict[str, bool] = {}
+        self.data_types: Dict[str, Any] = {}
+
+    def resolve(self, tx, label: str):
+        """Fetch the schema concept `label` from `tx` and remember it."""
+        concept = tx.get_schema_concept(label)
+        self.exists[label] = concept is not None
+        if concept is not None and concept.is_attribute_type():
+            self.data_types[label] = concept.data_type()
+        return concept
+
+
+class CachedTransaction:
+    """Transaction proxy answering attribute datatypes from a cache.
+
+    Everything not overridden here is delegated to the wrapped transaction.
+    """
+
+    def __init__(self, tx, cache: SchemaCache):
+        self.tx = tx
+        self.cache = cache
+
+    def __getattr__(self, name):
+        return getattr(self.tx, name)
+
+    def data_type(self, label: str):
+        """Return the datatype of the attribute type `label`."""
+        try:
+            return self.cache.data_types[label]
+        except KeyError:
+            pass
+
+        if self.cache.exists.get(label) is not False:
+            self.cache.resolve(self.tx, label)
+        try:
+            return self.cache.data_types[label]
+        except KeyError:
+            raise ValueError(f'`{label}` is not an attribute type.')
+
+
+class ConceptIndex:
+    """Key value -> concept id index for the instances of `label`.
+
+    The index is warmed with a single query and afterwards filled in as
+    new instances are created, so no per-row match queries are required.
+    It can be shared between loader threads.
+    """
+
+    def __init__(self, session: Session, label: str, key: str):
+        self.session = session
+        self.label = label
+        self.key = key
+        self._ids: Dict[Any, str] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def warm(self):
+        q = f'match $x isa {self.label}, has {self.key} $k; get;'
+        with self.session.transaction().read() as tx:
+            for answer in tx.query(q):
+                m = answer.map()
+                self._ids[m['k'].value()] = m['x'].id
+            tx.close()
+
+        log.debug(f'Indexed {len(self)} `{self.label}` instances.')
+        return self
+
+    def get(self, value) -> Optional[str]:
+        return self._ids.get(value)
+
+    def natural_key(self, value) -> str:
+        """Natural key of the instance with `value`, see `graql.Ref`."""
+        return f'{self.label}:{value}'
+
+    def ref(self, value, create: bool = False) -> Optional[Ref]:
+        """`Ref` to the instance with `value`, `None` when it is missing
+        and not `create`d."""
+        if create:
+            concept_id = self.get_or_create(value)
+        else:
+            concept_id = self.get(value)
+            if concept_id is None:
+                return None
+        return Ref(concept_id, self.natural_key(value))
+
+    def get_or_create(self, value) -> str:
+        """Return the concept id for `value`, inserting it when missing."""
+        concept_id = self._ids.get(value)
+        if concept_id is not None:
+            return concept_id
+
+        with self._lock:
+            # another thread may have created it in the meantime
+            concept_id = self._ids.get(value)
+            if concept_id is not None:
+                return concept_id
+
+            with self.session.transaction().write() as tx:
+                concept = tx.get_schema_concept(self.label).create()
+                concept.has(tx.get_schema_concept(self.key).create(value))
+                concept_id = concept.id
+                tx.commit()
+
+            self._ids[value] = concept_id
+
+        return concept_id
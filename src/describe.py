@@ -0,0 +1,298 @@
+"""Schema introspection with a local JSON snapshot per keyspace.
+
+`snapshot_schema` reads every type (entities, relations, attributes with
+their keys, attributes, roles played and related) and every rule of a
+keyspace in a single read transaction, instead of a transaction per
+concept, and with a few schema queries over all types instead of concept
+API calls per type. The result is a `SchemaSnapshot` that is saved as JSON (see
+`DEFAULT_SNAPSHOT_DIR`), so describing a schema again does not need the
+server at all. `apply_schema` refreshes the snapshot of the keyspace it
+changed.
+
+"""
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from dataclasses import asdict
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
+
+from grakn.client import Session
+
+import metrics
+from state import DEFAULT_STATE_PATH
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+
+DEFAULT_SNAPSHOT_DIR = os.path.join(
+    os.path.dirname(DEFAULT_STATE_PATH), 'schema')
+
+META_TYPES = ('entity', 'relation', 'attribute')
+META_LABELS = {'thing', 'entity', 'relation', 'attribute', 'rule'}
+DATA_TYPES = ('string', 'long', 'double', 'boolean', 'date')
+
+KIND_NAMES = {
+    'entity': 'an entity',
+    'attribute': 'an attribute',
+    'relation': 'a relation',
+    'rule': 'an inference rule',
+}
+
+
+@dataclass
+class ConceptDescription:
+    label: str
+    kind: str
+    id: Optional[str] = None
+    sup: Optional[str] = None
+    abstract: bool = False
+    data_type: Optional[str] = None
+    keys: List[str] = field(default_factory=list)
+    attributes: List[str] = field(default_factory=list)
+    plays: List[str] = field(default_factory=list)
+    relates: List[str] = field(default_factory=list)
+    when: Optional[str] = None
+    then: Optional[str] = None
+
+
+@dataclass
+class SchemaSnapshot:
+    keyspace: str
+    concepts: Dict[str, ConceptDescription] = field(default_factory=dict)
+    taken_at: float = field(default_factory=time.time)
+
+    def get(self, label: str) -> ConceptDescription:
+        try:
+            return self.concepts[label]
+        except KeyError:
+            raise KeyError(
+                f'`{label}` is not defined in `{self.keyspace}`') from None
+
+    def by_kind(self, kind: str) -> List[ConceptDescription]:
+        return [c for c in self.concepts.values() if c.kind == kind]
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), indent=2, sort_keys=True)
+
+    @classmethod
+    def from_json(cls, data: str) -> 'SchemaSnapshot':
+        d = json.loads(data)
+        d['concepts'] = {
+            label: ConceptDescription(**c)
+            for label, c in d['concepts'].items()}
+        return cls(**d)
+
+
+def _pairs(tx, query: str, concepts: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """The concept ids of `$x` and `$y` in every answer of `query`.
+
+    The concepts are kept in `concepts` by id, so that each label is read
+    once.
+    """
+    pairs = []
+    for answer in tx.query(query):
+        x, y = answer.get('x'), answer.get('y')
+        concepts.setdefault(x.id, x)
+        concepts.setdefault(y.id, y)
+        pairs.append((x.id, y.id))
+    return pairs
+
+
+def _ids(tx, query: str) -> List[str]:
+    return [answer.get('x').id for answer in tx.query(query)]
+
+
+def _describe_types(
+        labels: Dict[str, str],
+        subs: List[Tuple[str, str]],
+        plays: List[Tuple[str, str]],
+        relates: List[Tuple[str, str]],
+        owns: List[Tuple[str, str, str]],
+        abstract: Set[str],
+        data_types: Dict[str, str]) -> List[ConceptDescription]:
+    """Describe every type from the answers of the schema queries."""
+    supers = defaultdict(set)
+    for x, y in subs:
+        supers[x].add(y)
+
+    descs = {}
+    for x in supers:
+        label = labels[x]
+        kinds = [k for k in META_TYPES if k in {labels[y] for y in supers[x]}]
+        if label in META_LABELS or label.startswith('@') or not kinds:
+            continue
+        desc = descs[x] = ConceptDescription(
+            label, kinds[0], id=x, abstract=x in abstract,
+            data_type=data_types.get(x))
+        # `sub` is transitive, the direct super type has the most supers
+        sup = max(supers[x] - {x}, key=lambda y: len(supers[y]), default=None)
+        if sup is not None and labels[sup] not in META_LABELS:
+            desc.sup = labels[sup]
+
+    for x, role in plays:
+        if x in descs and not labels[role].startswith('@'):
+            descs[x].plays.append(labels[role])
+
+    for x, role in relates:
+        if x in descs and not labels[role].startswith('@'):
+            descs[x].relates.append(labels[role])
+
+    for x, has, attribute in owns:
+        if x in descs:
+            descs[x].attributes.append(attribute)
+            if has == 'key':
+                descs[x].keys.append(attribute)
+
+    for desc in descs.values():
+        for values in (desc.keys, desc.attributes, desc.plays, desc.relates):
+            values[:] = sorted(set(values))
+    return sorted(descs.values(), key=lambda d: (d.kind, d.label))
+
+
+def _describe_rule(concept, label: str) -> ConceptDescription:
+    return ConceptDescription(
+        label, 'rule', id=concept.id,
+        when=str(concept.get_when()), then=str(concept.get_then()))
+
+
+def snapshot_schema(session: Session, keyspace: str) -> SchemaSnapshot:
+    """Describe the whole schema of `keyspace` in one read transaction.
+
+    The types are described by a few schema queries over all of them and
+    two per attribute type (its owners and key owners), only the labels
+    and the rule bodies are read per concept.
+    """
+    snapshot = SchemaSnapshot(keyspace)
+    concepts = {}
+    with metrics.timer('schema.snapshot'), \
+            session.transaction().read() as tx:
+        subs = _pairs(tx, 'match $x sub $y; get;', concepts)
+        plays = _pairs(tx, 'match $x plays $y; get;', concepts)
+        relates = _pairs(tx, 'match $x relates $y; get;', concepts)
+        abstract = set(_ids(tx, 'match $x abstract; get;'))
+        data_types = {
+            x: name
+            for name in DATA_TYPES
+            for x in _ids(tx, f'match $x datatype {name}; get;')}
+        labels = {x: concept.label() for x, concept in concepts.items()}
+        owns = [
+            (x, has, labels[a])
+            for a in sorted(data_types, key=labels.get)
+            for has in ('key', 'has')
+            for x in _ids(tx, f'match $x {has} {labels[a]}; get;')]
+
+        for desc in _describe_types(
+                labels, subs, plays, relates, owns, abstract, data_types):
+            snapshot.concepts[desc.label] = desc
+
+        rules = {x for x, y in subs if labels[y] == 'rule'}
+        for x in sorted(rules, key=labels.get):
+            label = labels[x]
+            if label not in META_LABELS:
+                snapshot.concepts[label] = _describe_rule(
+                    concepts[x], label)
+
+    log.info(
+        f'Described {len(snapshot.concepts)} concepts of `{keyspace}`.')
+    return snapshot
+
+
+def snapshot_path(keyspace: str, directory: str = DEFAULT_SNAPSHOT_DIR):
+    return os.path.join(directory, f'{keyspace}.json')
+
+
+def save_snapshot(
+        snapshot: SchemaSnapshot,
+        directory: str = DEFAULT_SNAPSHOT_DIR) -> str:
+    os.makedirs(directory, exist_ok=True)
+    path = snapshot_path(snapshot.keyspace, directory)
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        f.write(snapshot.to_json())
+    os.replace(tmp, path)
+    return path
+
+
+def drop_snapshot(keyspace: str, directory: str = DEFAULT_SNAPSHOT_DIR):
+    try:
+        os.remove(snapshot_path(keyspace, directory))
+    except FileNotFoundError:
+        pass
+
+
+def load_snapshot(
+        keyspace: str,
+        directory: str = DEFAULT_SNAPSHOT_DIR) -> Optional[SchemaSnapshot]:
+    try:
+        with open(snapshot_path(keyspace, directory)) as f:
+            return SchemaSnapshot.from_json(f.read())
+    except FileNotFoundError:
+        return None
+
+
+# ----------------------------------------------------------------------------
+# Formatting
+# ----------------------------------------------------------------------------
+
+def format_list(values: List[str]) -> str:
+    return '\n' + '\n'.join(f'\t{v}' for v in values) if values else 'None'
+
+
+def format_concept(desc: ConceptDescription) -> str:
+    kind = KIND_NAMES.get(desc.kind, 'Unknown')
+    if desc.abstract:
+        kind = f'{kind} (abstract)'
+    lines = [f'\n{desc.label} with id {desc.id} is {kind}']
+    if desc.sup:
+        lines.append(f'Sub type of: {desc.sup}')
+
+    if desc.kind == 'rule':
+        lines.append('\nRule definition:')
+        lines.append(f'\twhen: {desc.when}')
+        lines.append(f'\tthen: {desc.then}\n')
+        return '\n'.join(lines)
+
+    if desc.data_type:
+        lines.append(f'Data type: {desc.data_type}')
+    if desc.keys:
+        lines.append(f'\nKeys: {format_list(desc.keys)}')
+    lines.append(f'\nAttributes: {format_list(desc.attributes)}')
+    if desc.relates:
+        lines.append(f'Relates: {format_list(desc.relates)}')
+    lines.append(f'Roles: {format_list(desc.plays)}')
+    lines.append('-' * 79)
+    return '\n'.join(lines)
+
+
+def format_schema(
+        snapshot: SchemaSnapshot,
+        labels: Dict[str, List[str]] = None) -> str:
+    """Describe the concepts of `snapshot`, grouped by kind.
+
+    `labels` restricts the output to the given labels per heading, e.g.
+    `{'entities': ['Campaign', 'AdGroup']}`.
+    """
+    if labels is None:
+        labels = {
+            heading: sorted(c.label for c in snapshot.by_kind(kind))
+            for heading, kind in (
+                ('entities', 'entity'),
+                ('relations', 'relation'),
+                ('attributes', 'attribute'),
+                ('rules', 'rule'))}
+
+    out = []
+    for heading, heading_labels in labels.items():
+        out.append(f'\n{heading.title()}:')
+        for label in heading_labels:
+            out.append(format_concept(snapshot.get(label)))
+    return '\n'.join(out)
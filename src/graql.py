@@ -0,0 +1,234 @@
+"""Compile typed records into multi-statement Graql `insert` queries.
+
+A record is a short list of `Thing`s that belong together, e.g. a
+`ProductPartition` and the `case-value` relation attaching it to its
+`ProductDimension`. Many records are compiled into a single query::
+
+    match $r0 id V4120;
+    insert
+    $t0 isa ProductPartition, has criterion-id 12, has partition-type "Unit";
+    $t1 (product-dimension: $r0, product-partition: $t0) isa case-value,
+        has dimension-value "Shoes";
+
+Attribute values are rendered according to the datatype of their
+attribute type: numbers unquoted, strings quoted and escaped. Existing
+concepts are referenced by id with `Ref` and bound in the `match` clause.
+
+A record whose relations have role players outside of the record is
+`dependent` on them, e.g. the `node-heirarchy` of two partitions. Such
+records are written after their players, which are then bound by the
+concept ids their inserts returned (see `writer.ConceptIds`)::
+
+    match $r0 id V4120; $r1 id V4192;
+    insert
+    $t0 (parent-node: $r0, child-node: $r1) isa node-heirarchy;
+
+"""
+import datetime
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Sequence
+from typing import Tuple
+from typing import Union
+
+from grakn.client import DataType
+
+
+@dataclass(frozen=True)
+class Ref:
+    """An existing concept, referenced by its id.
+
+    `key` names the concept by its label and key values, e.g.
+    `ProductDimension:Brand`. Unlike the id it stays the same when the
+    data is loaded again, so digests of records use it.
+    """
+    id: str
+    key: str = field(compare=False)
+
+
+@dataclass(eq=False)
+class Thing:
+    """An entity or relation instance to insert.
+
+    Relations list their role players in `roles`, either as other `Thing`s
+    or as `Ref`s to existing concepts. `key` lists the attributes that
+    identify the instance, they are used to look it up when it is a role
+    player in a later batch. A relation that is not identified by its
+    own attributes belongs to the player of its `anchor` role, e.g. the
+    `ancestorship`s of a partition to the partition as `descedent`.
+    """
+    label: str
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    roles: List[Tuple[str, Union['Thing', Ref]]] = field(
+        default_factory=list)
+    key: Tuple[str, ...] = ()
+    anchor: str = ''
+
+    @classmethod
+    def from_row(
+            cls,
+            label: str,
+            row: dict,
+            key: Tuple[str, ...] = ()) -> 'Thing':
+        """Map the columns of an account DB row to attribute labels."""
+        return cls(
+            label, {k.replace('_', '-'): v for k, v in row.items()}, key=key)
+
+    def natural_key(self) -> str:
+        """Label and key values, e.g. `ProductPartition:3:12`."""
+        return ':'.join(
+            [self.label] + [str(self.attributes[k]) for k in self.key])
+
+    def player(self, role: str) -> Union['Thing', Ref]:
+        for r, player in self.roles:
+            if r == role:
+                return player
+        raise KeyError(f'`{self.label}` has no `{role}`')
+
+    def size(self) -> int:
+        """Rough length of the compiled statement."""
+        n = len(self.label) + 12
+        n += sum(len(k) + len(str(v)) + 8 for k, v in self.attributes.items())
+        n += sum(len(role) + 8 for role, _ in self.roles)
+        return n
+
+
+Record = Sequence[Thing]
+
+
+def record_size(record: Record) -> int:
+    return sum(thing.size() for thing in record)
+
+
+def external_players(record: Record) -> List[Thing]:
+    """The `Thing` role players of `record` that are not part of it."""
+    inside = set(record)
+    players = {}
+    for thing in record:
+        for _, player in thing.roles:
+            if isinstance(player, Thing) and player not in inside:
+                players[player] = None
+    return list(players)
+
+
+def dependent(record: Record) -> bool:
+    """Whether `record` can only be written after other records."""
+    return bool(external_players(record))
+
+
+def escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def value_type(value):
+    """The datatype a Python value is rendered as."""
+    if isinstance(value, bool):
+        return DataType.BOOLEAN
+    if isinstance(value, int):
+        return DataType.LONG
+    if isinstance(value, float):
+        return DataType.DOUBLE
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return DataType.DATE
+    return DataType.STRING
+
+
+def literal(value, data_type=None) -> str:
+    """Render `value` as a Graql literal of `data_type`.
+
+    Without a `data_type` it follows from the type of `value`, e.g. for
+    query parameters.
+    """
+    if data_type is None:
+        data_type = value_type(value)
+    if data_type in (DataType.LONG, DataType.INTEGER):
+        return str(int(value))
+    if data_type in (DataType.DOUBLE, DataType.FLOAT):
+        return repr(float(value))
+    if data_type == DataType.BOOLEAN:
+        return 'true' if value else 'false'
+    if data_type == DataType.DATE:
+        return value.isoformat()
+    return '"{}"'.format(escape(str(value)))
+
+
+class InsertCompiler:
+    """Compile records into one `insert` (or `match ... insert`) query.
+
+    `data_type(label)` returns the datatype of an attribute type and
+    `ids` the concept ids of `Thing`s written before (`ids.get(thing)`).
+    After `compile`, `variables` maps every inserted `Thing` to its
+    variable.
+    """
+
+    def __init__(self, data_type: Callable[[str], Any], ids=None):
+        self.data_type = data_type
+        self.ids = ids if ids is not None else {}
+        self.variables: Dict[Thing, str] = {}
+
+    def compile(self, records: Iterable[Record]) -> str:
+        things = self.variables = {}
+        refs = {}
+        matches = []
+        statements = []
+
+        def bind(concept_id):
+            if concept_id not in refs:
+                refs[concept_id] = f'$r{len(refs)}'
+                matches.append(f'{refs[concept_id]} id {concept_id};')
+            return refs[concept_id]
+
+        def var(player):
+            if isinstance(player, Ref):
+                return bind(player.id)
+            if player in things:
+                return things[player]
+            concept_id = self.ids.get(player)
+            if concept_id is None:
+                raise ValueError(
+                    f'`{player.natural_key()}` is neither inserted nor '
+                    'written before')
+            return bind(concept_id)
+
+        records = list(records)
+        for record in records:
+            for thing in record:
+                things[thing] = f'$t{len(things)}'
+
+        for record in records:
+            for thing in record:
+                statements.append(self.statement(thing, var))
+
+        query = 'insert\n' + '\n'.join(statements)
+        if matches:
+            query = f'match {" ".join(matches)}\n{query}'
+        return query
+
+    def match(self, thing: Thing, var: str) -> str:
+        """Match a written `thing` by its key attributes."""
+        has = ''.join(
+            f', has {label} '
+            f'{literal(thing.attributes[label], self.data_type(label))}'
+            for label in thing.key)
+        return f'{var} isa {thing.label}{has};'
+
+    def statement(self, thing: Thing, var: Callable) -> str:
+        head = var(thing)
+        if thing.roles:
+            players = ', '.join(
+                f'{role}: {var(player)}' for role, player in thing.roles)
+            head = f'{head} ({players})'
+
+        parts = [f'{head} isa {thing.label}']
+        for label, value in thing.attributes.items():
+            if value is None:
+                continue
+            parts.append(
+                f'has {label} {literal(value, self.data_type(label))}')
+
+        return ', '.join(parts) + ';'
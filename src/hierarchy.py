@@ -0,0 +1,131 @@
+"""Product partition trees, built at import time.
+
+The partitions of an ad group form a tree through their `parent_id`,
+which is the `criterion_id` of the parent subdivision. Instead of letting
+the `infer-node-heirarchy` rule join every partition against every other
+one at query time, the loader collects the rows of an ad group (they are
+read in `(adgroup_id, criterion_id)` order) into a `PartitionTree` with a
+hash index on both ids, and writes an explicit `node-heirarchy` relation
+per parent/child pair.
+
+The transitive closure of a tree, every (ancestor, descendant, depth)
+triple, is computed in a single depth first pass and written as
+`ancestorship` relations, so "all partitions under this subdivision" is
+a lookup as well instead of recursive inference over the hierarchy.
+
+The children of a parent are related by a single `sibling-group`
+relation (parent and children as role players), instead of a `siblings`
+relation per ordered pair of children, so they take linear space. See
+`siblings` (or the `siblings` query of `queries`) for looking them up.
+
+"""
+import itertools
+import logging
+import operator
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from queries import named_query
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+
+
+@dataclass
+class PartitionTree:
+    """The partition rows of one ad group, in criterion id order.
+
+    `index` maps a criterion id to the position of its row, `children`
+    maps a criterion id to the criterion ids of its children.
+    """
+    adgroup_id: int
+    rows: List[dict] = field(default_factory=list)
+    index: Dict[int, int] = field(default_factory=dict)
+    children: Dict[int, List[int]] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, adgroup_id: int, rows: Iterable[dict]) -> 'PartitionTree':
+        tree = cls(adgroup_id, list(rows))
+        for pos, row in enumerate(tree.rows):
+            tree.index[row['criterion_id']] = pos
+        for row in tree.rows:
+            parent_id = row['parent_id']
+            if parent_id in tree.index:
+                tree.children.setdefault(parent_id, []).append(
+                    row['criterion_id'])
+            elif parent_id:
+                log.warning(
+                    f'Partition {row["criterion_id"]} of ad group '
+                    f'{adgroup_id} has no parent {parent_id}.')
+        return tree
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def parent(self, criterion_id: int) -> Optional[int]:
+        """The criterion id of the parent, `None` for roots and orphans."""
+        parent_id = self.rows[self.index[criterion_id]]['parent_id']
+        return parent_id if parent_id in self.index else None
+
+    def roots(self) -> List[int]:
+        return [
+            r['criterion_id'] for r in self.rows
+            if r['parent_id'] not in self.index]
+
+    def siblings(self, criterion_id: int) -> List[int]:
+        """The other children of the parent of a partition."""
+        parent_id = self.parent(criterion_id)
+        if parent_id is None:
+            return []
+        return [
+            c for c in self.children[parent_id] if c != criterion_id]
+
+    def edges(self) -> Iterator[Tuple[int, int]]:
+        """(parent, child) criterion ids of every parent/child pair."""
+        for parent_id, child_ids in self.children.items():
+            for child_id in child_ids:
+                yield parent_id, child_id
+
+    def closure(self) -> Iterator[Tuple[int, int, int]]:
+        """(ancestor, descendant, depth) criterion ids of every pair.
+
+        `depth` is 1 for the parent, 2 for the grandparent and so on.
+        Partitions on a parent cycle are not reachable from a root and
+        are left out.
+        """
+        path = []
+        stack = [(root, 0) for root in reversed(self.roots())]
+        while stack:
+            node, level = stack.pop()
+            del path[level:]
+            for depth, ancestor in enumerate(reversed(path), 1):
+                yield ancestor, node, depth
+            path.append(node)
+            stack.extend(
+                (child, level + 1)
+                for child in reversed(self.children.get(node, ())))
+
+
+def partition_trees(rows: Iterable[dict]) -> Iterator[PartitionTree]:
+    """Group partition rows, ordered by ad group, into trees."""
+    by_adgroup = itertools.groupby(rows, key=operator.itemgetter('adgroup_id'))
+    for adgroup_id, group in by_adgroup:
+        yield PartitionTree.build(adgroup_id, group)
+
+
+def siblings_query(adgroup_id: int, criterion_id: int) -> str:
+    """Graql query for the siblings of a partition, via its group."""
+    return named_query('siblings').render(
+        adgroup_id=adgroup_id, criterion_id=criterion_id)
+
+
+def siblings(tx, adgroup_id: int, criterion_id: int) -> List[int]:
+    """The criterion ids of the siblings of a partition in a keyspace."""
+    answers = tx.query(siblings_query(adgroup_id, criterion_id))
+    return sorted(answer.get('c-id').value() for answer in answers)
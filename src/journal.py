@@ -0,0 +1,179 @@
+"""Durable progress journal for resumable imports.
+
+The loaders read their source rows in keyset order (see `source`), so the
+progress of an import is fully described by the source key of the last
+committed batch. `Journal` stores that key in the `state.StateStore`
+after every commit.
+
+On resume the loader continues reading after the journaled key. A batch
+may have been committed without reaching the journal, so the keys of
+every batch are saved as pending before it is committed and `rollback()`
+first deletes the instances of the pending keys, which makes resuming
+idempotent. Matching the exact keys, instead of comparing them with the
+journaled key in Grakn, does not depend on the collation the source
+database orders them by.
+
+Sharded (parallel) imports keep one journal entry per shard, its scope
+records the shard count (e.g. `3/8`). A run can only be resumed with the
+same shards, otherwise it would start over in new scopes and write
+everything again, so `resume_after` refuses it.
+
+"""
+import logging
+from typing import Callable
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+from grakn.client import Session
+
+from cache import CachedTransaction
+from cache import session_cache
+from graql import Record
+from graql import literal
+from state import StateStore
+from sync import SyncKind
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+
+
+class Journal:
+    """Progress of one loader (or shard of a loader) in a keyspace.
+
+    Without `resume` previous progress is discarded. `shard` is the
+    `(shard, shards)` of a shard of a sharded run.
+    """
+
+    def __init__(
+            self,
+            store: StateStore,
+            keyspace: str,
+            kind: SyncKind,
+            scope: str = '',
+            resume: bool = False,
+            shard: Tuple[int, int] = None):
+        self.store = store
+        self.keyspace = keyspace
+        self.kind = kind
+        self.base = scope
+        self.shards = 0
+        if shard is not None:
+            scope = f'{scope}{shard[0]}/{shard[1]}'
+            self.shards = shard[1]
+        self.scope = scope
+        self.resume = resume
+
+        if not resume:
+            store.clear_progress(keyspace, kind.label, scope)
+        entry = store.progress(keyspace, kind.label, scope)
+        self.started = entry is not None
+        self.last_key, self.rows, self.finished = entry or (None, 0, False)
+
+    def for_shard(self, shard: int, shards: int) -> 'Journal':
+        return Journal(
+            self.store, self.keyspace, self.kind, self.scope, self.resume,
+            (shard, shards))
+
+    def check_shards(self):
+        """Refuse to resume a run that was sharded differently."""
+        journaled = set()
+        for scope in self.store.scopes(self.keyspace, self.kind.label):
+            if scope.startswith(self.base):
+                shard = scope[len(self.base):]
+                journaled.add(int(shard.split('/')[1]) if shard else 0)
+        journaled.discard(self.shards)
+        if journaled:
+            raise ValueError(
+                f'`{self.kind.label}` was imported in {journaled.pop()} '
+                f'shards (0 is unsharded), not {self.shards}: resume it '
+                'with the same number of workers, or start over.')
+
+    def key(self, record: Record) -> List:
+        return [record[0].attributes[k] for k in self.kind.keys]
+
+    def start(self):
+        self.started = True
+        self.store.save_progress(
+            self.keyspace, self.kind.label, self.scope,
+            self.last_key, self.rows)
+
+    def commit(self, rows: Sequence[Record]):
+        """Record a committed batch, `rows` are in source key order.
+
+        Relation records (see `graql.Thing.anchor`) have no source key and
+        are not counted.
+        """
+        rows = [r for r in rows if not r[0].anchor]
+        if not rows:
+            return
+        self.last_key = self.key(rows[-1])
+        self.rows += len(rows)
+        self.store.save_progress(
+            self.keyspace, self.kind.label, self.scope,
+            self.last_key, self.rows)
+
+    def finish(self):
+        self.finished = True
+        self.store.save_progress(
+            self.keyspace, self.kind.label, self.scope,
+            self.last_key, self.rows, finished=True)
+
+    def pending(self, rows: Sequence[Record]):
+        """Record the keys of a batch before it is committed."""
+        keys = [self.key(r) for r in rows if not r[0].anchor]
+        if keys:
+            self.store.save_pending(
+                self.keyspace, self.kind.label, self.scope,
+                self.store.pending(
+                    self.keyspace, self.kind.label, self.scope) + keys)
+
+    def rollback(self, session: Session):
+        """Delete the instances of batches committed but not journaled."""
+        pending = self.store.pending(
+            self.keyspace, self.kind.label, self.scope)
+        if pending:
+            with session.transaction().write() as tx:
+                tx = CachedTransaction(tx, session_cache(session))
+                for key in pending:
+                    match = self.match(tx.data_type, key)
+                    for relation in self.kind.relations:
+                        list(tx.query(f'{match} $r ($x) isa {relation}; '
+                                      'delete $r;'))
+                    list(tx.query(f'{match} delete $x;'))
+                tx.commit()
+            self.store.save_pending(
+                self.keyspace, self.kind.label, self.scope, [])
+
+        log.info(
+            f'Resuming `{self.kind.label}` {self.scope or ""} after '
+            f'{self.last_key}, {self.rows} rows already imported, '
+            f'{len(pending)} rolled back.')
+
+    def match(self, data_type: Callable, key: List) -> str:
+        """The match clause of the instance with source key `key`."""
+        has = ''.join(
+            f', has {k} {literal(v, data_type(k))}'
+            for k, v in zip(self.kind.keys, key))
+        return f'match $x isa {self.kind.label}{has};'
+
+
+def resume_after(
+        journal: Optional[Journal],
+        session: Session) -> Optional[List]:
+    """Prepare `journal` for a loader run, return the key to start after.
+
+    Returns `None` to start from the beginning.
+    """
+    if journal is None:
+        return None
+
+    if journal.resume:
+        journal.check_shards()
+    if not journal.started:
+        journal.start()
+        return None
+
+    journal.rollback(session)
+    return journal.last_key
@@ -0,0 +1,256 @@
+"""Import pipeline metrics.
+
+Stage timings, counters and batch sizes are sent to statsd when it is
+configured (see `configure`) and are always aggregated in process for a
+structured end-of-run summary (see `summary`). Comparing `db.fetch` with
+`grakn.query` and `grakn.commit` tells whether a slow import waits on the
+account DB or on the Grakn server.
+
+Metrics:
+
+    db.fetch            timer, one source page query
+    db.rows             counter, rows read from the account DB
+    graql.build         timer, compiling the queries of one batch
+    grakn.query         timer, running the queries of one batch
+    grakn.commit        timer, committing one batch
+    batch.rows          histogram, rows per committed batch
+    batch.bytes         histogram, estimated bytes per batch
+    batch.retries       counter, batches split after a failed commit
+    rows.written        counter
+    rows.failed         counter
+    stage.<name>        timer, one loader / schema module
+    stage.<name>.rows   counter
+    stage.<name>.rps    gauge, rows/s of the last run of the stage
+
+statsd has no histogram type, histograms are sent as timers, which is the
+statsd type that gets percentiles.
+
+"""
+import collections
+import contextlib
+import json
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+
+from statsd import StatsClient
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+
+DEFAULT_PREFIX = 'adw_ontology'
+DEFAULT_STATSD_PORT = 8125
+
+# samples kept per distribution for the percentiles of the summary
+SAMPLE_SIZE = 4096
+
+
+@dataclass
+class Distribution:
+    """Count, sum, min, max and a uniform sample of the observed values."""
+    count: int = 0
+    total: float = 0.0
+    min: float = float('inf')
+    max: float = float('-inf')
+    samples: List[float] = field(default_factory=list)
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+        # reservoir sampling keeps memory bounded on long runs
+        if len(self.samples) < SAMPLE_SIZE:
+            self.samples.append(value)
+        else:
+            i = random.randrange(self.count)
+            if i < SAMPLE_SIZE:
+                self.samples[i] = value
+
+    def percentile(self, p: float) -> float:
+        values = sorted(self.samples)
+        return values[min(len(values) - 1, int(p * len(values)))]
+
+    def summary(self) -> dict:
+        return {
+            'count': self.count,
+            'total': round(self.total, 3),
+            'mean': round(self.total / self.count, 3),
+            'min': round(self.min, 3),
+            'p50': round(self.percentile(0.5), 3),
+            'p95': round(self.percentile(0.95), 3),
+            'max': round(self.max, 3),
+        }
+
+
+class Timer:
+    """Elapsed wall clock time of a `timer` block, in seconds."""
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.elapsed = 0.0
+
+    def stop(self) -> float:
+        self.elapsed = time.monotonic() - self.start
+        return self.elapsed
+
+
+class Stage(Timer):
+    """A `stage` block, set `rows` to the number of rows it processed."""
+
+    def __init__(self, name: str):
+        super().__init__()
+        self.name = name
+        self.rows = 0
+
+
+class Registry:
+    """Thread-safe in-process aggregate, optionally mirrored to statsd."""
+
+    def __init__(self, client: StatsClient = None):
+        self.client = client
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._counters = collections.Counter()
+        self._gauges: Dict[str, float] = {}
+        self._distributions: Dict[str, Distribution] = {}
+        self._stages: Dict[str, dict] = {}
+
+    def incr(self, name: str, count: int = 1):
+        with self._lock:
+            self._counters[name] += count
+        if self.client:
+            self.client.incr(name, count)
+
+    def gauge(self, name: str, value: float):
+        with self._lock:
+            self._gauges[name] = value
+        if self.client:
+            self.client.gauge(name, value)
+
+    def timing(self, name: str, ms: float):
+        self.histogram(name, ms)
+
+    def histogram(self, name: str, value: float):
+        with self._lock:
+            self._distributions.setdefault(name, Distribution()).add(value)
+        if self.client:
+            self.client.timing(name, value)
+
+    def stage_done(self, stage: Stage):
+        self.timing(f'stage.{stage.name}', stage.elapsed * 1000)
+        self.incr(f'stage.{stage.name}.rows', stage.rows)
+
+        rps = stage.rows / stage.elapsed if stage.elapsed else 0.0
+        self.gauge(f'stage.{stage.name}.rps', round(rps, 1))
+        with self._lock:
+            s = self._stages.setdefault(
+                stage.name, {'runs': 0, 'rows': 0, 'seconds': 0.0})
+            s['runs'] += 1
+            s['rows'] += stage.rows
+            s['seconds'] += stage.elapsed
+
+    def summary(self) -> dict:
+        with self._lock:
+            stages = {
+                name: dict(
+                    s, seconds=round(s['seconds'], 3),
+                    rows_per_sec=round(s['rows'] / s['seconds'], 1)
+                    if s['seconds'] else 0.0)
+                for name, s in self._stages.items()}
+            return {
+                'seconds': round(time.monotonic() - self.started, 3),
+                'stages': stages,
+                'counters': dict(self._counters),
+                'gauges': dict(self._gauges),
+                'distributions': {
+                    name: d.summary()
+                    for name, d in self._distributions.items()},
+            }
+
+
+_registry = Registry()
+
+
+def configure(
+        host: Optional[str],
+        port: int = DEFAULT_STATSD_PORT,
+        prefix: str = DEFAULT_PREFIX):
+    """Send metrics to the statsd server at `host`, None disables statsd.
+
+    `host` may be given as `host:port`.
+    """
+    if host and ':' in host:
+        host, port = host.rsplit(':', 1)
+    _registry.client = (
+        StatsClient(host, int(port), prefix=prefix) if host else None)
+
+
+def reset():
+    """Start a new run, statsd stays configured."""
+    global _registry
+    _registry = Registry(_registry.client)
+
+
+def incr(name: str, count: int = 1):
+    _registry.incr(name, count)
+
+
+def gauge(name: str, value: float):
+    _registry.gauge(name, value)
+
+
+def timing(name: str, ms: float):
+    _registry.timing(name, ms)
+
+
+def histogram(name: str, value: float):
+    _registry.histogram(name, value)
+
+
+@contextlib.contextmanager
+def timer(name: str) -> Iterator[Timer]:
+    """Time the block as `name`, in milliseconds."""
+    t = Timer()
+    try:
+        yield t
+    finally:
+        _registry.timing(name, t.stop() * 1000)
+
+
+@contextlib.contextmanager
+def stage(name: str) -> Iterator[Stage]:
+    """Time a loader or schema module and report its rows/s::
+
+        with metrics.stage('campaigns') as s:
+            s.rows = load_campaign_data(...).rows
+
+    """
+    s = Stage(name)
+    try:
+        yield s
+    finally:
+        s.stop()
+        _registry.stage_done(s)
+
+
+def summary() -> dict:
+    return _registry.summary()
+
+
+def log_summary(path: str = None) -> dict:
+    """Log the run summary as JSON and write it to `path`, if given."""
+    result = summary()
+    log.info(f'Run summary: {json.dumps(result, sort_keys=True)}')
+    if path:
+        with open(path, 'w') as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+    return result
@@ -20,12 +20,16 @@ with a ProductGroup mapping:
 
 """
 import argparse
+import bisect
+import collections
+import itertools
 import logging
+import operator
+from typing import Iterable
+from typing import Iterator
 from typing import List
 from typing import Tuple
 
-from peewee import JOIN
-
 from adspert.database.models.main import Account
 from adspert.database.models.account import AdGroup
 from adspert.database.models.account import AdwordsOffer
@@ -36,29 +40,111 @@ from adspert.scripts.utils import get_account
 from adspert.base.app import adspert_app
 from adspert.database.db import configure_db
 from adspert.database.db import dbs
-from grakn.client import GraknClient
-from grakn.client import DataType
 from grakn.client import Session
 
+import metrics
+from cache import ConceptIndex
+from graql import Record
+from graql import Thing
+from hierarchy import PartitionTree
+from hierarchy import partition_trees
+from journal import Journal
+from journal import resume_after
+from parallel import load_sharded
+from pooling import get_pool
+from source import DEFAULT_ID_CHUNK
+from source import DEFAULT_PAGE_SIZE
+from source import DEFAULT_READ
+from source import ReadConfig
+from source import id_chunks
+from source import id_table
+from source import iter_pages
+from source import prefetched
+from source import stream
+from source import stream_in
+from state import DEFAULT_STATE_PATH
+from state import StateStore
+from sync import ADGROUP
+from sync import CAMPAIGN
+from sync import PRODUCT
+from sync import PRODUCT_PARTITION
+from sync import SyncStats
+from sync import sync_records
+from writer import BatchConfig
+from writer import DEFAULT_BATCH
+from writer import DEFAULT_BATCH_SIZE
+from writer import GraqlWriter
+from writer import WriteStats
+
 log = logging.getLogger(__name__)
 log.setLevel(logging.DEBUG)
 
 GRAKN_SERVER = 'localhost'
 
 
-def make_insert_query(label: str, obj: dict):
-    base = f'insert $x isa {label}'
-    attrs = ['has {} "{}"'.format(k.replace('_', '-'), v)
-             for k, v in obj.items()]
-    query = '{}, {};'.format(base, ', '.join(attrs))
-    return query
+def campaign_record(row: dict) -> Record:
+    return [Thing.from_row('Campaign', row)]
 
 
-def load_campaign_data(
-        session,
+def adgroup_record(row: dict) -> Record:
+    return [Thing.from_row('AdGroup', row)]
+
+
+def product_partition_record(dimensions: ConceptIndex, row: dict) -> Record:
+    dt = row.pop('dimension_type')
+    dv = row.pop('dimension_value')
+
+    pp = Thing.from_row('ProductPartition', row, PRODUCT_PARTITION.keys)
+    if not dt:
+        return [pp]
+
+    cv = Thing(
+        'case-value',
+        {'dimension-value': dv},
+        [('product-dimension', dimensions.ref(dt, create=True)),
+         ('product-partition', pp)])
+    return [pp, cv]
+
+
+def product_record(
+        dimensions: ConceptIndex,
+        adgroups: ConceptIndex,
+        item_id: str,
+        rows: Iterable[dict]) -> Record:
+    """Collapse the offer/dimension rows of an item into one record."""
+    adgroup_ids = {}
+    values = {}
+    for r in rows:
+        adgroup_ids[r['adgroup_id']] = None
+        if r['dimension_type']:
+            values[(r['dimension_type'], r['dimension_value'])] = None
+
+    product = Thing('Product', {'item-id': item_id})
+    record = [product]
+    for dt, dv in values:
+        record.append(Thing(
+            'product-value',
+            {'dimension-value': dv},
+            [('product', product),
+             ('product-dimension', dimensions.ref(dt, create=True))]))
+
+    for adgroup_id in adgroup_ids:
+        adgroup = adgroups.ref(adgroup_id)
+        if adgroup is None:
+            # ad group was not imported
+            continue
+        record.append(Thing(
+            'product-offer',
+            roles=[('product', product), ('ad-group', adgroup)]))
+
+    return record
+
+
+def campaign_records(
         campaign_types: Tuple,
-        include_paused: bool):
-    """."""
+        include_paused: bool,
+        read: ReadConfig = DEFAULT_READ,
+        after: List = None) -> Iterator[Record]:
     # fetch campaign data from accountdb
     q = Campaign.select(
             Campaign.campaign_id,
@@ -72,26 +158,15 @@ def load_campaign_data(
     else:
         q = q.where(Campaign.status == 'Deleted')
 
-    with session.transaction().write() as tx:
-        entity = tx.get_schema_concept('Campaign')
-        ids = []
-        for r in q.dicts():
-            campaign = entity.create()
-            ids.append(campaign.id)
-            for k, v in r.items():
-                attr = tx.get_schema_concept(k.replace('_', '-'))
-                campaign.has(attr.create(v))
-        tx.commit()
+    for r in stream(q, (Campaign.campaign_id, ), read, after):
+        yield campaign_record(r)
 
-    log.info('Inserted {} campaigns.'.format(len(ids)))
 
-
-def load_adgroup_data(
-        session: Session,
-        limit: int = 0,
+def adgroup_records(
         adgroup_types: Tuple = (),
-        include_paused: bool = False):
-    """Load ad group data from account db."""
+        adgroup_ids: Tuple = (),
+        read: ReadConfig = DEFAULT_READ,
+        after: List = None) -> Iterator[Record]:
     q = AdGroup.select(
         AdGroup.adgroup_id,
         AdGroup.adgroup_name,
@@ -101,33 +176,82 @@ def load_adgroup_data(
     q = q.where(AdGroup.status == 'Active')
     if adgroup_types:
         q = q.where(AdGroup.aw_adgroup_type.in_(adgroup_types))
-    if limit:
-        q = q.limit(limit)
-
-    ids = []
-    for r in q.dicts():
+    keys = (AdGroup.adgroup_id, )
+    for r in stream_in(q, keys, adgroup_ids, read, after):
         # keep entity references consistent
         r['campaign_id'] = r['campaign']
         del r['campaign']
 
-        with session.transaction().write() as tx:
-            adgroup = tx.get_schema_concept('AdGroup').create()
-            ids.append(adgroup.id)
-            for k, v in r.items():
-                try:
-                    attr = tx.get_schema_concept(k.replace('_', '-'))
-                    adgroup.has(attr.create(v))
-                except TypeError:
-                    pass
-            tx.commit()
-
-    log.info('Inserted {} Ad Groups.'.format(len(ids)))
-
-
-def load_product_partition_data(
-        session: Session, adgroup_ids: Tuple = ()):
-    """Load ad group data from account db."""
-
+        yield adgroup_record(r)
+
+
+def partition_tree_records(
+        dimensions: ConceptIndex,
+        tree: PartitionTree,
+        after: List = None) -> Iterator[Record]:
+    """The records of the partitions of `tree`, in criterion id order.
+
+    The hierarchy relations are records of their own: the
+    `node-heirarchy` and `ancestorship`s of a partition to its parent and
+    ancestors, and the `sibling-group` of a parent and its children. Each
+    follows the record of whichever of its partitions comes last, so all
+    of them are inserted by the time the relation is. Partitions up to
+    `after` were imported already and are skipped, together with the
+    relations following them.
+    """
+    partitions = []
+    records = []
+    for row in tree.rows:
+        record = product_partition_record(dimensions, dict(row))
+        partitions.append(record[0])
+        records.append([record])
+
+    def partition(criterion_id: int) -> Thing:
+        return partitions[tree.index[criterion_id]]
+
+    def last(criterion_ids: Iterable[int]) -> List[Record]:
+        return records[max(tree.index[c] for c in criterion_ids)]
+
+    links = {}
+    for ancestor_id, descendant_id, depth in tree.closure():
+        links.setdefault(descendant_id, []).append((ancestor_id, depth))
+
+    for descendant_id, ancestors in links.items():
+        child = partition(descendant_id)
+        record = [Thing(
+            'node-heirarchy', {},
+            [('parent-node', partition(tree.parent(descendant_id))),
+             ('child-node', child)],
+            anchor='child-node')]
+        record.extend(
+            Thing(
+                'ancestorship', {'depth': depth},
+                [('ancestor', partition(ancestor_id)),
+                 ('descedent', child)],
+                anchor='descedent')
+            for ancestor_id, depth in ancestors)
+        last([descendant_id] + [a for a, _ in ancestors]).append(record)
+
+    for parent_id, child_ids in tree.children.items():
+        last([parent_id] + child_ids).append([Thing(
+            'sibling-group', {},
+            [('group-parent', partition(parent_id))] +
+            [('sibling', partition(c)) for c in child_ids],
+            anchor='group-parent')])
+
+    start = 0
+    if after is not None and after[0] == tree.adgroup_id:
+        start = bisect.bisect_right(
+            [r['criterion_id'] for r in tree.rows], after[1])
+    for owned in records[start:]:
+        yield from owned
+
+
+def product_partition_records(
+        dimensions: ConceptIndex,
+        adgroup_ids: Tuple = (),
+        read: ReadConfig = DEFAULT_READ,
+        after: List = None) -> Iterator[Record]:
     q = ProductPartition.select(
         ProductPartition.criterion_id,
         ProductPartition.adgroup_id,
@@ -135,80 +259,213 @@ def load_product_partition_data(
         ProductPartition.dimension_value,
         ProductPartition.partition_type,
         ProductPartition.parent_id)
-    if adgroup_ids:
-        q = q.where(ProductPartition.adgroup_id.in_(adgroup_ids))
-
-    inserts = ['insert']
-    tpl = ('$pp isa ProductPartition, '
-           'has criterion-id {}, '
-           'has adgroup-id {}, '
-           'has partition-type {} '
-           'has parent-id {};')
-
-    ids = []
-    for r in q.dicts():
-        dt = r.pop('dimension_type')
-        dv = r.pop('dimension_value')
-
-        q = tpl.format(*r.values())
-        inserts.append(q)
-
-        with session.transaction().write() as tx:
-            pp = tx.get_schema_concept('ProductPartition').create()
-            for k, v in r.items():
-                attr = tx.get_schema_concept(k.replace('_', '-'))
-                pp.has(attr.create(v))
-            ids.append(pp.id)
-            tx.commit()
-
-        if dt:
-            with session.transaction().write() as tx:
-                it = tx.query(
-                    'match $x isa ProductDimension, '
-                    f'has dimension-type "{dt}"; get;')
-                pd = next(iter(it.collect_concepts()), None)
-                if not pd:
-                    pd = tx.get_schema_concept('ProductDimension').create()
-                    pd.has(tx.get_schema_concept('dimension-type').create(dt))
-
-                dv = tx.get_schema_concept('dimension-value').create(dv)
-
-                cv = tx.get_schema_concept('case-value').create()
-                cv.has(dv)
-                cv.assign(tx.put_role('product-dimension'), pd)
-                cv.assign(tx.put_role(
-                    'product-partition'), tx.get_concept(ids[-1]))
-                tx.commit()
-    else:
-        query = '\n'.join(inserts)
-        print(query)
 
-    log.info('Inserted {} Product Partitions.'.format(len(ids)))
+    # keeps the partitions of an ad group together
+    keys = (ProductPartition.adgroup_id, ProductPartition.criterion_id)
+
+    # re-read the whole ad group a resumed import stopped in, its tree is
+    # needed for the relations of the remaining partitions
+    start = None if after is None else [after[0], 0]
+
+    rows = stream_in(q, keys, adgroup_ids, read, start)
+    for tree in partition_trees(rows):
+        yield from partition_tree_records(dimensions, tree, after)
+
+
+def load_campaign_data(
+        session,
+        campaign_types: Tuple,
+        include_paused: bool,
+        batch: BatchConfig = DEFAULT_BATCH,
+        read: ReadConfig = DEFAULT_READ,
+        journal: Journal = None):
+    """."""
+    if journal and journal.finished:
+        return WriteStats()
+    after = resume_after(journal, session)
+
+    with GraqlWriter(session, batch, journal) as writer:
+        for record in campaign_records(
+                campaign_types, include_paused, read, after):
+            writer.add(record)
 
+    if journal:
+        journal.finish()
+    log.info('Inserted {} campaigns.'.format(writer.stats.rows))
+    return writer.stats
+
+
+def load_adgroup_data(
+        session: Session,
+        limit: int = 0,
+        adgroup_types: Tuple = (),
+        include_paused: bool = False,
+        adgroup_ids: Tuple = (),
+        batch: BatchConfig = DEFAULT_BATCH,
+        read: ReadConfig = DEFAULT_READ,
+        journal: Journal = None):
+    """Load ad group data from account db."""
+    if journal and journal.finished:
+        return WriteStats()
+    after = resume_after(journal, session)
 
-def load_product_data(session: Session, adgroup_ids: Tuple = ()):
-    """Product Data."""
+    records = adgroup_records(adgroup_types, adgroup_ids, read, after)
+    if limit:
+        records = itertools.islice(records, limit)
+
+    with GraqlWriter(session, batch, journal) as writer:
+        for record in records:
+            writer.add(record)
+
+    if journal:
+        journal.finish()
+
+    log.info('Inserted {} Ad Groups.'.format(writer.stats.rows))
+    return writer.stats
+
+
+def load_product_partition_data(
+        session: Session,
+        adgroup_ids: Tuple = (),
+        batch: BatchConfig = DEFAULT_BATCH,
+        read: ReadConfig = DEFAULT_READ,
+        dimensions: ConceptIndex = None,
+        journal: Journal = None):
+    """Load ad group data from account db.
+
+    Pass a warmed `dimensions` index to share it between parallel loaders.
+    """
+    if journal and journal.finished:
+        return WriteStats()
+    after = resume_after(journal, session)
+
+    if dimensions is None:
+        dimensions = product_dimension_index(session)
+
+    with GraqlWriter(session, batch, journal) as writer:
+        for record in product_partition_records(
+                dimensions, adgroup_ids, read, after):
+            writer.add(record)
+
+    if journal:
+        journal.finish()
+
+    log.info('Inserted {} Product Partitions.'.format(writer.stats.rows))
+    return writer.stats
+
+
+def select_offer_rows(
+        adgroup_ids: Tuple = (),
+        page_size: int = DEFAULT_PAGE_SIZE,
+        after: List = None,
+        id_chunk: int = DEFAULT_ID_CHUNK) -> Iterator[dict]:
+    """Offers LEFT JOIN their product dimensions, read page by page.
+
+    The offers are paginated on (item_id, adgroup_id) and the dimensions
+    are fetched per page, so a page never cuts through the dimensions of
+    an offer and all rows of an item are adjacent. `after` is the
+    `[item_id]` to continue after.
+
+    More than `id_chunk` `adgroup_ids` are joined as a temporary table,
+    chunking them would break the item_id order.
+    """
     q = AdwordsOffer.select(
         AdwordsOffer.adgroup_id,
-        AdwordsOffer.item_id,
-        ProductDimension.dimension_type,
-        ProductDimension.dimension_value)
-    q = q.join(
-        ProductDimension, JOIN.LEFT_OUTER,
-        on=(AdwordsOffer.item_id == ProductDimension.item_id))
+        AdwordsOffer.item_id)
+    if after:
+        q = q.where(AdwordsOffer.item_id > after[0])
+
+    if len(adgroup_ids) > id_chunk:
+        db = AdwordsOffer._meta.database
+        with id_table(db, adgroup_ids) as ids:
+            q = q.join(ids, on=(AdwordsOffer.adgroup_id == ids.id))
+            yield from _offer_dimension_rows(q, page_size, id_chunk)
+        return
 
     if adgroup_ids:
         q = q.where(AdwordsOffer.adgroup_id.in_(adgroup_ids))
+    yield from _offer_dimension_rows(q, page_size, id_chunk)
+
+
+def _offer_dimension_rows(
+        q, page_size: int, id_chunk: int) -> Iterator[dict]:
+    keys = (AdwordsOffer.item_id, AdwordsOffer.adgroup_id)
+    for page in iter_pages(q, keys, page_size):
+        dimensions = collections.defaultdict(list)
+        for items in id_chunks((r['item_id'] for r in page), id_chunk):
+            dq = ProductDimension.select(
+                ProductDimension.item_id,
+                ProductDimension.dimension_type,
+                ProductDimension.dimension_value)
+            dq = dq.where(ProductDimension.item_id.in_(items))
+            with metrics.timer('db.fetch'):
+                for d in dq.dicts().iterator():
+                    dimensions[d.pop('item_id')].append(d)
+
+        no_dimension = [{'dimension_type': None, 'dimension_value': None}]
+        for r in page:
+            for d in dimensions.get(r['item_id'], no_dimension):
+                yield dict(r, **d)
+
+
+def load_product_data(
+        session: Session,
+        adgroup_ids: Tuple = (),
+        batch: BatchConfig = DEFAULT_BATCH,
+        read: ReadConfig = DEFAULT_READ,
+        dimensions: ConceptIndex = None,
+        adgroups: ConceptIndex = None,
+        journal: Journal = None):
+    """Product Data.
+
+    One Product is written per item_id together with its dimension values
+    and its product-offer relations to the (already imported) ad groups.
+    """
+    if journal and journal.finished:
+        return WriteStats()
+    after = resume_after(journal, session)
+
+    if dimensions is None:
+        dimensions = product_dimension_index(session)
+    if adgroups is None:
+        adgroups = adgroup_index(session)
+
+    rows = select_offer_rows(
+        adgroup_ids, read.page_size, after, read.id_chunk)
+    if read.prefetch:
+        rows = prefetched(rows, read.prefetch)
 
-    ids = []
-    for row in q.dicts():
-        with session.transaction().write() as tx:
-            attr = tx.put_attribute_type('item-id', DataType.STRING)
-            e = tx.put_entity_type('Product').create()
-            e.has(attr.create(row['item_id']))
+    with GraqlWriter(session, batch, journal) as writer:
+        items = itertools.groupby(rows, key=operator.itemgetter('item_id'))
+        for item_id, item_rows in items:
+            writer.add(product_record(
+                dimensions, adgroups, item_id, item_rows))
 
-            ids.append(e.id)
-            tx.commit()
+    if journal:
+        journal.finish()
+    log.info('Inserted {} Products.'.format(writer.stats.rows))
+    return writer.stats
+
+
+def product_dimension_index(session: Session) -> ConceptIndex:
+    return ConceptIndex(session, 'ProductDimension', 'dimension-type').warm()
+
+
+def adgroup_index(session: Session) -> ConceptIndex:
+    return ConceptIndex(session, 'AdGroup', 'adgroup-id').warm()
+
+
+def select_adgroup_ids(adgroup_types: Tuple = ()) -> List[int]:
+    q = AdGroup.select(AdGroup.adgroup_id)
+    q = q.where(AdGroup.status == 'Active')
+    if adgroup_types:
+        q = q.where(AdGroup.aw_adgroup_type.in_(adgroup_types))
+    return [r.adgroup_id for r in q]
+
+
+def select_partition_adgroup_ids() -> List[int]:
+    q = ProductPartition.select(ProductPartition.adgroup_id).distinct()
+    return [r.adgroup_id for r in q]
 
 
 # ----------------------------------------------------------------------------
@@ -220,34 +477,202 @@ def import_account_structure(
         campaign_types: List[str] = None,
         adgroup_types: List[str] = None,
         include_paused: bool = False,
-        include=(), exclude=()):
-    """Import Adspert account structure into Grakn keyspace."""
+        include=(), exclude=(),
+        batch: BatchConfig = DEFAULT_BATCH,
+        read: ReadConfig = DEFAULT_READ,
+        workers: int = 1,
+        host: str = GRAKN_SERVER,
+        store: StateStore = None,
+        resume: bool = False):
+    """Import Adspert account structure into Grakn keyspace.
+
+    With `workers` > 1 ad groups are loaded concurrently, sharded by
+    `adgroup_id`, once all campaigns have been written.
+
+    With a `store` the progress is journaled, and `resume` continues an
+    interrupted import.
+    """
     log.info(
         f'Importing the account structure of {account.account_name_extern}.')
 
-    with GraknClient(uri=f"{args.host}:48555") as client:
-        with client.session(keyspace=account.account_name) as session:
-            load_campaign_data(session, campaign_types, include_paused)
-            load_adgroup_data(session, adgroup_types, include_paused)
+    keyspace = account.account_name
+    journals = {}
+    if store is not None:
+        journals = {
+            kind: Journal(store, keyspace, kind, resume=resume)
+            for kind in (CAMPAIGN, ADGROUP)}
+
+    pool = get_pool()
+    with pool.session(keyspace, host) as session:
+        with metrics.stage('campaigns') as stage:
+            stats = load_campaign_data(
+                session, campaign_types, include_paused,
+                batch=batch, read=read, journal=journals.get(CAMPAIGN))
+            stage.rows = stats.rows
+
+        if workers <= 1:
+            with metrics.stage('adgroups') as stage:
+                adgroups = load_adgroup_data(
+                    session,
+                    adgroup_types=adgroup_types,
+                    include_paused=include_paused,
+                    batch=batch,
+                    read=read,
+                    journal=journals.get(ADGROUP))
+                stage.rows = adgroups.rows
+            stats.merge(adgroups)
+
+    if workers > 1:
+        with metrics.stage('adgroups') as stage:
+            adgroups = load_sharded(
+                pool.client(host), keyspace, load_adgroup_data,
+                select_adgroup_ids(adgroup_types), workers,
+                adgroup_types=adgroup_types,
+                include_paused=include_paused,
+                batch=batch,
+                read=read,
+                journal=journals.get(ADGROUP))
+            stage.rows = adgroups.rows
+        stats.merge(adgroups)
+
+    if store is not None:
+        store.bump_data_version(keyspace)
+    log.info(
+        f'Account structure imported: {stats.rows} rows in '
+        f'{stats.batches} batches, {stats.retries} retries, '
+        f'{len(stats.failed)} failed.')
+    return stats
+
 
-            """
-            with session.transaction().read() as tx:
-                it = tx.query('match $x isa adgroup-id; get;')
-                adgroup_ids = [ans.value() for ans in it.collect_concepts()]
+def import_shopping_criterion_structure(
+        account: Account,
+        batch: BatchConfig = DEFAULT_BATCH,
+        read: ReadConfig = DEFAULT_READ,
+        workers: int = 1,
+        host: str = GRAKN_SERVER,
+        store: StateStore = None,
+        resume: bool = False):
+    """Import shopping criterion (product partition).
+
+    With `workers` > 1 partitions are loaded concurrently, sharded by
+    `adgroup_id`, sharing one product dimension index.
+
+    With a `store` the progress is journaled, and `resume` continues an
+    interrupted import.
+    """
+    log.info(
+        'Importing the shopping criterion structure of '
+        f'{account.account_name_extern}.')
 
-                tx.close()
-            """
+    keyspace = account.account_name
+    journals = {}
+    if store is not None:
+        journals = {
+            kind: Journal(store, keyspace, kind, resume=resume)
+            for kind in (PRODUCT_PARTITION, PRODUCT)}
+
+    pool = get_pool()
+    with pool.session(keyspace, host) as session:
+        dimensions = product_dimension_index(session)
+        with metrics.stage('partitions') as stage:
+            if workers <= 1:
+                stats = load_product_partition_data(
+                    session,
+                    batch=batch,
+                    read=read,
+                    dimensions=dimensions,
+                    journal=journals.get(PRODUCT_PARTITION))
+            else:
+                stats = load_sharded(
+                    pool.client(host), keyspace,
+                    load_product_partition_data,
+                    select_partition_adgroup_ids(), workers,
+                    batch=batch,
+                    read=read,
+                    dimensions=dimensions,
+                    journal=journals.get(PRODUCT_PARTITION))
+            stage.rows = stats.rows
+
+        # an item can be offered in several ad groups and shards, so
+        # products are loaded by a single writer
+        with metrics.stage('products') as stage:
+            products = load_product_data(
+                session,
+                batch=batch,
+                read=read,
+                dimensions=dimensions,
+                journal=journals.get(PRODUCT))
+            stage.rows = products.rows
+        stats.merge(products)
+
+    if store is not None:
+        store.bump_data_version(keyspace)
+    log.info(
+        f'Shopping structure imported: {stats.rows} rows in '
+        f'{stats.batches} batches, {stats.retries} retries, '
+        f'{len(stats.failed)} failed.')
+    return stats
 
 
-def import_shopping_criterion_structure(account: Account):
-    """Import shopping criterion (product partition)."""
+def sync_account_structure(
+        account: Account,
+        store: StateStore,
+        campaign_types: List[str] = None,
+        adgroup_types: List[str] = None,
+        include_paused: bool = False,
+        batch: BatchConfig = DEFAULT_BATCH,
+        read: ReadConfig = DEFAULT_READ,
+        host: str = GRAKN_SERVER) -> SyncStats:
+    """Apply the account structure changes since the last sync."""
     log.info(
-        'Importing the shopping criterion structure of '
+        f'Syncing the account structure of {account.account_name_extern}.')
+
+    keyspace = account.account_name
+    pool = get_pool()
+    with pool.session(keyspace, host) as session:
+        with metrics.stage('sync.campaigns') as stage:
+            stats = sync_records(
+                session, store, keyspace, CAMPAIGN,
+                campaign_records(campaign_types, include_paused, read),
+                batch)
+            stage.rows = stats.rows
+
+        with metrics.stage('sync.adgroups') as stage:
+            adgroups = sync_records(
+                session, store, keyspace, ADGROUP,
+                adgroup_records(adgroup_types, read=read),
+                batch)
+            stage.rows = adgroups.rows
+        stats.merge(adgroups)
+
+    store.bump_data_version(keyspace)
+    return stats
+
+
+def sync_shopping_criterion_structure(
+        account: Account,
+        store: StateStore,
+        batch: BatchConfig = DEFAULT_BATCH,
+        read: ReadConfig = DEFAULT_READ,
+        host: str = GRAKN_SERVER) -> SyncStats:
+    """Apply the product partition changes since the last sync."""
+    log.info(
+        'Syncing the shopping criterion structure of '
         f'{account.account_name_extern}.')
 
-    with GraknClient(uri=f"{args.host}:48555") as client:
-        with client.session(keyspace=account.account_name) as session:
-            load_product_partition_data(session)
+    keyspace = account.account_name
+    pool = get_pool()
+    with pool.session(keyspace, host) as session:
+        dimensions = product_dimension_index(session)
+        with metrics.stage('sync.partitions') as stage:
+            stats = sync_records(
+                session, store, keyspace, PRODUCT_PARTITION,
+                product_partition_records(dimensions, read=read),
+                batch)
+            stage.rows = stats.rows
+
+    store.bump_data_version(keyspace)
+    return stats
 
 
 parser = argparse.ArgumentParser()
@@ -257,25 +682,94 @@ parser.add_argument('-s', dest='host', default='localhost')
 parser.add_argument('--campaign-types', dest='campaign_types', nargs='*')
 parser.add_argument('--adgroup-types', dest='adgroup_types', nargs='*')
 
+# rows / estimated bytes per write transaction, 0 disables the limit
+parser.add_argument(
+    '--batch-size', dest='batch_size', type=int, default=DEFAULT_BATCH_SIZE)
+parser.add_argument(
+    '--batch-bytes', dest='batch_bytes', type=int,
+    default=DEFAULT_BATCH.bytes)
+
+# rows per source query / rows read ahead of the writers, 0 disables
+parser.add_argument(
+    '--page-size', dest='page_size', type=int, default=DEFAULT_PAGE_SIZE)
+parser.add_argument(
+    '--prefetch', dest='prefetch', type=int, default=DEFAULT_READ.prefetch)
+# ad group ids per IN list when a load is filtered by ad group
+parser.add_argument(
+    '--id-chunk', dest='id_chunk', type=int, default=DEFAULT_ID_CHUNK)
+
+# concurrent loaders, each with its own session
+parser.add_argument('--workers', dest='workers', type=int, default=1)
+
+# only apply the changes since the last sync, tracked in the state file
+parser.add_argument('--sync', action='store_true')
+parser.add_argument('--state', dest='state_path', default=DEFAULT_STATE_PATH)
+
+# continue an interrupted import from the journal in the state file
+parser.add_argument('--resume', action='store_true')
+
+# send metrics to statsd at host[:port], write the run summary as JSON
+parser.add_argument('--statsd', dest='statsd_host')
+parser.add_argument(
+    '--statsd-prefix', dest='statsd_prefix', default=metrics.DEFAULT_PREFIX)
+parser.add_argument('--summary', dest='summary_path')
+
 actions = parser.add_mutually_exclusive_group(required=True)
 actions.add_argument('--account', action='store_true')
 actions.add_argument('--shopping', action='store_true')
 
-args = parser.parse_args()
-
 if __name__ == '__main__':
+    args = parser.parse_args()
+
     adspert_app.init('scripts', 'development')
     configure_db()
 
     account = get_account(args.adspert_id)
     dbs.account.setup(account)
 
-    if args.account:
+    batch = BatchConfig(size=args.batch_size, bytes=args.batch_bytes)
+    read = ReadConfig(
+        page_size=args.page_size,
+        prefetch=args.prefetch,
+        id_chunk=args.id_chunk)
+
+    store = StateStore(args.state_path)
+    metrics.configure(args.statsd_host, prefix=args.statsd_prefix)
+
+    if args.account and args.sync:
+        sync_account_structure(
+            account,
+            store,
+            campaign_types=args.campaign_types,
+            adgroup_types=args.adgroup_types,
+            include_paused=False,
+            batch=batch,
+            read=read,
+            host=args.host)
+    elif args.account:
         import_account_structure(
             account,
             campaign_types=args.campaign_types,
             adgroup_types=args.adgroup_types,
-            include_paused=False)
-
-    if args.shopping:
-        import_shopping_criterion_structure(account)
+            include_paused=False,
+            batch=batch,
+            read=read,
+            workers=args.workers,
+            host=args.host,
+            store=store,
+            resume=args.resume)
+
+    if args.shopping and args.sync:
+        sync_shopping_criterion_structure(
+            account, store, batch=batch, read=read, host=args.host)
+    elif args.shopping:
+        import_shopping_criterion_structure(
+            account,
+            batch=batch,
+            read=read,
+            workers=args.workers,
+            host=args.host,
+            store=store,
+            resume=args.resume)
+
+    metrics.log_summary(args.summary_path)
@@ -0,0 +1,410 @@
+from array import array
+
+from models.shopping_campaign import ShoppingCampaign
+from models.shopping_campaign import build_nodes
+from models.shopping_campaign_node import SPLIT_THRESHOLD
+from models.shopping_campaign_node import ShoppingCampaignNode
+from models.splitting import split_leaves
+
+NONE = -1
+
+# 64 bit signed, 'l' is only 32 bit on Windows. Python 2 has no 'q', its
+# 'l' is 64 bit on the 64 bit Linux and macOS builds.
+try:
+    array('q')
+    INT64 = 'q'
+except ValueError:
+    INT64 = 'l'
+
+NODE_TYPES = list(ShoppingCampaignNode.NodeType)
+# by member and by value, rows may have either
+NODE_TYPE_CODES = dict((t, i) for i, t in enumerate(NODE_TYPES))
+NODE_TYPE_CODES.update((t.value, i) for i, t in enumerate(NODE_TYPES))
+
+# columns kept for every node, anything else goes to the sparse extras
+COLUMNS = ('id', 'name', 'parent', 'node_type', 'clicks', 'value')
+
+
+class CompactNode(object):
+    """ View of one node of a `CompactShoppingCampaign`.
+
+        Views are created on demand and hold no data of their own, so
+        keep the tree rather than the views around. """
+
+    __slots__ = ('_tree', '_i')
+
+    def __init__(self, tree, i):
+        self._tree = tree
+        self._i = i
+
+    @property
+    def identifier(self):
+        return self._tree._ids[self._i]
+
+    @property
+    def tag(self):
+        return self._tree._interned[self._tree._names[self._i]]
+
+    name = tag
+
+    @property
+    def value(self):
+        code = self._tree._values[self._i]
+        if code == NONE:
+            # not set, or not hashable and kept in the extras
+            raise AttributeError('value')
+        return self._tree._interned[code]
+
+    @property
+    def node_type(self):
+        return NODE_TYPES[self._tree._node_types[self._i]]
+
+    @property
+    def clicks(self):
+        return self._tree._clicks[self._i]
+
+    @clicks.setter
+    def clicks(self, value):
+        self._tree._clicks[self._i] = value
+
+    def is_leaf(self):
+        return self._tree._first_child[self._i] == NONE
+
+    def is_root(self):
+        return self._tree._parents[self._i] == NONE
+
+    def __getattr__(self, name):
+        try:
+            return self._tree._extras[self._i][name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __eq__(self, other):
+        return (isinstance(other, CompactNode) and
+                self._tree is other._tree and self._i == other._i)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((id(self._tree), self._i))
+
+    def __repr__(self):
+        return 'CompactNode(tag=%r, identifier=%r)' % (
+            self.tag, self.identifier)
+
+
+class CompactShoppingCampaign(object):
+    """ `ShoppingCampaign` stored in flat arrays instead of treelib nodes.
+
+        The tree is kept as parent, first child, last child and next
+        sibling positions (32 bit), plus typed columns for `node_type`,
+        `clicks`, depth and category level. Names and the `value` of
+        split nodes are codes into a table of interned values, as most
+        of them repeat. A `CompactNode` view is made when a node is asked
+        for. Node ids have to be integers. Removed nodes leave unused
+        slots behind until `compact` is called. """
+
+    def __init__(self):
+        self._index = {}
+        self._ids = array(INT64)
+        # distinct names and values, and their codes by type and value
+        self._interned = []
+        self._codes = {}
+        self._names = array('i')
+        self._values = array('i')
+        self._parents = array('i')
+        self._first_child = array('i')
+        self._last_child = array('i')
+        self._next_sibling = array('i')
+        self._node_types = array('B')
+        self._clicks = array(INT64)
+        self._depths = array('H')
+        self._category_levels = array('H')
+        # position -> attributes of the row other than the columns
+        self._extras = {}
+        self.root = None
+        self.create_root_node()
+
+    # ------------------------------------------------------------------
+    # building
+
+    def create_root_node(self):
+        self.root = 1
+        self._append(1, 'Animals', NONE, NODE_TYPE_CODES[
+            ShoppingCampaignNode.node_type], 0)
+
+    def _parent_id(self, data):
+        parent = data.get('parent')
+        return self.root if parent is None else parent
+
+    def create_node(self, data):
+        """ Add the node of one row, its parent has to exist already.
+            See `create_nodes` for many rows in any order. """
+        try:
+            nid, name = data['id'], data['name']
+        except KeyError:
+            raise ValueError(
+                "Node not created, malformed data provided: %r" % (data, ))
+        if nid in self._index:
+            raise ValueError("Node %r exists already" % (nid, ))
+        parent = self._position(self._parent_id(data))
+
+        node_type = data.get('node_type', ShoppingCampaignNode.node_type)
+        try:
+            code = NODE_TYPE_CODES[node_type]
+        except KeyError:
+            raise ValueError("Unknown node type %r" % (node_type, ))
+        extras = dict((k, v) for k, v in data.items() if k not in COLUMNS)
+        value = NONE
+        if 'value' in data:
+            try:
+                value = self._intern(data['value'])
+            except TypeError:
+                extras['value'] = data['value']
+        i = self._append(
+            nid, name, parent, code,
+            data.get('clicks', ShoppingCampaignNode.clicks), value)
+        if extras:
+            self._extras[i] = extras
+
+    def create_nodes(self, rows):
+        """ Add the nodes of `rows`, given in any order, in one pass.
+            See `models.shopping_campaign.build_nodes`. """
+        return build_nodes(self, rows)
+
+    def _intern(self, value):
+        """ The code of `value` in the interned values. """
+        # by type as well, 1 and True are equal keys
+        key = (type(value), value)
+        code = self._codes.get(key)
+        if code is None:
+            code = self._codes[key] = len(self._interned)
+            self._interned.append(value)
+        return code
+
+    def _append(self, nid, name, parent, node_type, clicks, value=NONE):
+        i = len(self._ids)
+        self._index[nid] = i
+        self._ids.append(nid)
+        self._names.append(self._intern(name))
+        self._values.append(value)
+        self._parents.append(NONE)
+        self._first_child.append(NONE)
+        self._last_child.append(NONE)
+        self._next_sibling.append(NONE)
+        self._node_types.append(node_type)
+        self._clicks.append(clicks)
+        self._depths.append(0)
+        self._category_levels.append(0)
+        if parent != NONE:
+            self._link(i, parent)
+            self._index_position(i)
+        return i
+
+    # ------------------------------------------------------------------
+    # links
+
+    def _position(self, nid):
+        try:
+            return self._index[nid]
+        except KeyError:
+            raise KeyError("Node %r is not in the tree" % (nid, ))
+
+    def _link(self, i, parent):
+        """ Append `i` to the children of `parent`. """
+        self._parents[i] = parent
+        self._next_sibling[i] = NONE
+        last = self._last_child[parent]
+        if last == NONE:
+            self._first_child[parent] = i
+        else:
+            self._next_sibling[last] = i
+        self._last_child[parent] = i
+
+    def _unlink(self, i):
+        """ Take `i` out of the children of its parent. """
+        parent = self._parents[i]
+        prev = NONE
+        child = self._first_child[parent]
+        while child != i:
+            prev, child = child, self._next_sibling[child]
+
+        following = self._next_sibling[i]
+        if prev == NONE:
+            self._first_child[parent] = following
+        else:
+            self._next_sibling[prev] = following
+        if self._last_child[parent] == i:
+            self._last_child[parent] = prev
+        self._parents[i] = NONE
+        self._next_sibling[i] = NONE
+
+    def _child_positions(self, i):
+        child = self._first_child[i]
+        while child != NONE:
+            yield child
+            child = self._next_sibling[child]
+
+    def _subtree_positions(self, i):
+        """ `i` and all positions below it, parents first. """
+        stack = [i]
+        while stack:
+            i = stack.pop()
+            yield i
+            stack.extend(reversed(list(self._child_positions(i))))
+
+    def _index_position(self, i):
+        """ Derive depth and category level of `i` from its parent. """
+        parent = self._parents[i]
+        self._depths[i] = self._depths[parent] + 1
+        level = self._category_levels[parent]
+        if (self._parents[parent] != NONE and
+                NODE_TYPES[self._node_types[parent]] ==
+                ShoppingCampaignNode.NodeType.CATEGORY):
+            level += 1
+        self._category_levels[i] = level
+
+    # ------------------------------------------------------------------
+    # changes
+
+    def move_node(self, source, destination):
+        i = self._position(source)
+        parent = self._position(destination)
+        if self._is_ancestor(i, parent):
+            raise ValueError("Cannot move %r below itself" % (source, ))
+        self._unlink(i)
+        self._link(i, parent)
+        for sub in self._subtree_positions(i):
+            self._index_position(sub)
+
+    def _is_ancestor(self, i, j):
+        """ Whether `i` is `j` or one of its ancestors. """
+        while j != NONE:
+            if j == i:
+                return True
+            j = self._parents[j]
+        return False
+
+    def remove_node(self, identifier):
+        """ Remove a node and everything below it, return the count. """
+        i = self._position(identifier)
+        if self._parents[i] == NONE:
+            raise ValueError("Cannot remove the root")
+        self._unlink(i)
+        removed = list(self._subtree_positions(i))
+        for sub in removed:
+            del self._index[self._ids[sub]]
+            self._extras.pop(sub, None)
+            self._names[sub] = NONE
+            self._values[sub] = NONE
+            self._first_child[sub] = NONE
+            self._last_child[sub] = NONE
+        return len(removed)
+
+    def compact(self):
+        """ Rebuild the arrays without the slots of removed nodes. """
+        tree = CompactShoppingCampaign()
+        for row in self._rows():
+            tree.create_node(row)
+        self.__dict__.update(tree.__dict__)
+
+    def _rows(self):
+        """ The rows of all nodes but the root, parents first. """
+        for i in self._subtree_positions(self._index[self.root]):
+            if self._parents[i] == NONE:
+                continue
+            row = dict(self._extras.get(i, ()))
+            if self._values[i] != NONE:
+                row['value'] = self._interned[self._values[i]]
+            row.update(
+                id=self._ids[i], name=self._interned[self._names[i]],
+                parent=self._ids[self._parents[i]],
+                node_type=NODE_TYPES[self._node_types[i]],
+                clicks=self._clicks[i])
+            yield row
+
+    # ------------------------------------------------------------------
+    # queries, as `treelib.Tree`
+
+    def __contains__(self, nid):
+        return nid in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def __getitem__(self, nid):
+        return CompactNode(self, self._position(nid))
+
+    def get_node(self, nid):
+        i = self._index.get(nid)
+        return None if i is None else CompactNode(self, i)
+
+    def all_nodes_itr(self):
+        """ All nodes, parents first. """
+        for i in self._subtree_positions(self._index[self.root]):
+            yield CompactNode(self, i)
+
+    def all_nodes(self):
+        return list(self.all_nodes_itr())
+
+    def leaves(self, nid=None):
+        start = self._position(self.root if nid is None else nid)
+        return [
+            CompactNode(self, i) for i in self._subtree_positions(start)
+            if self._first_child[i] == NONE]
+
+    def parent(self, nid):
+        parent = self._parents[self._position(nid)]
+        return None if parent == NONE else CompactNode(self, parent)
+
+    def is_branch(self, nid):
+        return [
+            self._ids[i]
+            for i in self._child_positions(self._position(nid))]
+
+    def children(self, nid):
+        return [
+            CompactNode(self, i)
+            for i in self._child_positions(self._position(nid))]
+
+    def level(self, nid):
+        return self._depths[self._position(nid)]
+
+    def get_ancestors(self, node, include_root=False):
+        """ Ids of the ancestors of `node`, nearest first. """
+        ancestors = []
+        parent = self._parents[self._position(node.identifier)]
+        while parent != NONE:
+            if include_root or self._parents[parent] != NONE:
+                ancestors.append(self._ids[parent])
+            parent = self._parents[parent]
+        return ancestors
+
+    def get_category_level(self, node_id):
+        """ Return at what category level the given `node` is at.
+            (type, subtype or sub-subtype etc) """
+        return self._category_levels[self._position(node_id)]
+
+    def split_leaf(self, node_id, offers=None, **kwargs):
+        """ See `ShoppingCampaign.split_leaf`. """
+        if offers is not None:
+            offers = {node_id: offers}
+        return split_leaves(self, offers, leaf_ids=[node_id], **kwargs)
+
+    def split_leaves(self, offers=None, threshold=SPLIT_THRESHOLD, **kwargs):
+        """ See `models.splitting.split_leaves`. """
+        return split_leaves(self, offers, threshold, **kwargs)
+
+    # ------------------------------------------------------------------
+    # conversion
+
+    def to_tree(self):
+        """ The same tree as a treelib based `ShoppingCampaign`. """
+        tree = ShoppingCampaign()
+        for row in self._rows():
+            tree.create_node(row)
+        return tree
+
+    def show(self, **kwargs):
+        return self.to_tree().show(**kwargs)
@@ -0,0 +1,106 @@
+import numpy as np
+
+METRICS = ('clicks', 'cost', 'impressions', 'conversions')
+
+
+class SubtreeRollup(object):
+    """ Per node metrics of a campaign tree and their subtree totals.
+
+        The nodes are laid out in post-order, so the subtree of the node
+        at position `p` is the range `p - sizes[p] + 1 .. p` and the
+        totals of all nodes come from one prefix sum over their own
+        values (`refresh`). `update` changes the stats of a batch of
+        nodes, e.g. leaves with new stats, and only adds the differences
+        along their ancestor paths.
+
+        Works with `ShoppingCampaign` and `CompactShoppingCampaign`. The
+        layout is taken when the rollup is created, create a new one
+        after the tree changed shape. `clicks` are read from the nodes,
+        the other metrics start at zero. """
+
+    def __init__(self, campaign):
+        order = []
+        parent_of = {}
+        stack = [(campaign.root, False)]
+        while stack:
+            nid, done = stack.pop()
+            if done:
+                order.append(nid)
+                continue
+            stack.append((nid, True))
+            for child in reversed(campaign.is_branch(nid)):
+                parent_of[child] = nid
+                stack.append((child, False))
+
+        self.index = dict((nid, i) for i, nid in enumerate(order))
+        parents = [self.index.get(parent_of.get(nid), -1) for nid in order]
+
+        # children come before their parent in post-order
+        sizes = [1] * len(order)
+        for i, parent in enumerate(parents):
+            if parent >= 0:
+                sizes[parent] += sizes[i]
+
+        self.ids = np.array(order, dtype=np.int64)
+        self.parents = np.array(parents, dtype=np.int64)
+        self.sizes = np.array(sizes, dtype=np.int64)
+
+        self.values = np.zeros((len(METRICS), len(order)))
+        self.values[METRICS.index('clicks')] = [
+            getattr(campaign[nid], 'clicks', 0) for nid in order]
+        self.totals = np.zeros_like(self.values)
+        self.refresh()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def positions(self, ids):
+        return np.array([self.index[nid] for nid in ids], dtype=np.int64)
+
+    def refresh(self):
+        """ Recompute the subtree totals of all nodes. """
+        n = len(self)
+        sums = np.zeros((len(METRICS), n + 1))
+        np.cumsum(self.values, axis=1, out=sums[:, 1:])
+        end = np.arange(1, n + 1)
+        self.totals = sums[:, end] - sums[:, end - self.sizes]
+
+    def load(self, metric, ids, values):
+        """ Set the own `metric` of the nodes `ids` and refresh all totals.
+
+            Cheaper than `update` when most nodes change. """
+        self.values[METRICS.index(metric), self.positions(ids)] = values
+        self.refresh()
+
+    def update(self, ids, **metrics):
+        """ Set the own stats of the nodes `ids`, one value per id and
+            metric, e.g. `update([4, 7], cost=[1.5, 0.3])`, and update the
+            totals of them and their ancestors. """
+        pos = self.positions(ids)
+        if len(np.unique(pos)) != len(pos):
+            raise ValueError("Node ids of an update have to be unique")
+
+        for metric, values in metrics.items():
+            row = METRICS.index(metric)
+            values = np.asarray(values, dtype=float)
+            delta = values - self.values[row, pos]
+            self.values[row, pos] = values
+
+            # one step up the tree for all nodes of the batch at once
+            p = pos
+            while len(p):
+                np.add.at(self.totals[row], p, delta)
+                up = self.parents[p]
+                keep = up >= 0
+                p, delta = up[keep], delta[keep]
+
+    def total(self, nid, metric=None):
+        """ The subtree totals of `nid`, all metrics or just `metric`. """
+        i = self.index[nid]
+        if metric is not None:
+            return self.totals[METRICS.index(metric), i]
+        return dict(zip(METRICS, self.totals[:, i]))
+
+    def column(self, metric):
+        """ Subtree totals of `metric` of all nodes, aligned to `ids`. """
+        return self.totals[METRICS.index(metric)]
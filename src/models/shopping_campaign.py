@@ -1,66 +1,260 @@
+from collections import deque
+
 import treelib
 from treelib import Node, Tree
 
+from models.shopping_campaign_node import SPLIT_THRESHOLD
 from models.shopping_campaign_node import ShoppingCampaignNode
+from models.splitting import split_leaves
+
+
+class BuildResult(object):
+    """ Outcome of `ShoppingCampaign.create_nodes`.
+
+        created     ids of the nodes added, parents first
+        orphans     id -> parent id, for rows whose parent does not exist
+        cycles      lists of ids whose parents form a cycle
+        detached    ids below an orphan or a cycle, not added either
+        duplicates  ids given more than once, the first row is used
+        malformed   rows without an `id` or `name` """
+
+    def __init__(self):
+        self.created = []
+        self.orphans = {}
+        self.cycles = []
+        self.detached = []
+        self.duplicates = []
+        self.malformed = []
+
+    @property
+    def ok(self):
+        return not (self.orphans or self.cycles or self.duplicates or
+                    self.malformed)
+
+    def __repr__(self):
+        return ('BuildResult(created=%d, orphans=%d, cycles=%d, '
+                'detached=%d, duplicates=%d, malformed=%d)' % (
+                    len(self.created), len(self.orphans), len(self.cycles),
+                    len(self.detached), len(self.duplicates),
+                    len(self.malformed)))
+
+
+def build_nodes(campaign, rows):
+    """ Add the nodes of `rows`, given in any order, to `campaign`.
+
+        The rows are ordered parents first with a breadth first walk from
+        the nodes already in the campaign, which is linear in the number
+        of rows. Rows without a `parent` go below the root. Rows that
+        cannot be placed are reported in the returned `BuildResult`
+        instead of raising. """
+    result = BuildResult()
+    by_id = {}
+    children = {}
+    for data in rows:
+        if 'id' not in data or 'name' not in data:
+            result.malformed.append(data)
+            continue
+        nid = data['id']
+        if nid in by_id or nid in campaign:
+            result.duplicates.append(nid)
+            continue
+        by_id[nid] = data
+        children.setdefault(campaign._parent_id(data), []).append(nid)
+
+    queue = deque(pid for pid in children if pid in campaign)
+    while queue:
+        for nid in children.pop(queue.popleft(), ()):
+            campaign.create_node(by_id.pop(nid))
+            result.created.append(nid)
+            queue.append(nid)
+
+    # what is left hangs below a missing parent or a cycle
+    _classify(by_id, campaign._parent_id, result)
+    return result
+
+
+def _classify(by_id, parent_id, result):
+    """ Sort unplaced rows into orphans, cycles and detached ids.
+
+        Every row has a single parent, so following the parents from each
+        row ends at a missing node or runs into a cycle. Each row is
+        visited once. """
+    state = {}
+    for start in by_id:
+        path = []
+        nid = start
+        while nid in by_id and nid not in state:
+            state[nid] = path
+            path.append(nid)
+            nid = parent_id(by_id[nid])
+
+        if nid not in by_id:
+            # the top of the path has a missing parent
+            result.orphans[path[-1]] = nid
+            result.detached.extend(path[:-1])
+        elif state[nid] is path:
+            # ran into the current path: a new cycle
+            at = path.index(nid)
+            result.cycles.append(path[at:])
+            result.detached.extend(path[:at])
+        else:
+            # joins a path classified before
+            result.detached.extend(path)
 
 
 class ShoppingCampaign(Tree):
-    
+    """ Product partition tree of a shopping campaign.
+
+        The depth and category level of every node are kept up to date
+        as nodes are added, moved, pasted and removed, so `level` and
+        `get_category_level` are dictionary lookups. """
+
     def __init__(self):
+        # node id -> depth, the root is at 0
+        self._depths = {}
+        # node id -> number of category nodes above it (root excluded)
+        self._category_levels = {}
         super(ShoppingCampaign, self).__init__()
         self.create_root_node()
 
     def create_node(self, data):
-        
+        """ Add the node of one row, its parent has to exist already.
+            See `create_nodes` for many rows in any order. """
+        self.add_node(self._make_node(data), parent=self._parent_id(data))
+
+    def _make_node(self, data):
         try:
             node = ShoppingCampaignNode(data['id'], data['name'])
-            node.factory(data)
         except KeyError:
-            print "Node not created, malformed data provided"
+            raise ValueError(
+                "Node not created, malformed data provided: %r" % (data, ))
+        node.factory(data)
+        return node
 
-        try:
-            super(ShoppingCampaign, self).add_node(node, parent=data.get('parent', 0))
-        except Exception:
-            print data
-            raise
+    def _parent_id(self, data):
+        parent = data.get('parent')
+        return self.root if parent is None else parent
+
+    def create_nodes(self, rows):
+        """ Add the nodes of `rows`, given in any order, in one pass.
+            See `build_nodes`. """
+        return build_nodes(self, rows)
 
     def create_root_node(self):
         super(ShoppingCampaign, self).create_node('Animals', 1)
 
+    def add_node(self, node, parent=None):
+        super(ShoppingCampaign, self).add_node(node, parent=parent)
+        self._index_node(node.identifier)
+
+    def move_node(self, source, destination):
+        super(ShoppingCampaign, self).move_node(source, destination)
+        self._index_subtree(source)
+
+    def remove_node(self, identifier):
+        removed = list(self._subtree(identifier))
+        count = super(ShoppingCampaign, self).remove_node(identifier)
+        self._forget(removed)
+        return count
+
+    def remove_subtree(self, nid, *args, **kwargs):
+        """ Remove `nid` and everything below it, return them as a plain
+            `treelib.Tree`. """
+        removed = [] if nid is None else list(self._subtree(nid))
+        subtree = super(ShoppingCampaign, self).remove_subtree(
+            nid, *args, **kwargs)
+        self._forget(removed)
+        return subtree
+
+    def paste(self, nid, new_tree, *args, **kwargs):
+        root = new_tree.root
+        super(ShoppingCampaign, self).paste(nid, new_tree, *args, **kwargs)
+        if root is not None:
+            self._index_subtree(root)
+
+    def link_past_node(self, nid):
+        children = list(self.is_branch(nid))
+        super(ShoppingCampaign, self).link_past_node(nid)
+        self._forget([nid])
+        for child in children:
+            self._index_subtree(child)
+
+    def _clone(self, identifier=None, with_tree=False, deep=False):
+        # subtrees taken out of a campaign are plain trees, they have no
+        # root node of their own
+        return Tree(
+            tree=self if with_tree else None, deep=deep,
+            identifier=identifier)
+
+    def _forget(self, nids):
+        for nid in nids:
+            self._depths.pop(nid, None)
+            self._category_levels.pop(nid, None)
+
+    def _is_category(self, nid):
+        node = self[nid]
+        return (nid != self.root and
+                getattr(node, 'node_type', None) ==
+                ShoppingCampaignNode.NodeType.CATEGORY)
+
+    def _index_node(self, nid):
+        """ Derive depth and category level of `nid` from its parent. """
+        parent = self.parent(nid)
+        if parent is None:
+            self._depths[nid] = 0
+            self._category_levels[nid] = 0
+            return
+
+        pid = parent.identifier
+        self._depths[nid] = self._depths[pid] + 1
+        self._category_levels[nid] = (
+            self._category_levels[pid] + int(self._is_category(pid)))
+
+    def _subtree(self, nid):
+        """ Ids of `nid` and all nodes below it, parents first. """
+        stack = [nid]
+        while stack:
+            nid = stack.pop()
+            yield nid
+            stack.extend(self.is_branch(nid))
+
+    def _index_subtree(self, nid):
+        for sub in self._subtree(nid):
+            self._index_node(sub)
+
+    def level(self, nid, filter=None):
+        if filter is not None:
+            return super(ShoppingCampaign, self).level(nid, filter)
+        return self._depths[nid]
+
     def get_ancestors(self, node, include_root=False):
-        root = 1
+        """ Ids of the ancestors of `node`, nearest first. """
         ancestors = []
-        while node.identifier != root:
-            if node.identifier == 1:
-                ancestors.append(1)
-                return ancestors
-            else:
-                print node
-                node = self.get_node(node.parent)
-                if not include_root and node.identifier == 1:
-                    continue
-                ancestors.append(node.identifier)
-
+        parent = self.parent(node.identifier)
+        while parent is not None:
+            if include_root or parent.identifier != self.root:
+                ancestors.append(parent.identifier)
+            parent = self.parent(parent.identifier)
         return ancestors
 
     def get_category_level(self, node_id):
         """ Return at what category level the given `node` is at.
             (type, subtype or sub-subtype etc) """
-        node = self.get_node(node_id)
-        ancestors = self.get_ancestors(node, False)
-        print ancestors
-        level = len([n for n in ancestors if self.get_node(n).node_type ==
-            ShoppingCampaignNode.NodeType.CATEGORY])
-
-        return level
+        return self._category_levels[node_id]
 
-    def split_leaf(self, node_id):
+    def split_leaf(self, node_id, offers=None, **kwargs):
+        """ Split the leaf `node_id` on the next dimension of its offers,
+            whatever their count. `offers` are the offers of the leaf,
+            by default its `offers` attribute. See `split_leaves`. """
         node = self.get_node(node_id)
-        if node.is_segment:
+        if getattr(node, 'is_segment', False):
             # cannot split on a segment
             return None
-        
-        # make a bunch of
-
-
+        if offers is not None:
+            offers = {node_id: offers}
+        return split_leaves(self, offers, leaf_ids=[node_id], **kwargs)
 
+    def split_leaves(self, offers=None, threshold=SPLIT_THRESHOLD, **kwargs):
+        """ Split all leaves with more than `threshold` offers in one
+            batch. See `models.splitting.split_leaves`. """
+        return split_leaves(self, offers, threshold, **kwargs)
@@ -16,10 +16,23 @@ class ShoppingCampaignNode(Node):
 
     node_type = NodeType.PRODUCT
     clicks = 0
+    is_segment = False
 
     def __init__(self, id, name):
         super(ShoppingCampaignNode, self).__init__(name, id)
 
     def factory(self, payload):
-        for k, v in payload.iteritems():
+        for k, v in payload.items():
             setattr(self, k, v)
+
+
+# order in which leaves above `SPLIT_THRESHOLD` offers are split, the
+# product dimension is the item id
+SPLIT_DIMENSIONS = (
+    ShoppingCampaignNode.NodeType.CATEGORY,
+    ShoppingCampaignNode.NodeType.BRAND,
+    ShoppingCampaignNode.NodeType.PRODUCT,
+    ShoppingCampaignNode.NodeType.COLOR,
+    ShoppingCampaignNode.NodeType.SIZE,
+    ShoppingCampaignNode.NodeType.GENDER,
+)
@@ -0,0 +1,157 @@
+from collections import Counter
+
+from models.shopping_campaign_node import SPLIT_DIMENSIONS
+from models.shopping_campaign_node import SPLIT_THRESHOLD
+from models.shopping_campaign_node import ShoppingCampaignNode
+
+EVERYTHING_ELSE = 'Everything else'
+
+CATEGORY = ShoppingCampaignNode.NodeType.CATEGORY
+
+
+class SplitResult(object):
+    """ Outcome of `split_leaves`.
+
+        created     rows of the nodes added, children of a leaf first and
+                    its "everything else" node last
+        split       leaf id -> dimension it was split on
+        unsplit     ids of leaves above the threshold without a dimension
+                    that tells their offers apart
+        offers      new node id -> its offers, to split it further """
+
+    def __init__(self):
+        self.created = []
+        self.split = {}
+        self.unsplit = []
+        self.offers = {}
+
+    def __repr__(self):
+        return 'SplitResult(split=%d, created=%d, unsplit=%d)' % (
+            len(self.split), len(self.created), len(self.unsplit))
+
+
+def offer_value(offer, dimension, category_level=0):
+    """ Value of `offer` for `dimension`, `None` if it has none.
+
+        Offers are dicts keyed by the dimension values of `NodeType`,
+        `product` being the item id. A category is either one value or
+        a sequence of values from the top level down, `category_level`
+        picks one of them. """
+    value = offer.get(dimension.value)
+    if dimension == CATEGORY and isinstance(value, (list, tuple)):
+        return value[category_level] if category_level < len(value) else None
+    if dimension == CATEGORY and category_level:
+        # a single category value is the top level only
+        return None
+    return value
+
+
+def split_levels(campaign, nid):
+    """ The dimensions used above and at `nid`, and the category level
+        the next category split of `nid` would be at. """
+    path = [nid] + campaign.get_ancestors(campaign[nid])
+    used = set()
+    levels = 0
+    for pid in path:
+        if pid == campaign.root:
+            continue
+        node_type = campaign[pid].node_type
+        if node_type == CATEGORY:
+            levels += 1
+        else:
+            used.add(node_type)
+    return used, levels
+
+
+def histogram(offers, dimension, category_level=0):
+    """ `Counter` of the values of `offers` for `dimension`, offers
+        without a value are counted under `None`. """
+    return Counter(
+        offer_value(offer, dimension, category_level) for offer in offers)
+
+
+def choose_dimension(offers, dimensions=SPLIT_DIMENSIONS, category_level=0):
+    """ The first of `dimensions` whose values split `offers` into at
+        least two groups and its histogram, `(None, None)` if there is
+        none. Histograms are only made until a dimension is found. """
+    for dimension in dimensions:
+        counts = histogram(offers, dimension, category_level)
+        if len(counts) > 1:
+            return dimension, counts
+    return None, None
+
+
+def split_leaves(campaign, offers=None, threshold=SPLIT_THRESHOLD,
+                 leaf_ids=None, max_children=None,
+                 dimensions=SPLIT_DIMENSIONS):
+    """ Split every leaf of `campaign` with more than `threshold` offers.
+
+        `offers` maps a leaf id to the offers of the leaf, leaves that are
+        not in it use their own `offers` attribute. A leaf is split on the
+        first of `dimensions` that is not used on its path yet (categories
+        go one level deeper each time) and tells its offers apart. It gets
+        a unit per value, most offers first and at most `max_children`,
+        and an "everything else" unit for the remaining offers.
+
+        The nodes of all leaves are collected first and added in a single
+        `create_nodes` batch at the end. Split leaves become subdivisions,
+        new units still above the threshold are split by the next run,
+        see `SplitResult.offers`. `leaf_ids` limits the leaves looked at,
+        they are split regardless of `threshold` then. """
+    if offers is None:
+        offers = {}
+    result = SplitResult()
+    if leaf_ids is None:
+        leaf_ids = [n.identifier for n in campaign.leaves()]
+        threshold_applies = True
+    else:
+        threshold_applies = False
+
+    next_id = max(n.identifier for n in campaign.all_nodes_itr()) + 1
+    for nid in leaf_ids:
+        node = campaign[nid]
+        if (campaign.is_branch(nid) or
+                getattr(node, 'is_segment', False)):
+            # cannot split a subdivision or a segment
+            continue
+        leaf_offers = offers.get(nid)
+        if leaf_offers is None:
+            leaf_offers = getattr(node, 'offers', ())
+        if threshold_applies and len(leaf_offers) <= threshold:
+            continue
+
+        used, level = split_levels(campaign, nid)
+        candidates = [
+            d for d in dimensions if d == CATEGORY or d not in used]
+        dimension, counts = choose_dimension(leaf_offers, candidates, level)
+        if dimension is None:
+            result.unsplit.append(nid)
+            continue
+
+        values = [
+            v for v, _ in counts.most_common() if v is not None]
+        if max_children is not None:
+            values = values[:max_children]
+
+        child_ids = {}
+        for value in values:
+            child_ids[value] = next_id
+            result.created.append({
+                'id': next_id, 'name': '%s' % (value, ), 'parent': nid,
+                'node_type': dimension, 'value': value})
+            result.offers[next_id] = []
+            next_id += 1
+        other = next_id
+        next_id += 1
+        result.created.append({
+            'id': other, 'name': EVERYTHING_ELSE, 'parent': nid,
+            'node_type': dimension, 'value': None})
+        result.offers[other] = []
+
+        for offer in leaf_offers:
+            value = offer_value(offer, dimension, level)
+            result.offers[child_ids.get(value, other)].append(offer)
+        result.split[nid] = dimension
+
+    campaign.create_nodes(result.created)
+    return result
@@ -1,17 +1,36 @@
 import argparse
 import functools
 import logging
-import pprint
-from collections import deque
+import sys
+from typing import List
+from typing import Sequence
+from typing import Set
 
 # from adspert.scripts.utils import get_account
 # from adspert.base.app import adspert_app
 # from adspert.database.db import configure_db
-from grakn.client import GraknClient
 from grakn.client import DataType
 from grakn.client import Session
 
+import cache
+import metrics
 import schema
+from pooling import get_pool
+from rollout import DEFAULT_WORKERS
+from rollout import GLOB_CHARS
+from rollout import RolloutStats
+from rollout import read_keyspace_file
+from rollout import resolve_keyspaces
+from rollout import rollout
+from describe import DEFAULT_SNAPSHOT_DIR
+from describe import drop_snapshot
+from describe import format_concept
+from describe import format_schema
+from describe import load_snapshot
+from describe import save_snapshot
+from describe import snapshot_schema
+from state import DEFAULT_STATE_PATH
+from state import StateStore
 
 
 log = logging.getLogger(__name__)
@@ -20,76 +39,129 @@ log.setLevel(logging.DEBUG)
 ROOT_NODE_ID = 293946777986
 
 
-def apply_schema(keyspace: str, name: str):
-    to_apply = schema.SCHEMA_MODULE_MAP[name]
-    with GraknClient(uri='localhost:48555') as client:
-        for schema_module in to_apply:
-            # mod = importlib.import_module(schema_module)
-
-            log.info(f'Applying Schema `{schema_module.__name__}`')
-            concepts = schema_module.create_concepts(client, keyspace)
-
-            # print concept descriptions
-            for concept_name, concept_ids in concepts.items():
-                print(f'\n{concept_name.title()}:')
+def apply_schema(
+        keyspace: str,
+        name: str,
+        store: StateStore = None,
+        force: bool = False,
+        host: str = 'localhost',
+        describe: bool = True,
+        snapshot_dir: str = DEFAULT_SNAPSHOT_DIR,
+        rules: Sequence[str] = ()) -> bool:
+    """Define schema `name` on `keyspace` in a single write transaction.
+
+    `rules` are the optional rules of the schema to define as well, the
+    other optional rules are undefined if the keyspace has them.
+    With a `store` the fingerprint of the applied schema is recorded per
+    host and keyspace, and the apply is skipped while it is unchanged and
+    the keyspace still has the schema, unless `force` is set.
+    The schema snapshot of the keyspace (see `describe`) is refreshed and
+    printed when `describe` is set, and dropped otherwise. Returns
+    whether the schema was applied.
+    """
+    payload = schema.compile_schema(name, rules)
+    fingerprint = schema.schema_fingerprint(payload)
+    unchanged = (
+        store is not None and not force and
+        store.schema_fingerprint(host, keyspace, name) == fingerprint)
+
+    with get_pool().session(keyspace, host) as session:
+        if unchanged and has_schema(session, name):
+            log.info(f'Schema `{name}` of `{keyspace}` is up to date.')
+            metrics.incr('schema.unchanged')
+            return False
+
+        log.info(f'Applying Schema `{name}` to `{keyspace}`')
+        with metrics.stage(f'schema.{name}') as stage:
+            with session.transaction().write() as tx:
+                list(tx.query(payload))
+                dropped = set(schema.optional_rules(name)) - set(rules)
+                dropped = sorted(dropped & defined_rules(tx))
+                if dropped:
+                    log.info(f'Undefining rules {dropped} of `{keyspace}`')
+                    list(tx.query(schema.undefine_rules(dropped)))
+                with metrics.timer('grakn.commit'):
+                    tx.commit()
+            stage.rows = len(schema.schema_statements(name, rules))
+
+        cache.invalidate()
+        if store is not None:
+            store.save_schema_fingerprint(host, keyspace, name, fingerprint)
+            # rules change query results as well
+            store.bump_data_version(keyspace)
+
+        if describe:
+            snapshot = snapshot_schema(session, keyspace)
+            save_snapshot(snapshot, snapshot_dir)
+        else:
+            drop_snapshot(keyspace, snapshot_dir)
 
-                with client.session(keyspace=keyspace) as session:
-                    partial = functools.partial(
-                        describe_concept_type, session)
-                    deque(map(partial, concept_ids), 0)
+    # print concept descriptions
+    if describe:
+        labels = schema.schema_labels(name, rules)
+        del labels['attributes']
+        print(format_schema(snapshot, labels))
 
-        log.info('Schema Updated')
+    log.info(f'Schema of `{keyspace}` Updated')
+    return True
 
 
-def describe_concept_type(session: Session, concept_id):
+def has_schema(session: Session, name: str) -> bool:
+    """Whether the keyspace of `session` defines the types of schema
+    `name`, e.g. not after it was dropped and created again."""
+    label = schema.schema_labels(name)['entities'][0]
     with session.transaction().read() as tx:
-        concept = tx.get_concept(concept_id)
+        return tx.get_schema_concept(label) is not None
 
-        if concept.is_thing():
-            concept = concept.type()
 
-        label = concept.label()
+def defined_rules(tx) -> Set[str]:
+    """The labels of the rules defined in the keyspace of `tx`."""
+    return {
+        answer.get('x').label()
+        for answer in tx.query('match $x sub rule; get;')} - {'rule'}
 
-        if concept.is_entity_type():
-            thing_type = 'an entity'
-        elif concept.is_attribute_type():
-            thing_type = 'an attribute'
-        elif concept.is_relation_type():
-            thing_type = 'a relation'
-        elif concept.is_rule():
-            thing_type = 'an inference rule'
-        else:
-            thing_type = 'Unknown'
-
-        attrs = keys = roles = []
-        if hasattr(concept, 'keys'):
-            keys = [k.label() for k in concept.keys()]
-        if hasattr(concept, 'attributes'):
-            attrs = [a.label() for a in concept.attributes()]
-        if hasattr(concept, 'playing'):
-            roles = [r.label() for r in concept.playing()
-                     if not r.label().startswith('@')]
-
-        print(f'\n{label} with id {concept_id} is {thing_type}')
-
-        if concept.is_rule():
-            print('\nRule definition:')
-            print(f'\twhen: {concept.get_when()}')
-            print(f'\tthen: {concept.get_then()}\n\n')
-        else:
-            if keys:
-                print('\nKeys: ', end='')
-                pprint.pprint(keys)
 
-            print('\nAttributes: ', end='')
-            fattrs = '\n' + pprint.pformat(attrs) if attrs else 'None'
-            print(fattrs)
+def rollout_schema(
+        keyspaces: List[str],
+        name: str,
+        store: StateStore = None,
+        force: bool = False,
+        host: str = 'localhost',
+        workers: int = DEFAULT_WORKERS,
+        snapshot_dir: str = DEFAULT_SNAPSHOT_DIR,
+        rules: Sequence[str] = ()) -> RolloutStats:
+    """Apply schema `name` to many keyspaces concurrently.
 
-            print('Roles: ', end='')
-            froles = '\n' + pprint.pformat(roles) if roles else 'None'
-            print(froles, end='\n' + str('-' * 79)+ '\n')
+    `keyspaces` are names or glob patterns matched against the keyspaces
+    of the server. All workers share the pooled client of `host`.
+    """
+    keyspaces = resolve_keyspaces(get_pool().client(host), keyspaces)
+    task = functools.partial(
+        apply_schema, name=name, store=store, force=force, host=host,
+        describe=False, snapshot_dir=snapshot_dir, rules=rules)
+    return rollout(keyspaces, task, workers, name=f'schema `{name}`')
+
+
+def describe_schema(
+        keyspace: str,
+        concept: str = None,
+        refresh: bool = False,
+        host: str = 'localhost',
+        snapshot_dir: str = DEFAULT_SNAPSHOT_DIR) -> str:
+    """Describe one `concept` or the whole schema of `keyspace`.
+
+    Uses the local snapshot of the keyspace unless there is none yet or
+    `refresh` is set. Raises `KeyError` for an unknown `concept`.
+    """
+    snapshot = None if refresh else load_snapshot(keyspace, snapshot_dir)
+    if snapshot is None:
+        with get_pool().session(keyspace, host) as session:
+            snapshot = snapshot_schema(session, keyspace)
+        save_snapshot(snapshot, snapshot_dir)
 
-        tx.close()
+    if concept:
+        return format_concept(snapshot.get(concept))
+    return format_schema(snapshot)
 
 
 def _relationship(label, tx):
@@ -122,8 +194,14 @@ def put_common_attributes(session: Session):
 
 parser = argparse.ArgumentParser()
 parser.add_argument('-a', dest='adspert_id', required=False)
-parser.add_argument('-k', dest='keyspace', required=True)
-parser.add_argument('-n', dest='schema_name', required=True)
+# keyspace names or glob patterns, more than one rolls the schema out
+parser.add_argument('-k', dest='keyspaces', nargs='*', default=[])
+parser.add_argument('--keyspace-file', dest='keyspace_file')
+parser.add_argument(
+    '--workers', dest='workers', type=int, default=DEFAULT_WORKERS)
+parser.add_argument('-n', dest='schema_name')
+# also define an optional rule of the schema, can be repeated
+parser.add_argument('--rule', dest='rules', action='append', default=[])
 
 actions = parser.add_mutually_exclusive_group(required=True)
 actions.add_argument('--apply', action='store_true')
@@ -132,22 +210,66 @@ actions.add_argument('--describe', action='store_true')
 # optional
 parser.add_argument('-s', dest='host', default='localhost')
 
+# describe a single concept, re-read the schema instead of the snapshot
+parser.add_argument('-c', dest='concept')
+parser.add_argument('--refresh', action='store_true')
+
+# skip applying an unchanged schema, tracked in the state file
+parser.add_argument('--state', dest='state_path', default=DEFAULT_STATE_PATH)
+parser.add_argument('--force', action='store_true')
+
+# send metrics to statsd at host[:port], write the run summary as JSON
+parser.add_argument('--statsd', dest='statsd_host')
+parser.add_argument(
+    '--statsd-prefix', dest='statsd_prefix', default=metrics.DEFAULT_PREFIX)
+parser.add_argument('--summary', dest='summary_path')
+
 
 def main(args):
-    keyspace = args.keyspace
+    keyspaces = list(args.keyspaces)
+    if args.keyspace_file:
+        keyspaces.extend(read_keyspace_file(args.keyspace_file))
+    if not keyspaces:
+        parser.error('no keyspace given (-k or --keyspace-file)')
+
     schema = args.schema_name
+    metrics.configure(args.statsd_host, prefix=args.statsd_prefix)
 
+    many = len(keyspaces) > 1 or any(
+        GLOB_CHARS & set(k) for k in keyspaces)
+    status = 0
     if args.apply:
-        apply_schema(keyspace, schema)
+        if not schema:
+            parser.error('--apply requires a schema name (-n)')
+        store = StateStore(args.state_path)
+        if many:
+            stats = rollout_schema(
+                keyspaces, schema, store, force=args.force,
+                host=args.host, workers=args.workers, rules=args.rules)
+            for keyspace, error in sorted(stats.failed.items()):
+                print(f'{keyspace}: {error}')
+            status = 1 if stats.failed else 0
+        else:
+            apply_schema(
+                keyspaces[0], schema, store, force=args.force,
+                host=args.host, rules=args.rules)
     elif args.describe:
-        # concept or entire schema?
-        pass
+        if many:
+            parser.error('--describe takes a single keyspace')
+        try:
+            print(describe_schema(
+                keyspaces[0], args.concept, refresh=args.refresh,
+                host=args.host))
+        except KeyError:
+            parser.error(
+                f'unknown concept `{args.concept}` in `{keyspaces[0]}`')
 
-    return 0
+    metrics.log_summary(args.summary_path)
+    return status
 
 
 if __name__ == '__main__':
     # adspert_app.init('scripts', 'development')
     # configure_db()
     args = parser.parse_args()
-    main(args)
+    sys.exit(main(args))
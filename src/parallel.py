@@ -0,0 +1,88 @@
+"""Run a loader concurrently over shards of ad group ids.
+
+Each shard is loaded by a worker thread with its own Grakn session. All
+rows of an ad group end up in the same shard and are written in source
+order, so everything within an ad group (e.g. parent partitions before
+their children) keeps its ordering. Ordering between entity types is left
+to the caller: run the loaders for parents (campaigns, ad groups) to
+completion before the loaders for their children.
+
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
+from typing import Callable
+from typing import List
+from typing import Sequence
+from typing import Tuple
+
+from grakn.client import GraknClient
+
+from writer import WriteStats
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+
+# more shards than workers keeps the pool busy when ad groups are skewed
+SHARDS_PER_WORKER = 4
+
+
+def shard_ids(ids: Sequence[int], shards: int) -> List[Tuple[int, ...]]:
+    """Split `ids` round robin into at most `shards` non-empty tuples."""
+    ids = sorted(set(ids))
+    if not ids:
+        return []
+    shards = max(1, min(shards, len(ids)))
+    return [tuple(ids[i::shards]) for i in range(shards)]
+
+
+def _load_shard(
+        client: GraknClient,
+        keyspace: str,
+        load: Callable,
+        ids: Tuple[int, ...],
+        kwargs: dict) -> WriteStats:
+    with client.session(keyspace=keyspace) as session:
+        return load(session, adgroup_ids=ids, **kwargs)
+
+
+def _shard_kwargs(kwargs: dict, shard: int, shards: int) -> dict:
+    journal = kwargs.get('journal')
+    if journal is None:
+        return kwargs
+    return dict(kwargs, journal=journal.for_shard(shard, shards))
+
+
+def load_sharded(
+        client: GraknClient,
+        keyspace: str,
+        load: Callable,
+        adgroup_ids: Sequence[int],
+        workers: int,
+        **kwargs) -> WriteStats:
+    """Call `load(session, adgroup_ids=shard, **kwargs)` for every shard.
+
+    A `journal` keyword is replaced with one journal per shard. Returns the
+    merged `WriteStats` of all shards.
+    """
+    shards = shard_ids(adgroup_ids, workers * SHARDS_PER_WORKER)
+    name = load.__name__
+    log.info(
+        f'{name}: {len(adgroup_ids)} ad groups in {len(shards)} shards '
+        f'on {workers} workers.')
+
+    stats = WriteStats()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(
+                _load_shard, client, keyspace, load, ids,
+                _shard_kwargs(kwargs, i, len(shards)))
+            for i, ids in enumerate(shards)]
+
+        for done, future in enumerate(as_completed(futures), 1):
+            stats.merge(future.result())
+            log.info(
+                f'{name}: {done}/{len(shards)} shards, '
+                f'{stats.rows} rows, {len(stats.failed)} failed.')
+
+    return stats
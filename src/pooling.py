@@ -0,0 +1,288 @@
+"""Long-lived Grakn clients and sessions.
+
+Opening a `GraknClient` sets up a gRPC channel and opening a session
+loads the keyspace on the server, both cost a round trip or more. A
+`GraknPool` keeps one client per host and up to `max_sessions` sessions
+per (host, keyspace), so repeated imports and schema applies in the same
+process (e.g. scheduled Celery tasks) reuse them::
+
+    with get_pool().session(keyspace, host) as session:
+        load_campaign_data(session, ...)
+
+Pooled clients and sessions are health checked before they are handed
+out again when they have been idle for `check_after` seconds, or when
+the last block using them failed with a connection error. The checks
+run outside the pool lock, so a slow host does not hold up the others.
+Failing ones are replaced. Sessions still borrowed by other threads at
+that point are only marked stale and closed when they are returned,
+together with their client. The least recently used idle sessions are
+closed when there are more than `max_sessions`.
+
+"""
+import atexit
+import contextlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+from typing import Iterator
+from typing import Tuple
+
+from grakn.client import GraknClient
+from grakn.client import Session
+from grakn.exception.GraknError import GraknError
+
+import metrics
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+
+DEFAULT_HOST = 'localhost'
+DEFAULT_PORT = 48555
+DEFAULT_MAX_SESSIONS = 32
+# seconds a client or session may be idle before it is checked on reuse
+DEFAULT_CHECK_AFTER = 60.0
+
+
+@dataclass
+class _Entry:
+    value: Any
+    last_used: float
+    in_use: int = 0
+    suspect: bool = False
+    # out of the pool, closed when the last borrower returns it
+    stale: bool = False
+    # the client a session was opened with
+    client: Any = None
+
+
+def _close(value, what: str):
+    try:
+        value.close()
+    except Exception as e:
+        log.debug(f'Closing {what} failed: {e}')
+
+
+class GraknPool:
+    """Thread-safe pool of clients per host and sessions per keyspace."""
+
+    def __init__(
+            self,
+            max_sessions: int = DEFAULT_MAX_SESSIONS,
+            check_after: float = DEFAULT_CHECK_AFTER,
+            port: int = DEFAULT_PORT):
+        self.max_sessions = max_sessions
+        self.check_after = check_after
+        self.port = port
+
+        self._lock = threading.RLock()
+        self._clients = {}
+        # dropped client -> number of its stale sessions still borrowed
+        self._retired = {}
+        self._sessions: 'OrderedDict[Tuple[str, str], _Entry]' = \
+            OrderedDict()
+
+    # ------------------------------------------------------------------
+    # health checks
+
+    def _needs_check(self, entry: _Entry) -> bool:
+        return (entry.suspect or
+                time.monotonic() - entry.last_used > self.check_after)
+
+    def _client_ok(self, client: GraknClient) -> bool:
+        try:
+            client.keyspaces().retrieve()
+            return True
+        except Exception as e:
+            log.warning(f'Pooled client failed its health check: {e}')
+            return False
+
+    def _session_ok(self, session: Session) -> bool:
+        try:
+            session.transaction().read().close()
+            return True
+        except Exception as e:
+            log.warning(f'Pooled session failed its health check: {e}')
+            return False
+
+    # ------------------------------------------------------------------
+    # clients
+
+    def client(self, host: str = DEFAULT_HOST) -> GraknClient:
+        """The pooled client of `host`, do not close it."""
+        with self._lock:
+            entry = self._clients.get(host)
+            if entry is not None and not self._needs_check(entry):
+                metrics.incr('pool.client.reuse')
+                return self._use(entry)
+
+        if entry is not None:
+            ok = self._client_ok(entry.value)
+            with self._lock:
+                if self._clients.get(host) is entry:
+                    if ok:
+                        metrics.incr('pool.client.reuse')
+                        return self._use(entry)
+                    self._drop_client(host)
+
+        log.debug(f'Connecting to {host}:{self.port}.')
+        client = GraknClient(uri=f'{host}:{self.port}')
+        with self._lock:
+            entry = self._clients.get(host)
+            if entry is None:
+                metrics.incr('pool.client.connect')
+                entry = self._clients[host] = _Entry(client, time.monotonic())
+            else:
+                # another thread connected meanwhile
+                _close(client, f'client {host}')
+            return self._use(entry)
+
+    def _use(self, entry: _Entry):
+        entry.last_used = time.monotonic()
+        entry.suspect = False
+        return entry.value
+
+    def _drop_client(self, host: str):
+        entry = self._clients.pop(host, None)
+        for key in [k for k in self._sessions if k[0] == host]:
+            self._drop_session(key)
+        if entry is None:
+            return
+        if entry.value in self._retired:
+            # closed once its borrowed sessions are returned
+            return
+        _close(entry.value, f'client {host}')
+
+    def _drop_session(self, key: Tuple[str, str]):
+        """Take a session out of the pool, close it unless it is in use."""
+        entry = self._sessions.pop(key, None)
+        if entry is None:
+            return
+        if not entry.in_use:
+            _close(entry.value, f'session {key}')
+            return
+        entry.stale = True
+        if entry.client is not None:
+            self._retired[entry.client] = (
+                self._retired.get(entry.client, 0) + 1)
+
+    def _release(self, entry: _Entry):
+        """Close a stale session returned by its last borrower."""
+        _close(entry.value, 'stale session')
+        client = entry.client
+        if client not in self._retired:
+            return
+        self._retired[client] -= 1
+        if not self._retired[client]:
+            del self._retired[client]
+            if all(e.value is not client for e in self._clients.values()):
+                _close(client, 'retired client')
+
+    # ------------------------------------------------------------------
+    # sessions
+
+    @contextlib.contextmanager
+    def session(
+            self,
+            keyspace: str,
+            host: str = DEFAULT_HOST) -> Iterator[Session]:
+        """Borrow the pooled session of `keyspace` for the block.
+
+        The session is shared with other threads borrowing it at the same
+        time, which is fine as every user opens its own transactions.
+        """
+        key = (host, keyspace)
+        entry = self._checkout(key)
+        try:
+            yield entry.value
+        except GraknError:
+            # a failed query, the session itself is fine
+            raise
+        except Exception:
+            entry.suspect = True
+            raise
+        finally:
+            with self._lock:
+                entry.in_use -= 1
+                entry.last_used = time.monotonic()
+                if entry.stale and not entry.in_use:
+                    self._release(entry)
+                self._evict()
+
+    def _checkout(self, key: Tuple[str, str]) -> _Entry:
+        host, keyspace = key
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is not None and (
+                    entry.in_use or not self._needs_check(entry)):
+                metrics.incr('pool.session.reuse')
+                return self._borrow(key, entry)
+
+        if entry is not None:
+            # checked outside the lock, it takes a round trip
+            ok = self._session_ok(entry.value)
+            with self._lock:
+                if ok and self._sessions.get(key) is entry:
+                    metrics.incr('pool.session.reuse')
+                    return self._borrow(key, entry)
+                if not ok:
+                    if self._sessions.get(key) is entry:
+                        self._drop_session(key)
+                    # check the connection as well before the next session
+                    entry = self._clients.get(host)
+                    if entry is not None:
+                        entry.suspect = True
+
+        # opening a session takes a while, don't block the other keyspaces
+        client = self.client(host)
+        session = client.session(keyspace=keyspace)
+        metrics.incr('pool.session.open')
+
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is None:
+                entry = _Entry(session, time.monotonic(), client=client)
+                self._sessions[key] = entry
+            else:
+                # another thread opened one meanwhile
+                _close(session, f'session {key}')
+            return self._borrow(key, entry)
+
+    def _borrow(self, key: Tuple[str, str], entry: _Entry) -> _Entry:
+        self._sessions.move_to_end(key)
+        entry.in_use += 1
+        entry.suspect = False
+        return entry
+
+    def _evict(self):
+        idle = [k for k, e in self._sessions.items() if not e.in_use]
+        for key in idle[:max(0, len(self._sessions) - self.max_sessions)]:
+            _close(self._sessions.pop(key).value, f'session {key}')
+
+    def discard(self, keyspace: str, host: str = DEFAULT_HOST):
+        """Close the pooled session of `keyspace`, e.g. before deleting it."""
+        with self._lock:
+            self._drop_session((host, keyspace))
+
+    def close(self):
+        with self._lock:
+            for host in list(self._clients):
+                self._drop_client(host)
+            for key in list(self._sessions):
+                _close(self._sessions.pop(key).value, f'session {key}')
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> GraknPool:
+    """The process wide pool, closed at exit."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = GraknPool()
+            atexit.register(_pool.close)
+        return _pool
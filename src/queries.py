@@ -0,0 +1,248 @@
+"""Named partition queries with a versioned result cache.
+
+The queries in `gql/queries.gql` are the ones our tools and dashboards
+run over and over, e.g. the partition tree of an ad group. `Queries`
+runs them by name with parameters::
+
+    queries = Queries(StateStore())
+    rows = queries.run(keyspace, 'units', adgroup_id=1, parent_id=2)
+
+Results are lists of `{variable: value}` dicts, attribute values for
+attributes and concept ids for everything else. They are cached in a
+`ResultCache` keyed by keyspace, rendered query and the data version of
+the keyspace (see `state.StateStore.data_version`). Imports, syncs and
+schema applies bump the version, so the same query is answered from the
+cache until the next change of the keyspace. The least recently used
+results are evicted when the cache holds more than `max_entries` results
+or `max_rows` rows in total.
+
+"""
+import argparse
+import functools
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+from tabulate import tabulate
+
+import metrics
+from graql import literal
+from pooling import DEFAULT_HOST
+from pooling import get_pool
+from state import DEFAULT_STATE_PATH
+from state import StateStore
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+
+DEFAULT_QUERY_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'gql', 'queries.gql')
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_ROWS = 100000
+
+_name = re.compile(r'^#\s*name:\s*([\w-]+)\s*$')
+_param = re.compile(r'@(\w+)')
+
+Row = Dict[str, Any]
+CacheKey = Tuple[str, str, int]
+
+
+@dataclass
+class NamedQuery:
+    name: str
+    query: str
+    description: str = ''
+
+    @property
+    def params(self) -> List[str]:
+        return sorted(set(_param.findall(self.query)))
+
+    def render(self, **params) -> str:
+        """The query with the parameters replaced by Graql literals."""
+        missing = set(self.params) - set(params)
+        unknown = set(params) - set(self.params)
+        if missing or unknown:
+            raise ValueError(
+                f'Query `{self.name}` takes {self.params}, '
+                f'got {sorted(params)}')
+        return _param.sub(lambda m: literal(params[m.group(1)]), self.query)
+
+
+def parse_queries(text: str) -> Dict[str, NamedQuery]:
+    """The named queries of a query file, see `gql/queries.gql`."""
+    named = {}
+    current = None
+    for line in text.splitlines():
+        m = _name.match(line)
+        if m:
+            current = named[m.group(1)] = NamedQuery(m.group(1), '')
+        elif current is None:
+            continue
+        elif line.startswith('#'):
+            if not current.query:
+                comment = line.lstrip('#').strip()
+                current.description = (
+                    f'{current.description} {comment}'.strip())
+        elif line.strip():
+            current.query = f'{current.query}\n{line}'.strip()
+    return named
+
+
+def load_queries(path: str = DEFAULT_QUERY_PATH) -> Dict[str, NamedQuery]:
+    with open(path) as f:
+        return parse_queries(f.read())
+
+
+@functools.lru_cache(maxsize=None)
+def named_query(name: str) -> NamedQuery:
+    """Named query `name` of the default query file."""
+    return load_queries()[name]
+
+
+def answer_row(answer) -> Row:
+    """Map the concepts of a query answer to plain values."""
+    row = {}
+    for var, concept in answer.map().items():
+        row[var] = concept.value() if concept.is_attribute() else concept.id
+    return row
+
+
+class ResultCache:
+    """Thread-safe LRU cache of query results."""
+
+    def __init__(
+            self,
+            max_entries: int = DEFAULT_MAX_ENTRIES,
+            max_rows: int = DEFAULT_MAX_ROWS):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.rows = 0
+
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[CacheKey, List[Row]]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: CacheKey):
+        with self._lock:
+            rows = self._entries.get(key)
+            if rows is not None:
+                self._entries.move_to_end(key)
+            return rows
+
+    def put(self, key: CacheKey, rows: List[Row]):
+        if len(rows) > self.max_rows:
+            # would evict everything else
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.rows -= len(old)
+            self._entries[key] = rows
+            self.rows += len(rows)
+
+            while (len(self._entries) > self.max_entries or
+                   self.rows > self.max_rows):
+                _, evicted = self._entries.popitem(last=False)
+                self.rows -= len(evicted)
+                metrics.incr('query.cache.evict')
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.rows = 0
+
+
+class Queries:
+    """Run the named queries of `path` against the keyspaces of `host`."""
+
+    def __init__(
+            self,
+            store: StateStore,
+            host: str = DEFAULT_HOST,
+            cache: ResultCache = None,
+            path: str = DEFAULT_QUERY_PATH):
+        self.store = store
+        self.host = host
+        self.cache = cache if cache is not None else ResultCache()
+        self.named = load_queries(path)
+
+    def get(self, name: str) -> NamedQuery:
+        try:
+            return self.named[name]
+        except KeyError:
+            raise KeyError(f'No query named `{name}`') from None
+
+    def render(self, name: str, **params) -> str:
+        return self.get(name).render(**params)
+
+    def run(self, keyspace: str, name: str, **params) -> List[Row]:
+        """The result rows of query `name`, do not modify them."""
+        query = self.render(name, **params)
+        key = (keyspace, query, self.store.data_version(keyspace))
+
+        rows = self.cache.get(key)
+        if rows is not None:
+            metrics.incr('query.cache.hit')
+            return rows
+
+        metrics.incr('query.cache.miss')
+        with get_pool().session(keyspace, self.host) as session:
+            with metrics.timer(f'query.{name}'), \
+                    session.transaction().read() as tx:
+                rows = [answer_row(answer) for answer in tx.query(query)]
+
+        self.cache.put(key, rows)
+        return rows
+
+
+def parse_param(param: str) -> Tuple[str, Any]:
+    """`name=value` of the command line, numbers are converted."""
+    name, _, value = param.partition('=')
+    for convert in (int, float):
+        try:
+            return name, convert(value)
+        except ValueError:
+            pass
+    return name, value
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-k', dest='keyspace')
+parser.add_argument('-s', dest='host', default=DEFAULT_HOST)
+parser.add_argument('--state', dest='state_path', default=DEFAULT_STATE_PATH)
+parser.add_argument('--queries', dest='query_path', default=DEFAULT_QUERY_PATH)
+# list the named queries instead of running one
+parser.add_argument('--list', action='store_true')
+parser.add_argument('name', nargs='?')
+# parameters as name=value
+parser.add_argument('params', nargs='*', type=parse_param)
+
+
+def main(args):
+    queries = Queries(
+        StateStore(args.state_path), args.host, path=args.query_path)
+    if args.list or not args.name:
+        for named in queries.named.values():
+            params = ', '.join(named.params)
+            print(f'{named.name}({params}): {named.description}')
+        return
+
+    if not args.keyspace:
+        parser.error('running a query requires a keyspace (-k)')
+    rows = queries.run(args.keyspace, args.name, **dict(args.params))
+    print(tabulate(rows, headers='keys'))
+
+
+if __name__ == '__main__':
+    main(parser.parse_args())
@@ -0,0 +1,128 @@
+"""Run a per-keyspace task over many keyspaces on a bounded worker pool.
+
+Used to roll a schema out to every account keyspace in one run. The
+tasks share the pooled client (see `pooling`), each keyspace gets its own
+session. A failing keyspace is reported and does not stop the others.
+
+"""
+import fnmatch
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import List
+
+from grakn.client import GraknClient
+
+import metrics
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+
+DEFAULT_WORKERS = 4
+
+GLOB_CHARS = set('*?[')
+
+
+@dataclass
+class RolloutStats:
+    changed: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+    failed: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def done(self) -> int:
+        return len(self.changed) + len(self.unchanged) + len(self.failed)
+
+
+def read_keyspace_file(path: str) -> List[str]:
+    """Keyspace names or patterns, one per line, `#` starts a comment."""
+    with open(path) as f:
+        lines = (line.split('#', 1)[0].strip() for line in f)
+        return [line for line in lines if line]
+
+
+def resolve_keyspaces(
+        client: GraknClient,
+        patterns: Iterable[str]) -> List[str]:
+    """Expand glob `patterns` against the keyspaces of the server.
+
+    Plain names are kept as they are, so new keyspaces can be listed
+    explicitly. The server is only asked when there is a pattern.
+    """
+    patterns = list(patterns)
+    existing = None
+    keyspaces = {}
+    for pattern in patterns:
+        if not GLOB_CHARS & set(pattern):
+            keyspaces.setdefault(pattern, None)
+            continue
+
+        if existing is None:
+            existing = sorted(client.keyspaces().retrieve())
+        matches = fnmatch.filter(existing, pattern)
+        if not matches:
+            log.warning(f'No keyspace matches `{pattern}`.')
+        for keyspace in matches:
+            keyspaces.setdefault(keyspace, None)
+
+    return list(keyspaces)
+
+
+def _run(task: Callable, keyspace: str):
+    start = time.monotonic()
+    try:
+        return task(keyspace)
+    finally:
+        metrics.timing('rollout.keyspace', (time.monotonic() - start) * 1000)
+
+
+def rollout(
+        keyspaces: List[str],
+        task: Callable,
+        workers: int = DEFAULT_WORKERS,
+        name: str = 'rollout') -> RolloutStats:
+    """Call `task(keyspace)` for every keyspace.
+
+    `task` returns whether it changed the keyspace. Exceptions are logged
+    and collected in `RolloutStats.failed`.
+    """
+    log.info(f'{name}: {len(keyspaces)} keyspaces on {workers} workers.')
+
+    stats = RolloutStats()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {
+            pool.submit(_run, task, keyspace): keyspace
+            for keyspace in keyspaces}
+
+        for future in as_completed(futures):
+            keyspace = futures[future]
+            try:
+                changed = future.result()
+            except Exception as e:
+                log.exception(f'{name}: `{keyspace}` failed.')
+                stats.failed[keyspace] = f'{type(e).__name__}: {e}'
+                metrics.incr('rollout.failed')
+                outcome = 'failed'
+            else:
+                if changed:
+                    stats.changed.append(keyspace)
+                    outcome = 'changed'
+                else:
+                    stats.unchanged.append(keyspace)
+                    outcome = 'unchanged'
+                metrics.incr(f'rollout.{outcome}')
+
+            log.info(
+                f'{name}: {stats.done}/{len(keyspaces)} `{keyspace}` '
+                f'{outcome}.')
+
+    log.info(
+        f'{name}: {len(stats.changed)} changed, '
+        f'{len(stats.unchanged)} unchanged, {len(stats.failed)} failed.')
+    return stats
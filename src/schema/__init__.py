@@ -1,3 +1,23 @@
+"""Keyspace schemas.
+
+A schema is a list of modules, each with `ATTRIBUTES`, `ENTITIES`,
+`RELATIONS` and `RULES`: Graql `define` statements keyed by label.
+`compile_schema` combines the statements of all modules into a single
+`define` query, so a schema is applied with one write transaction, and
+`schema_fingerprint` identifies the result, so an unchanged schema does
+not have to be applied again.
+
+Modules may also have `OPTIONAL_RULES`, which are only defined when they
+are asked for by label, e.g. rules that infer what the loaders already
+write explicitly. `undefine_rules` drops the ones no longer asked for
+from keyspaces that still define them.
+
+"""
+import hashlib
+from typing import Dict
+from typing import List
+from typing import Sequence
+
 from . import account
 from . import shopping
 
@@ -6,3 +26,70 @@ SCHEMA_MODULE_MAP = {
     'base': (account, ),
     'shopping': (account, shopping, ),
 }
+
+# statement groups of a schema module, in define order
+KINDS = ('attributes', 'entities', 'relations', 'rules')
+
+
+def _definitions(module, kind: str, rules: Sequence[str]) -> Dict[str, str]:
+    definitions = getattr(module, kind.upper())
+    if kind == 'rules':
+        optional = getattr(module, 'OPTIONAL_RULES', {})
+        definitions = dict(definitions)
+        definitions.update(
+            (label, optional[label]) for label in rules if label in optional)
+    return definitions
+
+
+def optional_rules(name: str) -> List[str]:
+    """The labels of the optional rules of schema `name`."""
+    return [
+        label for module in SCHEMA_MODULE_MAP[name]
+        for label in getattr(module, 'OPTIONAL_RULES', {})]
+
+
+def undefine_rules(labels: Sequence[str]) -> str:
+    """A Graql `undefine` query for the rules `labels`."""
+    statements = [f'{label} sub rule;' for label in labels]
+    return 'undefine\n\n' + '\n'.join(statements) + '\n'
+
+
+def schema_statements(name: str, rules: Sequence[str] = ()) -> List[str]:
+    """The distinct define statements of schema `name`, in order.
+
+    `rules` are the labels of the optional rules to include.
+    """
+    unknown = set(rules) - set(optional_rules(name))
+    if unknown:
+        raise ValueError(
+            f'Schema `{name}` has no optional rules {sorted(unknown)}')
+
+    statements = {}
+    for module in SCHEMA_MODULE_MAP[name]:
+        for kind in KINDS:
+            for statement in _definitions(module, kind, rules).values():
+                statements.setdefault(statement.strip(), None)
+    return list(statements)
+
+
+def compile_schema(name: str, rules: Sequence[str] = ()) -> str:
+    """Schema `name` as a single Graql `define` query."""
+    statements = schema_statements(name, rules)
+    return 'define\n\n' + '\n\n'.join(statements) + '\n'
+
+
+def schema_fingerprint(payload: str) -> str:
+    """Fingerprint of a compiled schema."""
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def schema_labels(
+        name: str,
+        rules: Sequence[str] = ()) -> Dict[str, List[str]]:
+    """The labels defined by schema `name`, by kind."""
+    labels = {kind: {} for kind in KINDS}
+    for module in SCHEMA_MODULE_MAP[name]:
+        for kind in KINDS:
+            for label in _definitions(module, kind, rules):
+                labels[kind].setdefault(label, None)
+    return {kind: list(labels[kind]) for kind in KINDS}
@@ -1,271 +1,107 @@
-import logging
+"""Account structure: campaigns, ad groups and their criteria.
+
+Every concept is a Graql `define` statement keyed by its label, see
+`schema.compile_schema` for how the modules are combined.
 
-from grakn.client import DataType
-from grakn.client import GraknClient
-from grakn.client import Session
+"""
+import logging
 
 log = logging.getLogger(__name__)
 log.setLevel(logging.DEBUG)
 
 
 # ----------------------------------------------------------------------------
-# Public Functions
+# Attribute Definitions
 # ----------------------------------------------------------------------------
 
-def create_concepts(client: GraknClient, keyspace):
-    log.info(f'Creating `account` concepts on "{keyspace}"\n')
-    with client.session(keyspace=keyspace) as session:
-        relations = [
-            define_campaign_adgroup_relation(session),
-            define_adgroup_criterion_relation(session),
-        ]
-        entities = [
-            define_campaign_entity(session),
-            define_adgroup_entity(session),
-            define_abstract_criterion_entity(session),
-        ]
-        rules = [
-            define_adgroup_in_campaign_rule(session),
-            define_criterion_in_adgroup_rule(session),
-        ]
-
-    return {'entities': entities, 'relations': relations, 'rules': rules}
+ATTRIBUTES = {
+    'status': 'status sub attribute, datatype string;',
+    'campaign-id': 'campaign-id sub attribute, datatype long;',
+    'campaign-name': 'campaign-name sub attribute, datatype string;',
+    'aw-campaign-type': 'aw-campaign-type sub attribute, datatype string;',
+    'adgroup-id': 'adgroup-id sub attribute, datatype long;',
+    'adgroup-name': 'adgroup-name sub attribute, datatype string;',
+    'aw-adgroup-type': 'aw-adgroup-type sub attribute, datatype string;',
+    'criterion-id': 'criterion-id sub attribute, datatype long;',
+    'criterion-name': 'criterion-name sub attribute, datatype string;',
+    'crit-key': 'crit-key sub attribute, datatype long;',
+}
 
 
 # ----------------------------------------------------------------------------
 # Entity Definitions
 # ----------------------------------------------------------------------------
 
-def define_campaign_entity(session: Session):
-    """Campaign entity.
-
-    define
-
-    campaign-id sub attribute, datatype long;
-    campaign-name sub attribute, datatype string;
-    aw-campaign-type sub attribute, datatype string;
-
-    Campaign sub entity,
-        has campaign-id,
-        has campaign-name,
-        has aw-campaign-type,
-        has status,
-        plays campaign;
-
-    """
-    with session.transaction().write() as tx:
-        entity = tx.put_entity_type('Campaign')
-
-        # attributes
-        entity.has(tx.put_attribute_type(
-            'campaign-id', DataType.LONG))
-        entity.has(tx.put_attribute_type(
-            'campaign-name',
-            DataType.STRING))
-        entity.has(tx.put_attribute_type(
-            'status',
-            DataType.STRING))
-        entity.has(tx.put_attribute_type(
-            'aw-campaign-type',
-            DataType.STRING))
-
-        # roles
-        entity.plays(tx.put_role('campaign'))
-
-        id = entity.id
-
-        tx.commit()
-
-    return id
-
-
-def define_adgroup_entity(session: Session):
-    """AdGroup entity.
-
-    define
-
-    adgroup-id sub attribute, datatype long;
-    adgroup-name sub attribute, datatype string;
-    aw-adgroup-type sub attribute, datatype long;
-
-    AdGroup sub entity,
-        has adgroup-id,
-        has campaign-id,
-        has adgroup-name,
-        has status,
-        has aw-adgroup-type,
-        plays parent
-        plays child
-        plays adgroup;
-
-    """
-    with session.transaction().write() as tx:
-        entity = tx.put_entity_type('AdGroup')
-
-        # attributes
-        entity.has(tx.put_attribute_type(
-            'adgroup-id', DataType.LONG))
-        entity.has(tx.put_attribute_type(
-            'campaign-id', DataType.LONG))
-        entity.has(tx.put_attribute_type(
-            'adgroup-name', DataType.STRING))
-        entity.has(tx.put_attribute_type(
-            'status', DataType.STRING))
-        entity.has(tx.put_attribute_type(
-            'aw-adgroup-type', DataType.STRING))
-
-        # roles
-        entity.plays(tx.put_role('adgroup'))
-
-        id = entity.id
-
-        tx.commit()
-
-    return id
-
-
-def define_abstract_criterion_entity(session: Session):
-    """Criterion entity.
-
-    define
-
-    criterion-id sub attribute, datatype long;
-    criterion-name sub attribute, datatype long;
-    crit-key sub attribute, datatype long;
-
-    Criterion sub entity is-abstract,
-        has adgroup-id,
-        has criterion-id,
-        has criterion-name,
-        has crit-key,
-        has status,
-        plays biddable-criterion;
-
-    """
-    with session.transaction().write() as tx:
-        criterion = tx.put_entity_type('Criterion')
-        criterion.is_abstract(True)
-        id = criterion.id
-
-        # attributes
-        criterion.has(tx.put_attribute_type(
-            'adgroup-id', DataType.LONG))
-        criterion.has(tx.put_attribute_type(
-            'criterion-id', DataType.LONG))
-        criterion.has(tx.put_attribute_type(
-            'crit-key', DataType.LONG))
-        criterion.has(tx.put_attribute_type(
-            'criterion-name', DataType.STRING))
-        criterion.has(tx.put_attribute_type(
-            'status', DataType.STRING))
-
-        # roles
-        criterion.plays(tx.put_role('biddable-criterion'))
-
-        tx.commit()
-
-    return id
+ENTITIES = {
+    'Campaign': """
+Campaign sub entity,
+    has campaign-id,
+    has campaign-name,
+    has status,
+    has aw-campaign-type,
+    plays campaign;""",
+
+    'AdGroup': """
+AdGroup sub entity,
+    has adgroup-id,
+    has campaign-id,
+    has adgroup-name,
+    has status,
+    has aw-adgroup-type,
+    plays adgroup;""",
+
+    'Criterion': """
+Criterion sub entity, abstract,
+    has adgroup-id,
+    has criterion-id,
+    has crit-key,
+    has criterion-name,
+    has status,
+    plays biddable-criterion;""",
+}
 
 
 # ----------------------------------------------------------------------------
 # Relation Definitions
 # ----------------------------------------------------------------------------
 
-def define_campaign_adgroup_relation(session: Session):
-    """AdGroup in Campaign.
-
-    define
-
-    campaign-adgroup sub relation,
-        relates campaign,
-        relates adgroup;
-
-    """
-    with session.transaction().write() as tx:
-        rel = tx.put_relation_type('campaign-adgroup')
-        id = rel.id
-
-        rel.relates(tx.put_role('campaign'))
-        rel.relates(tx.put_role('adgroup'))
-
-        tx.commit()
-
-    return id
-
-
-def define_adgroup_criterion_relation(session: Session):
-    """Criterion in AdGroup.
-
-    define
-
-    adgroup-criterion sub relation,
-        relates adgroup,
-        relates biddable-criterion;
+RELATIONS = {
+    # AdGroup in Campaign
+    'campaign-adgroup': """
+campaign-adgroup sub relation,
+    relates campaign,
+    relates adgroup;""",
 
-    """
-    with session.transaction().write() as tx:
-        rel = tx.put_relation_type('adgroup-criterion')
-        id = rel.id
-
-        rel.relates(tx.put_role('adgroup'))
-        rel.relates(tx.put_role('biddable-criterion'))
-
-        tx.commit()
-
-    return id
+    # Criterion in AdGroup
+    'adgroup-criterion': """
+adgroup-criterion sub relation,
+    relates adgroup,
+    relates biddable-criterion;""",
+}
 
 
 # ----------------------------------------------------------------------------
 # Rules
 # ----------------------------------------------------------------------------
 
-def define_adgroup_in_campaign_rule(session: Session):
-    """Infer campaign-adgroup relations via matching campaign-id."""
-    q = """define
-    adgroup-in-campaign sub rule,
-    when {
-      $c isa Campaign, has campaign-id $c-id;
-      $a isa AdGroup, has campaign-id $c-id;
-    }, then {
-      (campaign: $c, adgroup: $a) isa campaign-adgroup;
-    };"""
-
-    with session.transaction().write() as tx:
-        when = ('$c isa Campaign, has campaign-id $c-id; '
-                '$a isa AdGroup, has campaign-id $c-id;')
-
-        then = '(campaign: $c, adgroup: $a) isa campaign-adgroup;'
-
-        tx.query(q)
-        rule = tx.get_schema_concept('adgroup-in-campaign')
-        id = rule.id
-
-        tx.commit()
-
-    return id
-
-
-def define_criterion_in_adgroup_rule(session: Session):
-    """Infer adgroup-criterion relations via matching adgroup-id."""
-    q = """define
-    criterion-in-adgroup sub rule,
-    when {
-      $a isa AdGroup, has adgroup-id $a-id;
-      $c isa Criterion, has adgroup-id $a-id;
-    }, then {
-      (adgroup: $a, biddable-criterion: $c) isa adgroup-criterion;
-    };"""
-    with session.transaction().write() as tx:
-        when = ('$adgroup isa AdGroup, has adgroup-id $adgroup-id; '
-                '$criterion isa Criterion, has adgroup-id $adgroup-id;')
-
-        then = ('(adgroup: $adgroup, biddable-criterion: $criterion) '
-                'isa campaign-adgroup;')
-
-        tx.query(q)
-        rule = tx.get_schema_concept('adgroup-in-campaign')
-        id = rule.id
-
-        tx.commit()
-
-    return id
+RULES = {
+    # infer campaign-adgroup relations via matching campaign-id
+    'adgroup-in-campaign': """
+adgroup-in-campaign sub rule,
+when {
+  $c isa Campaign, has campaign-id $c-id;
+  $a isa AdGroup, has campaign-id $c-id;
+}, then {
+  (campaign: $c, adgroup: $a) isa campaign-adgroup;
+};""",
+
+    # infer adgroup-criterion relations via matching adgroup-id
+    'criterion-in-adgroup': """
+criterion-in-adgroup sub rule,
+when {
+  $a isa AdGroup, has adgroup-id $a-id;
+  $c isa Criterion, has adgroup-id $a-id;
+}, then {
+  (adgroup: $a, biddable-criterion: $c) isa adgroup-criterion;
+};""",
+}
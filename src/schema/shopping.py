@@ -1,320 +1,169 @@
-import logging
+"""Shopping structure: product partitions, dimensions and products.
+
+Builds on `schema.account`, which has to be defined first.
 
-from grakn.client import DataType
-from grakn.client import GraknClient
-from grakn.client import Session
+"""
+import logging
 
 log = logging.getLogger(__name__)
 log.setLevel(logging.DEBUG)
 
+
 # ----------------------------------------------------------------------------
-# Public Functions
+# Attribute Definitions
 # ----------------------------------------------------------------------------
 
-def create_concepts(client: GraknClient, keyspace):
-    log.info(f'Creating `account` concepts on "{keyspace}"\n')
-    with client.session(keyspace=keyspace) as session:
-        relations = [
-            define_ancestorship_relation(session),
-            define_node_heirarchy_relation(session),
-            define_sibling_relation(session),
-            define_offer_relationship(session),
-            define_case_value_relation(session),
-            # define_subdivision_relation(session), WIP still
-        ]
-        entities = [
-            define_product_partition_entity(session),
-            define_entity_product_dimension(session),
-            define_entity_product(session),
-        ]
-        rules = [
-            define_infer_node_hierarchy_rule(session),
-            define_transitive_ancestorship_rule(session),
-            define_node_adjacency_rule(session),
-        ]
-
-    return {'entities': entities, 'relations': relations, 'rules': rules}
+ATTRIBUTES = {
+    'parent-id': 'parent-id sub attribute, datatype long;',
+    'partition-type': 'partition-type sub attribute, datatype string;',
+    'dimension-type': 'dimension-type sub attribute, datatype string;',
+    'dimension-value': 'dimension-value sub attribute, datatype string;',
+    'item-id': 'item-id sub attribute, datatype string;',
+    'title': 'title sub attribute, datatype string;',
+    # number of levels between an ancestor and a descendant partition
+    'depth': 'depth sub attribute, datatype long;',
+}
 
 
 # ----------------------------------------------------------------------------
 # Entity Definitions
 # ----------------------------------------------------------------------------
 
-def define_product_partition_entity(session: Session):
-    """ProductPartition entity
-
-    define
-
-    parent-id sub criterion-id, datatype long;
-    partition-type sub attribute, datatype string;
-
-    ProductPartition sub criterion,
-        has adgroup-id,
-        has parent-id,
-        has partition-type,
-        plays product-partition,
-        plays parent;
-
-    """
-    with session.transaction().write() as tx:
-        ent = tx.put_entity_type('ProductPartition')
-        ent.sup(tx.get_schema_concept('Criterion'))
-
-        ent.has(tx.put_attribute_type(
-            'adgroup-id', DataType.LONG))
-        ent.has(tx.put_attribute_type(
-            'parent-id', DataType.LONG))
-        ent.has(tx.put_attribute_type(
-            'partition-type', DataType.STRING))
-
-        ent.plays(tx.put_role('product-partition'))
-        ent.plays(tx.put_role('parent-node'))
-        ent.plays(tx.put_role('child-node'))
-
-        id = ent.id
-
-        tx.commit()
-
-    return id
-
-
-def define_entity_product_dimension(session: Session):
-    """Product Dimension entity.
-
-    define
-
-    dimension-type sub attribute, datatype string;
-
-    ProductDimension sub entity,
-        has dimension-type,
-        plays product-dimension;
-
-    """
-
-    with session.transaction().write() as tx:
-        entity = tx.put_entity_type('ProductDimension')
-        id = entity.id
-
-        entity.has(tx.put_attribute_type('dimension-type', DataType.STRING))
-
-        entity.plays(tx.put_role('product-dimension'))
-
-        tx.commit()
-
-    return id
-
-
-def define_entity_product(session: Session):
-    """Product entity.
-
-    define
-
-    item-id sub attribute, datatype string;
-    title sub attribute, datatype string;
-
-    Product sub entity,
-        has item-id,
-        has title,
-        plays product;
-
-    """
-    with session.transaction().write() as tx:
-        entity = tx.put_entity_type('Product')
-        entity.has(tx.put_attribute_type('item-id', DataType.STRING))
-        entity.has(tx.put_attribute_type('title', DataType.STRING))
-        # entity.plays(tx.put_role('product'))
-
-        id = entity.id
-
-        tx.commit()
-
-    return id
+ENTITIES = {
+    'ProductPartition': """
+ProductPartition sub Criterion,
+    has adgroup-id,
+    has parent-id,
+    has partition-type,
+    plays product-partition,
+    plays parent-node,
+    plays child-node,
+    plays ancestor,
+    plays descedent,
+    plays group-parent,
+    plays sibling;""",
+
+    'ProductDimension': """
+ProductDimension sub entity,
+    has dimension-type,
+    plays product-dimension;""",
+
+    'Product': """
+Product sub entity,
+    has item-id,
+    has title,
+    plays product;""",
+
+    # defined in `schema.account`
+    'AdGroup': """
+AdGroup plays ad-group;""",
+}
 
 
 # ----------------------------------------------------------------------------
 # Relation Definitions
 # ----------------------------------------------------------------------------
 
-def define_node_heirarchy_relation(session: Session):
-    """A basic heirarchical relationship.
-
-    define
-
-    parent-child sub relationship,
-        relates parent,
-        relates child,
-        plays ancestor,
-        plays descendent;
-
-    ancestorship sub relationship,
-        relates ancestor,
-        relates descedent;
-
-    """
-    with session.transaction().write() as tx:
-        rel = tx.put_relation_type('node-heirarchy')
-        id = rel.id
-
-        rel.relates(tx.put_role('parent-node'))
-        rel.relates(tx.put_role('child-node'))
-
-        rel.plays(tx.put_role('ancestor'))
-        rel.plays(tx.put_role('descedent'))
-
-        tx.commit()
-
-    return id
-
-
-def define_ancestorship_relation(session: Session):
-    """Relate two node heirarchies."""
-    with session.transaction().write() as tx:
-        rel = tx.put_relation_type('ancestorship')
-        id = rel.id
-
-        rel.relates(tx.put_role('ancestor'))
-        rel.relates(tx.put_role('descedent'))
-
-        tx.commit()
-
-    return id
-
-
-def define_sibling_relation(session: Session):
-    with session.transaction().write() as tx:
-        rel = tx.put_relation_type('siblings')
-        id = rel.id
-
-        rel.relates(tx.put_role('child-node'))
-
-        tx.commit()
-
-    return id
-
-
-def define_offer_relationship(session: Session):
-    q = """
-    define
-
-    product-offer sub relation,
-        relates product,
-        relates ad-group;
-    """
-    with session.transaction().write() as tx:
-        tx.query(q)
-        id = tx.get_schema_concept('product-offer').id
-
-        tx.commit()
-
-    return id
-
-
-def define_case_value_relation(session: Session):
-    """Relate Product Partitions to Product Dimensions.
-
-    define
-
-    dimension-value sub attribute, datatype string;
-
-    case-value sub relationship,
-        relates product-dimension,
-        relates product-partition,
-        has dimension-value;
-
-    """
-    with session.transaction().write() as tx:
-        rel = tx.put_relation_type('case-value')
-        id = rel.id
-
-        rel.has(tx.put_attribute_type('dimension-value', DataType.STRING))
-
-        rel.relates(tx.put_role('product-dimension'))
-        rel.relates(tx.put_role('product-partition'))
-
-        tx.commit()
-
-    return id
-
-
-def define_subdivision_relation(session: Session):
-    with session.transaction().write() as tx:
-        log.info('adding relationship "subdivision"')
-
-        rel = tx.put_relation_type('subdivision')
-        rel.relates(tx.put_role('parent'))
-        rel.relates(tx.put_role('dimension-value'))
-        # rel.relates(tx.put_role('product-partition'))
-        rel.has(tx.put_attribute_type('dimension-type', DataType.STRING))
-
-        tx.get_schema_concept('value').plays(
-            tx.put_role('dimension-value'))
-
-        id = rel.id
-        tx.commit()
-
-    return id
+RELATIONS = {
+    # relate a partition to every partition below it, written by the
+    # loader, or two node heirarchies (`transitive-ancestorship`)
+    'ancestorship': """
+ancestorship sub relation,
+    has depth,
+    relates ancestor,
+    relates descedent;""",
+
+    # a basic heirarchical relationship
+    'node-heirarchy': """
+node-heirarchy sub relation,
+    relates parent-node,
+    relates child-node,
+    plays ancestor,
+    plays descedent;""",
+
+    # pairs of children of the same parent (`node-adjacency`)
+    'siblings': """
+siblings sub relation,
+    relates child-node;""",
+
+    # a parent and all of its children, written by the loader
+    'sibling-group': """
+sibling-group sub relation,
+    relates group-parent,
+    relates sibling;""",
+
+    'product-offer': """
+product-offer sub relation,
+    relates product,
+    relates ad-group;""",
+
+    # relate Product Partitions to Product Dimensions
+    'case-value': """
+case-value sub relation,
+    has dimension-value,
+    relates product-dimension,
+    relates product-partition;""",
+
+    # relate Products to the Product Dimensions they have a value for
+    'product-value': """
+product-value sub relation,
+    has dimension-value,
+    relates product,
+    relates product-dimension;""",
+
+    # WIP still
+    # 'subdivision': """
+    # subdivision sub relation,
+    #     has dimension-type,
+    #     relates parent,
+    #     relates dimension-value;
+    # value plays dimension-value;""",
+}
 
 
 # ----------------------------------------------------------------------------
-# Relation Definitions
+# Rules
 # ----------------------------------------------------------------------------
 
-def define_infer_node_hierarchy_rule(session: Session):
-    q = """define
-    infer-node-heirarchy sub rule,
-    when {
-      $parent isa ProductPartition, has criterion-id $x, has adgroup-id $a-id;
-      $child isa ProductPartition, has parent-id $y, has adgroup-id $a-id;
-      $x == $y;
-      $parent != $child;
-    }, then {
-      (parent-node: $parent, child-node: $child) isa node-heirarchy;
-    };
-    """
-    with session.transaction().write() as tx:
-        tx.query(q)
-        id = tx.get_schema_concept('infer-node-heirarchy').id
-
-        tx.commit()
-
-    return id
-
-
-def define_transitive_ancestorship_rule(session: Session):
-    q = """define
-    transitive-ancestorship sub rule,
-    when {
-      $r1 (parent-node: $a, child-node: $p) isa node-heirarchy;
-      $r2 (parent-node: $p, child-node: $c) isa node-heirarchy;
-      $a isa ProductPartition;
-      $p isa ProductPartition;
-      $c isa ProductPartition;
-    }, then {
-      (ancestor: $r1, descedent: $r2) isa ancestorship;
-    };"""
-    with session.transaction().write() as tx:
-        tx.query(q)
-        id = tx.get_schema_concept('transitive-ancestorship').id
-
-        tx.commit()
-
-    return id
-
-
-def define_node_adjacency_rule(session: Session):
-    q = """define
-    node-adjacency sub rule,
-    when {
-      (parent-node: $p, $x) isa node-heirarchy;
-      (parent-node: $p, $y) isa node-heirarchy;
-      $x != $y;
-    }, then {
-      ($x, $y) isa siblings;
-    };"""
-    with session.transaction().write() as tx:
-        tx.query(q)
-        id = tx.get_schema_concept('node-adjacency').id
-
-        tx.commit()
-
-    return id
+RULES = {}
+
+
+# Only defined when asked for, see `schema.compile_schema`.
+OPTIONAL_RULES = {
+    # the partition loader writes `node-heirarchy` relations, the rule is
+    # only needed for partitions imported before it did
+    'infer-node-heirarchy': """
+infer-node-heirarchy sub rule,
+when {
+  $parent isa ProductPartition, has criterion-id $x, has adgroup-id $a-id;
+  $child isa ProductPartition, has parent-id $y, has adgroup-id $a-id;
+  $x == $y;
+  $parent != $child;
+}, then {
+  (parent-node: $parent, child-node: $child) isa node-heirarchy;
+};""",
+
+    # superseded by the `ancestorship` relations of the loader
+    'transitive-ancestorship': """
+transitive-ancestorship sub rule,
+when {
+  $r1 (parent-node: $a, child-node: $p) isa node-heirarchy;
+  $r2 (parent-node: $p, child-node: $c) isa node-heirarchy;
+  $a isa ProductPartition;
+  $p isa ProductPartition;
+  $c isa ProductPartition;
+}, then {
+  (ancestor: $r1, descedent: $r2) isa ancestorship;
+};""",
+
+    # quadratic in the number of children, superseded by `sibling-group`
+    'node-adjacency': """
+node-adjacency sub rule,
+when {
+  (parent-node: $p, $x) isa node-heirarchy;
+  (parent-node: $p, $y) isa node-heirarchy;
+  $x != $y;
+}, then {
+  ($x, $y) isa siblings;
+};""",
+}
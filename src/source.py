@@ -0,0 +1,233 @@
+"""Bounded-memory reads from the Adspert account DB.
+
+Iterating `q.dicts()` over an unbounded query materialises the complete
+result on the client. `stream()` instead walks the query with keyset
+pagination (`WHERE (keys) > (last keys) ORDER BY keys LIMIT n`), so only
+one page is held at a time, and reads ahead on a producer thread through
+a bounded queue. When the Grakn writes fall behind, the queue fills up
+and the producer blocks, which keeps memory constant regardless of the
+size of the account.
+
+Filters on long id lists are split up as well: `stream_in()` runs the
+query once per chunk of ids instead of sending one huge `IN (...)` list,
+and `id_table()` loads the ids into a temporary table to join against
+where the chunks would break the ordering of the keys.
+
+"""
+import contextlib
+import itertools
+import logging
+import queue
+import threading
+import uuid
+from dataclasses import dataclass
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Sequence
+
+from peewee import Database
+from peewee import Field
+from peewee import Table
+from peewee import Tuple
+from peewee import chunked
+
+import metrics
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+
+DEFAULT_PAGE_SIZE = 5000
+# ids per `IN (...)` list
+DEFAULT_ID_CHUNK = 1000
+
+
+@dataclass(frozen=True)
+class ReadConfig:
+    """How source rows are read.
+
+    `page_size` rows are fetched per query, `prefetch` is the number of
+    rows read ahead of the consumer, 0 reads synchronously. Id filters
+    are split into lists of at most `id_chunk` ids.
+    """
+    page_size: int = DEFAULT_PAGE_SIZE
+    prefetch: int = 2 * DEFAULT_PAGE_SIZE
+    id_chunk: int = DEFAULT_ID_CHUNK
+
+
+DEFAULT_READ = ReadConfig()
+
+
+def iter_pages(
+        query,
+        keys: Sequence[Field],
+        page_size: int = DEFAULT_PAGE_SIZE,
+        after: Sequence = None) -> Iterator[List[dict]]:
+    """Yield the rows of `query` as dicts, one page at a time.
+
+    `keys` must uniquely identify a row of `query`, they are used for the
+    ordering and as the keyset of the next page. Pass the key values of a
+    row as `after` to continue reading after it.
+    """
+    names = [f.name for f in keys]
+    query = query.order_by(*keys).limit(page_size)
+
+    last = after
+    while True:
+        q = query
+        if last is not None:
+            if len(keys) == 1:
+                q = q.where(keys[0] > last[0])
+            else:
+                q = q.where(Tuple(*keys) > Tuple(*last))
+
+        with metrics.timer('db.fetch'):
+            page = list(q.dicts().iterator())
+        metrics.incr('db.rows', len(page))
+        if not page:
+            return
+
+        last = [page[-1][name] for name in names]
+        yield page
+
+        if len(page) < page_size:
+            return
+
+
+def iter_keyset(
+        query,
+        keys: Sequence[Field],
+        page_size: int = DEFAULT_PAGE_SIZE,
+        after: Sequence = None) -> Iterator[dict]:
+    for page in iter_pages(query, keys, page_size, after):
+        yield from page
+
+
+_DONE = object()
+
+
+def prefetched(rows: Iterable, maxsize: int) -> Iterator:
+    """Read `rows` on a producer thread, at most `maxsize` rows ahead."""
+    buf = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for row in rows:
+                while not stop.is_set():
+                    try:
+                        buf.put(row, timeout=0.1)
+                        break
+                    except queue.Full:
+                        pass
+                else:
+                    return
+            item = _DONE
+        except Exception as e:
+            item = e
+        finally:
+            # clean up generators on the thread (and connection) they ran on
+            if hasattr(rows, 'close'):
+                rows.close()
+
+        while not stop.is_set():
+            try:
+                buf.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    producer = threading.Thread(
+        target=produce, name='source-prefetch', daemon=True)
+    producer.start()
+
+    try:
+        while True:
+            item = buf.get()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # also reached when the consumer stops early
+        stop.set()
+        producer.join()
+
+
+def stream(
+        query,
+        keys: Sequence[Field],
+        read: ReadConfig = DEFAULT_READ,
+        after: Sequence = None) -> Iterator[dict]:
+    """Stream the rows of `query` with bounded memory, see module doc."""
+    rows = iter_keyset(query, keys, read.page_size, after)
+    if read.prefetch:
+        rows = prefetched(rows, read.prefetch)
+    return rows
+
+
+def id_chunks(
+        ids: Iterable,
+        size: int = DEFAULT_ID_CHUNK,
+        after=None) -> List[tuple]:
+    """Sorted, distinct `ids` in tuples of at most `size`, all >= `after`.
+
+    `after` is the first key of the row to continue after. Its own id is
+    kept, the rest of its rows follow it, and the keyset condition of
+    `iter_pages` skips the rows up to and including the `after` row.
+    """
+    ids = sorted(set(ids))
+    if after is not None:
+        ids = [i for i in ids if i >= after]
+    return [tuple(c) for c in chunked(ids, size or len(ids) or 1)]
+
+
+def stream_in(
+        query,
+        keys: Sequence[Field],
+        ids: Sequence,
+        read: ReadConfig = DEFAULT_READ,
+        after: Sequence = None) -> Iterator[dict]:
+    """`stream()` the rows of `query` where `keys[0]` is in `ids`.
+
+    The ids are sorted and the query is run per chunk of `read.id_chunk`
+    ids, so the rows still come in key order and `after` works the same
+    as for `stream()`.
+    """
+    if not ids:
+        return stream(query, keys, read, after)
+
+    field = keys[0]
+    chunks = id_chunks(ids, read.id_chunk, after[0] if after else None)
+    log.debug(f'Reading {len(ids)} `{field.name}`s in {len(chunks)} chunks.')
+
+    rows = itertools.chain.from_iterable(
+        iter_keyset(
+            query.where(field.in_(chunk)), keys, read.page_size, after)
+        for chunk in chunks)
+    if read.prefetch:
+        rows = prefetched(rows, read.prefetch)
+    return rows
+
+
+@contextlib.contextmanager
+def id_table(database: Database, ids: Iterable) -> Iterator[Table]:
+    """A temporary table of `ids` (column `id`) to join against.
+
+    Temporary tables are private to the connection, use it on the thread
+    that runs the queries.
+    """
+    name = f'ids_{uuid.uuid4().hex[:12]}'
+    database.execute_sql(f'CREATE TEMPORARY TABLE {name} (id BIGINT)')
+    table = Table(name, ('id', )).bind(database)
+    try:
+        with database.atomic():
+            for chunk in chunked(sorted(set(ids)), DEFAULT_ID_CHUNK):
+                table.insert(
+                    [(i, ) for i in chunk], columns=[table.id]).execute()
+        database.execute_sql(f'CREATE INDEX {name}_id ON {name} (id)')
+        database.execute_sql(f'ANALYZE {name}')
+        yield table
+    finally:
+        database.execute_sql(f'DROP TABLE IF EXISTS {name}')
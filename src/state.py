@@ -0,0 +1,278 @@
+"""Local, durable import state per keyspace.
+
+The state lives in a small SQLite database next to the tools (see
+`DEFAULT_STATE_PATH`), keyed by keyspace:
+
+checkpoint
+    natural key -> digest of every row written by a delta sync, per
+    entity type, so the next sync only touches what changed.
+
+journal
+    the source key of the last committed batch per loader (and shard) of
+    an import, and the keys of the batches committed after it, so an
+    interrupted import can be resumed.
+
+schema_version
+    the fingerprint of the schema last applied, per server and keyspace,
+    so applying an unchanged schema again is a no-op.
+
+data_version
+    a counter bumped by every import, sync and schema apply, so cached
+    query results (see `queries`) are not used past a change.
+
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+
+DEFAULT_STATE_PATH = os.path.expanduser(
+    '~/.cache/adw-shopping-ontology/state.sqlite')
+
+SCHEMA = """
+create table if not exists checkpoint (
+    keyspace text not null,
+    kind text not null,
+    key text not null,
+    digest text not null,
+    primary key (keyspace, kind, key)
+);
+create table if not exists sync (
+    keyspace text not null,
+    kind text not null,
+    synced_at timestamp not null default current_timestamp,
+    primary key (keyspace, kind)
+);
+create table if not exists journal (
+    keyspace text not null,
+    loader text not null,
+    scope text not null,
+    last_key text,
+    rows integer not null default 0,
+    finished integer not null default 0,
+    pending text,
+    updated_at timestamp not null default current_timestamp,
+    primary key (keyspace, loader, scope)
+);
+create table if not exists schema_version (
+    host text not null,
+    keyspace text not null,
+    name text not null,
+    fingerprint text not null,
+    applied_at timestamp not null default current_timestamp,
+    primary key (host, keyspace, name)
+);
+create table if not exists data_version (
+    keyspace text not null primary key,
+    version integer not null,
+    updated_at timestamp not null default current_timestamp
+);
+"""
+
+
+class StateStore:
+    """SQLite backed import state, safe to share between threads."""
+
+    def __init__(self, path: str = DEFAULT_STATE_PATH):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self._upgrade()
+        self.db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def _upgrade(self):
+        """Upgrade the tables of older state files."""
+        columns = [
+            row[1] for row in
+            self.db.execute('pragma table_info(schema_version)')]
+        if columns and 'host' not in columns:
+            # fingerprints without a host, the schemas are applied again
+            with self.db:
+                self.db.execute('drop table schema_version')
+
+        columns = [
+            row[1] for row in self.db.execute('pragma table_info(journal)')]
+        if columns and 'pending' not in columns:
+            with self.db:
+                self.db.execute('alter table journal add column pending text')
+
+    def close(self):
+        self.db.close()
+
+    def checkpoint(self, keyspace: str, kind: str) -> Dict[str, str]:
+        """Return the natural key -> digest map of the last sync."""
+        with self._lock:
+            cur = self.db.execute(
+                'select key, digest from checkpoint '
+                'where keyspace = ? and kind = ?', (keyspace, kind))
+            return dict(cur)
+
+    def update_checkpoint(
+            self,
+            keyspace: str,
+            kind: str,
+            written: Iterable[Tuple[str, str]] = (),
+            deleted: Iterable[str] = ()):
+        with self._lock, self.db:
+            self.db.executemany(
+                'insert or replace into checkpoint '
+                '(keyspace, kind, key, digest) values (?, ?, ?, ?)',
+                ((keyspace, kind, k, d) for k, d in written))
+            self.db.executemany(
+                'delete from checkpoint '
+                'where keyspace = ? and kind = ? and key = ?',
+                ((keyspace, kind, k) for k in deleted))
+
+    def mark_synced(self, keyspace: str, kind: str):
+        with self._lock, self.db:
+            self.db.execute(
+                'insert or replace into sync (keyspace, kind) values (?, ?)',
+                (keyspace, kind))
+
+    def is_synced(self, keyspace: str, kind: str) -> bool:
+        with self._lock:
+            cur = self.db.execute(
+                'select 1 from sync where keyspace = ? and kind = ?',
+                (keyspace, kind))
+            return cur.fetchone() is not None
+
+    def progress(
+            self,
+            keyspace: str,
+            loader: str,
+            scope: str = '') -> Optional[Tuple[Optional[list], int, bool]]:
+        """Return the last committed key, row count and finished flag.
+
+        Returns `None` when the loader has not been started.
+        """
+        with self._lock:
+            cur = self.db.execute(
+                'select last_key, rows, finished from journal '
+                'where keyspace = ? and loader = ? and scope = ?',
+                (keyspace, loader, scope))
+            row = cur.fetchone()
+
+        if row is None:
+            return None
+        last_key, rows, finished = row
+        if last_key is not None:
+            last_key = json.loads(last_key)
+        return last_key, rows, bool(finished)
+
+    def save_progress(
+            self,
+            keyspace: str,
+            loader: str,
+            scope: str,
+            last_key: Optional[list],
+            rows: int,
+            finished: bool = False):
+        with self._lock, self.db:
+            self.db.execute(
+                'insert or replace into journal '
+                '(keyspace, loader, scope, last_key, rows, finished) '
+                'values (?, ?, ?, ?, ?, ?)',
+                (keyspace, loader, scope,
+                 json.dumps(last_key) if last_key is not None else None,
+                 rows, int(finished)))
+
+    def pending(self, keyspace: str, loader: str, scope: str = '') -> List:
+        """Return the keys written since the last saved progress."""
+        with self._lock:
+            cur = self.db.execute(
+                'select pending from journal '
+                'where keyspace = ? and loader = ? and scope = ?',
+                (keyspace, loader, scope))
+            row = cur.fetchone()
+        return json.loads(row[0]) if row and row[0] else []
+
+    def save_pending(
+            self, keyspace: str, loader: str, scope: str, keys: List):
+        """Save the keys of rows about to be written.
+
+        Saving the progress clears them.
+        """
+        with self._lock, self.db:
+            self.db.execute(
+                'update journal set pending = ?, '
+                'updated_at = current_timestamp '
+                'where keyspace = ? and loader = ? and scope = ?',
+                (json.dumps(keys), keyspace, loader, scope))
+
+    def scopes(self, keyspace: str, loader: str) -> List[str]:
+        """The scopes with progress of a loader, e.g. shards `0/8`."""
+        with self._lock:
+            cur = self.db.execute(
+                'select scope from journal '
+                'where keyspace = ? and loader = ? order by scope',
+                (keyspace, loader))
+            return [row[0] for row in cur]
+
+    def clear_progress(self, keyspace: str, loader: str, scope: str = ''):
+        """Forget the progress of `scope` and of its shards."""
+        with self._lock, self.db:
+            self.db.execute(
+                'delete from journal '
+                'where keyspace = ? and loader = ? '
+                'and (scope = ? or scope like ?)',
+                (keyspace, loader, scope, f'{scope}%/%'))
+
+    def schema_fingerprint(
+            self, host: str, keyspace: str, name: str) -> Optional[str]:
+        """Return the fingerprint of schema `name` last applied."""
+        with self._lock:
+            cur = self.db.execute(
+                'select fingerprint from schema_version '
+                'where host = ? and keyspace = ? and name = ?',
+                (host, keyspace, name))
+            row = cur.fetchone()
+        return row[0] if row else None
+
+    def save_schema_fingerprint(
+            self, host: str, keyspace: str, name: str, fingerprint: str):
+        with self._lock, self.db:
+            self.db.execute(
+                'insert or replace into schema_version '
+                '(host, keyspace, name, fingerprint) values (?, ?, ?, ?)',
+                (host, keyspace, name, fingerprint))
+
+    def clear_schema_fingerprint(self, host: str, keyspace: str):
+        with self._lock, self.db:
+            self.db.execute(
+                'delete from schema_version where host = ? and keyspace = ?',
+                (host, keyspace))
+
+    def data_version(self, keyspace: str) -> int:
+        """Return the data version of `keyspace`, 0 before any import."""
+        with self._lock:
+            cur = self.db.execute(
+                'select version from data_version where keyspace = ?',
+                (keyspace, ))
+            row = cur.fetchone()
+        return row[0] if row else 0
+
+    def bump_data_version(self, keyspace: str) -> int:
+        """Mark the data of `keyspace` as changed, return the new version."""
+        with self._lock, self.db:
+            self.db.execute(
+                'insert or ignore into data_version (keyspace, version) '
+                'values (?, 0)', (keyspace, ))
+            self.db.execute(
+                'update data_version '
+                'set version = version + 1, updated_at = current_timestamp '
+                'where keyspace = ?', (keyspace, ))
+            cur = self.db.execute(
+                'select version from data_version where keyspace = ?',
+                (keyspace, ))
+            return cur.fetchone()[0]
@@ -0,0 +1,305 @@
+"""Incremental delta sync of source rows into a keyspace.
+
+A full import re-inserts every row. A delta sync instead compares the
+records built from the source rows with the checkpoint of the previous
+sync (natural key -> digest, see `state.StateStore`) and only
+
+* inserts records with a new natural key,
+* replaces (deletes and re-inserts, or updates in place) records whose
+  digest changed,
+* deletes the instances whose natural key disappeared from the source.
+
+The checkpoint is updated after every committed batch. The first sync of
+a keyspace without a checkpoint replaces every record, which also
+removes duplicates left behind by earlier full imports.
+
+Replacing an entity deletes the relations it plays in, including those
+of other records, e.g. the `sibling-group` of its parent. Relation
+records, whose relations belong to an `anchor` player (see
+`graql.Thing`), therefore have a checkpoint of their own keyed by that
+player (see `relation_key`). Their digest covers the digests of the
+records of their players, so a changed entity changes the digest of
+every relation record it plays in and those are replaced as well.
+
+"""
+import hashlib
+import json
+import logging
+import weakref
+from dataclasses import dataclass
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from grakn.client import Session
+
+import metrics
+from cache import CachedTransaction
+from graql import Record
+from graql import Thing
+from graql import literal
+from state import StateStore
+from writer import BatchConfig
+from writer import DEFAULT_BATCH
+from writer import GraqlWriter
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+
+
+@dataclass(frozen=True)
+class SyncKind:
+    """An entity type synced by natural key.
+
+    `relations` are relation types the entity plays in, they are deleted
+    together with the entity. A changed record of an `in_place` kind
+    rewrites the attributes of its instance instead of replacing it, so
+    the instance keeps the relations written by other loaders, e.g. the
+    `product-offer`s of an AdGroup. Its records are the entity only.
+    """
+    label: str
+    keys: Tuple[str, ...]
+    relations: Tuple[str, ...] = ()
+    in_place: bool = False
+
+    @property
+    def relation_label(self) -> str:
+        """Checkpoint label of the relation records of the kind."""
+        return f'{self.label} relations'
+
+    def key(self, thing: Thing) -> str:
+        return ':'.join(str(thing.attributes[k]) for k in self.keys)
+
+    def key_values(self, key: str) -> Tuple[str, ...]:
+        return tuple(key.split(':'))
+
+    def relation_key(self, record: Record) -> str:
+        """Key of a relation record: anchor player and relation roles.
+
+        E.g. `["3:12", [["ancestorship", "descedent"]]]` for the
+        `ancestorship`s of partition 12.
+        """
+        anchor = record[0].player(record[0].anchor)
+        roles = sorted({(thing.label, thing.anchor) for thing in record})
+        return json.dumps([self.key(anchor), roles])
+
+
+CAMPAIGN = SyncKind('Campaign', ('campaign-id', ))
+ADGROUP = SyncKind(
+    'AdGroup', ('adgroup-id', ), ('product-offer', ), in_place=True)
+PRODUCT_PARTITION = SyncKind(
+    'ProductPartition', ('adgroup-id', 'criterion-id'),
+    ('case-value', 'node-heirarchy', 'ancestorship', 'sibling-group'))
+PRODUCT = SyncKind(
+    'Product', ('item-id', ), ('product-value', 'product-offer'))
+
+
+@dataclass
+class Change:
+    key: str
+    digest: Optional[str] = None
+    record: Optional[Record] = None
+    replace: bool = False
+    relation: bool = False
+
+
+@dataclass
+class SyncStats:
+    unchanged: int = 0
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+    failed: int = 0
+
+    def merge(self, other: 'SyncStats'):
+        self.unchanged += other.unchanged
+        self.inserted += other.inserted
+        self.updated += other.updated
+        self.deleted += other.deleted
+        self.failed += other.failed
+        return self
+
+    @property
+    def rows(self) -> int:
+        return self.unchanged + self.inserted + self.updated + self.deleted
+
+
+def record_digest(record: Record, digests: Dict = None) -> str:
+    """Digest of `record`, `digests` holds those of other records.
+
+    `digests` maps the first `Thing` of a record to the digest of the
+    record, role players from other records add theirs.
+    """
+    h = hashlib.sha1()
+    for thing in record:
+        h.update(thing.label.encode())
+        h.update(repr(sorted(thing.attributes.items())).encode())
+        for role, player in thing.roles:
+            if isinstance(player, Thing):
+                digest = digests.get(player, '') if digests else ''
+                player = f'{player.natural_key()}:{digest}'
+            else:
+                player = player.key
+            h.update(f'{role}:{player}'.encode())
+    return h.hexdigest()
+
+
+class SyncWriter(GraqlWriter):
+    """Apply `Change`s batch-wise and advance the checkpoint on commit."""
+
+    def __init__(
+            self,
+            session: Session,
+            store: StateStore,
+            keyspace: str,
+            kind: SyncKind,
+            batch: BatchConfig = DEFAULT_BATCH):
+        super().__init__(session, batch=batch)
+        self.store = store
+        self.keyspace = keyspace
+        self.kind = kind
+
+    def record(self, row: Change) -> Optional[Record]:
+        return row.record
+
+    def has(self, tx: CachedTransaction, attributes: Iterable) -> str:
+        return ', '.join(
+            f'has {label} {literal(value, tx.data_type(label))}'
+            for label, value in attributes)
+
+    def match(self, tx: CachedTransaction, key: str) -> str:
+        has = self.has(tx, zip(self.kind.keys, self.kind.key_values(key)))
+        return f'match $x isa {self.kind.label}, {has};'
+
+    def deletes(self, tx: CachedTransaction, change: Change) -> List[str]:
+        """Queries deleting what `change` replaces."""
+        if change.relation:
+            key, roles = json.loads(change.key)
+            match = self.match(tx, key)
+            return [
+                f'{match} $r ({role}: $x) isa {label}; delete $r;'
+                for label, role in roles]
+
+        match = self.match(tx, change.key)
+        queries = [
+            f'{match} $r ($x) isa {relation}; delete $r;'
+            for relation in self.kind.relations]
+        queries.append(f'{match} delete $x;')
+        return queries
+
+    def update(self, tx: CachedTransaction, change: Change) -> bool:
+        """Rewrite the attributes of the instance of `change` in place.
+
+        Returns `False` if there is no instance to update.
+        """
+        match = self.match(tx, change.key)
+        attributes = {
+            label: value
+            for label, value in change.record[0].attributes.items()
+            if label not in self.kind.keys}
+        with metrics.timer('grakn.query'):
+            if not list(tx.query(f'{match} get $x;')):
+                return False
+            for label in attributes:
+                list(tx.query(
+                    f'{match} $x has {label} $v via $h; delete $h;'))
+            has = self.has(
+                tx, [(k, v) for k, v in attributes.items() if v is not None])
+            if has:
+                list(tx.query(f'{match} insert $x {has};'))
+        return True
+
+    def write_batch(self, tx: CachedTransaction, rows: List[Change]):
+        records = []
+        for change in rows:
+            if change.replace:
+                if (self.kind.in_place and change.record and
+                        not change.relation):
+                    if self.update(tx, change):
+                        continue
+                else:
+                    with metrics.timer('grakn.query'):
+                        for query in self.deletes(tx, change):
+                            list(tx.query(query))
+            if change.record:
+                records.append(change.record)
+
+        if records:
+            self.insert(tx, records)
+
+    def committed(self, rows: List[Change]):
+        super().committed(rows)
+        for label, relation in (
+                (self.kind.label, False),
+                (self.kind.relation_label, True)):
+            changes = [c for c in rows if c.relation == relation]
+            if not changes:
+                continue
+            self.store.update_checkpoint(
+                self.keyspace, label,
+                written=[(c.key, c.digest) for c in changes if c.record],
+                deleted=[c.key for c in changes if not c.record])
+
+
+def sync_records(
+        session: Session,
+        store: StateStore,
+        keyspace: str,
+        kind: SyncKind,
+        records: Iterable[Record],
+        batch: BatchConfig = DEFAULT_BATCH) -> SyncStats:
+    """Bring the `kind` instances of `keyspace` in line with `records`.
+
+    Relation records follow the records of their players.
+    """
+    labels = (kind.label, kind.relation_label)
+    first_sync = not all(store.is_synced(keyspace, label) for label in labels)
+    checkpoints = {
+        False: store.checkpoint(keyspace, kind.label),
+        True: store.checkpoint(keyspace, kind.relation_label)}
+    digests = weakref.WeakKeyDictionary()
+
+    stats = SyncStats()
+    with SyncWriter(session, store, keyspace, kind, batch) as writer:
+        for record in records:
+            relation = bool(record[0].anchor)
+            if relation:
+                key = kind.relation_key(record)
+                digest = record_digest(record, digests)
+            else:
+                key = kind.key(record[0])
+                digest = digests[record[0]] = record_digest(record)
+            previous = checkpoints[relation].pop(key, None)
+
+            if previous == digest:
+                stats.unchanged += 1
+                continue
+
+            if previous is None:
+                stats.inserted += 1
+            else:
+                stats.updated += 1
+
+            writer.add(Change(
+                key, digest, record,
+                replace=first_sync or previous is not None,
+                relation=relation))
+
+        # whatever is left in the checkpoints is gone from the source
+        for relation, checkpoint in checkpoints.items():
+            for key in checkpoint:
+                stats.deleted += 1
+                writer.add(Change(key, replace=True, relation=relation))
+
+    stats.failed = len(writer.stats.failed)
+    if not stats.failed:
+        for label in labels:
+            store.mark_synced(keyspace, label)
+
+    log.info(
+        f'Synced `{kind.label}`: {stats.inserted} inserted, '
+        f'{stats.updated} updated, {stats.deleted} deleted, '
+        f'{stats.unchanged} unchanged, {stats.failed} failed.')
+    return stats
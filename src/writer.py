@@ -0,0 +1,384 @@
+"""Batched write transactions for the Grakn loaders.
+
+Opening and committing a write transaction per row makes the import time
+dominated by commit round trips. `BatchWriter` buffers rows and writes them
+with a single transaction per batch. A batch is closed when it reaches
+either a row count or an (estimated) byte size.
+
+When a batch fails to commit it is split in half and both halves are
+retried, down to single rows. A bad row therefore only costs itself and
+is reported in `WriteStats.failed` instead of aborting the whole import.
+
+`GraqlWriter` compiles each batch of records (see `graql`) into a single
+`insert` query instead of doing concept API calls per attribute.
+
+Rows that depend on others, e.g. the hierarchy relations of partitions,
+are held back and written in batches of their own once the rows before
+them are committed. Their role players are bound by the concept ids the
+inserts returned (`ConceptIds`), and a row whose players failed to be
+written fails as well.
+
+"""
+import logging
+import weakref
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+
+from grakn.client import Session
+from grakn.exception.GraknError import GraknError
+
+import metrics
+from cache import CachedTransaction
+from cache import session_cache
+from graql import InsertCompiler
+from graql import Record
+from graql import Thing
+from graql import dependent
+from graql import external_players
+from graql import record_size
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+
+DEFAULT_BATCH_SIZE = 500
+# well below the default 4 MiB gRPC message limit
+DEFAULT_BATCH_BYTES = 2 ** 20
+
+
+@dataclass(frozen=True)
+class BatchConfig:
+    """How large a single write transaction may grow.
+
+    `size` is a row count and `bytes` an estimated payload size, a value
+    of 0 disables the respective limit.
+    """
+    size: int = DEFAULT_BATCH_SIZE
+    bytes: int = DEFAULT_BATCH_BYTES
+
+
+DEFAULT_BATCH = BatchConfig()
+
+
+@dataclass
+class WriteStats:
+    """Rows written, `dependent` counts the dependent rows separately."""
+    rows: int = 0
+    dependent: int = 0
+    batches: int = 0
+    retries: int = 0
+    failed: List[Any] = field(default_factory=list)
+
+    def merge(self, other: 'WriteStats'):
+        self.rows += other.rows
+        self.dependent += other.dependent
+        self.batches += other.batches
+        self.retries += other.retries
+        self.failed.extend(other.failed)
+        return self
+
+
+def row_size(row) -> int:
+    """Cheap estimate of the payload size of a row."""
+    if isinstance(row, (str, bytes)):
+        return len(row)
+    return len(repr(row))
+
+
+class BatchWriter:
+    """Write rows to a session in batched write transactions.
+
+    Subclasses implement `write_batch(tx, rows)`, which writes all rows of
+    a batch inside the same write transaction. `tx` is a
+    `CachedTransaction`, so attribute datatypes are only looked up once
+    per session. Use as a context manager so the last, partial batch is
+    flushed::
+
+        with GraqlWriter(session) as writer:
+            for record in records:
+                writer.add(record)
+
+    Rows for which `dependent(row)` is true are written after the other
+    rows added before the next flush, in batches of their own.
+    """
+
+    def __init__(
+            self,
+            session: Session,
+            batch: BatchConfig = DEFAULT_BATCH):
+        self.session = session
+        self.batch = batch
+        self.stats = WriteStats()
+
+        self._rows = []
+        self._bytes = 0
+        self._deferred = []
+        self._deferred_bytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
+
+    def add(self, row):
+        size = self.row_size(row) if self.batch.bytes else 0
+        if self.dependent(row):
+            self._deferred.append(row)
+            self._deferred_bytes += size
+            if self._is_full(self._deferred, self._deferred_bytes):
+                self._write_pending()
+            return
+
+        # a full batch is written when the next row comes in, so the
+        # dependent rows following its last row are written with it
+        if self._is_full(self._rows, self._bytes):
+            self.flush()
+        self._rows.append(row)
+        self._bytes += size
+
+    def flush(self):
+        """Write the buffered rows, then the dependent ones."""
+        self._write_pending()
+        self.settled()
+
+    def row_size(self, row) -> int:
+        return row_size(row)
+
+    def write_batch(self, tx: CachedTransaction, rows: List):
+        raise NotImplementedError
+
+    def dependent(self, row) -> bool:
+        return False
+
+    def prepare(self, rows: List) -> List:
+        """The dependent `rows` that can be written, fail the others."""
+        return rows
+
+    def committing(self, rows: List):
+        """Called with the rows of a batch right before its commit."""
+
+    def committed(self, rows: List):
+        """Called with the rows of every successfully committed batch."""
+
+    def settled(self):
+        """Called by `flush` once all rows added before are written."""
+
+    def failed(self, row, reason):
+        log.warning(f'Skipping row {row!r}: {reason}')
+        self.stats.failed.append(row)
+        metrics.incr('rows.failed')
+
+    def _is_full(self, rows: List, size: int) -> bool:
+        if self.batch.size and len(rows) >= self.batch.size:
+            return True
+        if self.batch.bytes and size >= self.batch.bytes:
+            return True
+        return False
+
+    def _write_pending(self):
+        rows, self._rows, size = self._rows, [], self._bytes
+        self._bytes = 0
+        if rows:
+            if self.batch.bytes:
+                metrics.histogram('batch.bytes', size)
+            self._write(rows)
+
+        deferred, self._deferred = self._deferred, []
+        self._deferred_bytes = 0
+        if deferred:
+            for rows in self._batches(self.prepare(deferred)):
+                self._write(rows)
+
+    def _batches(self, rows: Iterable) -> Iterator[List]:
+        batch, size = [], 0
+        for row in rows:
+            batch.append(row)
+            if self.batch.bytes:
+                size += self.row_size(row)
+            if self._is_full(batch, size):
+                yield batch
+                batch, size = [], 0
+        if batch:
+            yield batch
+
+    def _write(self, rows: List):
+        try:
+            with self.session.transaction().write() as tx:
+                ctx = CachedTransaction(tx, session_cache(self.session))
+                self.write_batch(ctx, rows)
+                self.committing(rows)
+                with metrics.timer('grakn.commit'):
+                    tx.commit()
+        except (GraknError, ValueError) as e:
+            if len(rows) == 1:
+                self.failed(rows[0], e)
+                return
+
+            # bisect the batch to isolate the offending row(s)
+            self.stats.retries += 1
+            metrics.incr('batch.retries')
+            mid = len(rows) // 2
+            log.debug(
+                f'Batch of {len(rows)} rows failed, retrying as '
+                f'{mid} + {len(rows) - mid}.')
+            self._write(rows[:mid])
+            self._write(rows[mid:])
+        else:
+            if self.dependent(rows[0]):
+                self.stats.dependent += len(rows)
+            else:
+                self.stats.rows += len(rows)
+            self.stats.batches += 1
+            metrics.histogram('batch.rows', len(rows))
+            metrics.incr('rows.written', len(rows))
+            self.committed(rows)
+
+
+class ConceptIds:
+    """Concept ids of the `Thing`s written by a writer.
+
+    The ids come from the answers of the insert queries. `Thing`s are
+    held weakly, so the ids of e.g. a partition tree are dropped with the
+    tree. Role players written by an earlier run, e.g. before a resumed
+    import or unchanged ones in a sync, are looked up by their key.
+    """
+
+    def __init__(self, session: Session):
+        self.session = session
+        self._ids = weakref.WeakKeyDictionary()
+        self._failed = weakref.WeakSet()
+
+    def get(self, thing: Thing) -> Optional[str]:
+        return self._ids.get(thing)
+
+    def inserted(self, variables: Dict[Thing, str], answer) -> Dict:
+        """Thing -> concept id of the variables of an insert answer."""
+        return {
+            thing: answer.get(var[1:]).id
+            for thing, var in variables.items()}
+
+    def update(self, ids: Dict[Thing, str]):
+        self._ids.update(ids)
+
+    def fail(self, record: Record):
+        """Mark the things of a record that could not be written."""
+        self._failed.update(record)
+
+    def resolve(self, players: Iterable[Thing]) -> bool:
+        """Whether all `players` have an id, looking up the missing ones.
+
+        Players whose write failed in this run are not looked up.
+        """
+        missing = [
+            p for p in players
+            if p not in self._ids and p not in self._failed]
+        if missing:
+            self.lookup(missing)
+        return all(p in self._ids for p in players)
+
+    def lookup(self, things: List[Thing]):
+        """Find the ids of `things` by their key attributes."""
+        metrics.incr('concepts.lookup', len(things))
+        with self.session.transaction().read() as tx:
+            tx = CachedTransaction(tx, session_cache(self.session))
+            compiler = InsertCompiler(tx.data_type)
+            for thing in things:
+                if not thing.key:
+                    continue
+                answers = list(tx.query(
+                    f'match {compiler.match(thing, "$x")} get $x;'))
+                if len(answers) == 1:
+                    self._ids[thing] = answers[0].get('x').id
+                elif answers:
+                    log.warning(
+                        f'{len(answers)} instances of '
+                        f'`{thing.natural_key()}`, not relating any.')
+
+
+class GraqlWriter(BatchWriter):
+    """Write records of `graql.Thing`s with one insert query per batch.
+
+    Dependent records (see `graql.dependent`) are written after the
+    records of their role players. The ids of inserted things are kept
+    in `ids` to bind them. Records are journaled in `journal` (a
+    `journal.Journal`) once the dependent records added after them are
+    written as well, so a resumed import never skips them. Until then
+    their keys are pending in the journal, to be rolled back on resume.
+    """
+
+    def __init__(
+            self,
+            session: Session,
+            batch: BatchConfig = DEFAULT_BATCH,
+            journal=None):
+        super().__init__(session, batch=batch)
+        self.journal = journal
+        self.ids = ConceptIds(session)
+
+        # ids of the batch being written, kept once it is committed
+        self._inserted = {}
+        self._unjournaled = []
+
+    def record(self, row) -> Optional[Record]:
+        return row
+
+    def row_size(self, row) -> int:
+        record = self.record(row)
+        return record_size(record) if record else 64
+
+    def dependent(self, row) -> bool:
+        record = self.record(row)
+        return bool(record) and dependent(record)
+
+    def prepare(self, rows: List) -> List:
+        ready = []
+        for row in rows:
+            if self.ids.resolve(external_players(self.record(row))):
+                ready.append(row)
+            else:
+                self.failed(row, 'a role player was not written')
+        return ready
+
+    def failed(self, row, reason):
+        super().failed(row, reason)
+        record = self.record(row)
+        if record:
+            self.ids.fail(record)
+
+    def insert(self, tx: CachedTransaction, records: List[Record]) -> List:
+        """Insert `records` with one query, return its answers."""
+        with metrics.timer('graql.build'):
+            compiler = InsertCompiler(tx.data_type, self.ids)
+            query = compiler.compile(records)
+        with metrics.timer('grakn.query'):
+            answers = list(tx.query(query))
+        if not answers:
+            # the `match` of a referenced concept found nothing
+            raise ValueError('Referenced concept not found')
+        self._inserted = self.ids.inserted(compiler.variables, answers[0])
+        return answers
+
+    def write_batch(self, tx: CachedTransaction, rows: List[Record]):
+        return self.insert(tx, rows)
+
+    def committing(self, rows: List):
+        if self.journal is not None:
+            self.journal.pending(rows)
+
+    def committed(self, rows: List):
+        self.ids.update(self._inserted)
+        self._inserted = {}
+        if self.journal is not None:
+            self._unjournaled.extend(rows)
+
+    def settled(self):
+        if self._unjournaled:
+            self.journal.commit(self._unjournaled)
+            self._unjournaled = []
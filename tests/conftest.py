@@ -0,0 +1,41 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+
+# the modules of src/ import each other as top-level modules, bench/ has
+# the in-memory Grakn stand-in
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.insert(0, os.path.join(ROOT, 'bench'))
+
+import fake_grakn  # noqa: E402
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """A fake Grakn server that keeps the queries it was sent.
+
+    `match ... get $x;` queries find one instance if `found` is set, the
+    queries in `answers` answer with the schema labels given per variable.
+    """
+    server = fake_grakn.FakeServer()
+    server.queries = []
+    server.found = False
+    server.answers = {}
+    query = fake_grakn.FakeTransaction.query
+
+    def record(tx, q):
+        tx.server.queries.append(q)
+        if server.found and q.endswith(' get $x;'):
+            concept = fake_grakn.FakeConcept(tx, kind='thing')
+            return iter([fake_grakn.FakeAnswer({'x': concept})])
+        if q in server.answers:
+            return iter([
+                fake_grakn.FakeAnswer({
+                    var: tx._type(label) for var, label in answer.items()})
+                for answer in server.answers[q]])
+        return query(tx, q)
+
+    monkeypatch.setattr(fake_grakn.FakeTransaction, 'query', record)
+    return server
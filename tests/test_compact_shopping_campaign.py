@@ -0,0 +1,38 @@
+from models.compact_shopping_campaign import CompactShoppingCampaign
+
+ROWS = [
+    {'id': 2, 'name': 'acme', 'node_type': 'brand', 'value': 'acme'},
+    {'id': 3, 'name': 'Everything else', 'node_type': 'brand',
+     'value': None},
+    {'id': 4, 'name': 'acme', 'parent': 2, 'offers': [{'product': 'a'}]},
+    {'id': 5, 'name': 'sizes', 'parent': 2, 'value': ['S', 'M']},
+]
+
+
+def test_names_and_values_are_interned():
+    campaign = CompactShoppingCampaign()
+    assert campaign.create_nodes(ROWS).ok
+
+    assert campaign[2].value == 'acme' and campaign[3].value is None
+    assert campaign[4].name == 'acme'
+    index, names = campaign._index, campaign._names
+    assert names[index[2]] == names[index[4]]
+    assert not hasattr(campaign[4], 'value')
+    assert campaign[4].offers == [{'product': 'a'}]
+    # not hashable, kept with the other extras
+    assert campaign[5].value == ['S', 'M']
+
+
+def test_compact_keeps_names_and_values():
+    campaign = CompactShoppingCampaign()
+    campaign.create_nodes(ROWS)
+
+    campaign.remove_node(3)
+    campaign.compact()
+
+    assert 3 not in campaign
+    assert None not in campaign._interned
+    assert [(n.identifier, n.name, getattr(n, 'value', '-'))
+            for n in campaign.all_nodes()] == [
+        (1, 'Animals', '-'), (2, 'acme', 'acme'), (4, 'acme', '-'),
+        (5, 'sizes', ['S', 'M'])]
@@ -0,0 +1,36 @@
+from describe import snapshot_schema
+
+
+def test_snapshot_describes_types_with_schema_queries(server):
+    server.define('Product sub entity;\nproduct-offer sub relation;')
+    server.answers = {
+        'match $x plays $y; get;': [
+            {'x': 'Product', 'y': 'offered-item'},
+            {'x': 'Product', 'y': '@has-title-owner'}],
+        'match $x relates $y; get;': [
+            {'x': 'product-offer', 'y': 'offered-item'}],
+        'match $x abstract; get;': [{'x': 'product-offer'}],
+        'match $x key item-id; get;': [{'x': 'Product'}],
+        'match $x has item-id; get;': [{'x': 'Product'}],
+        'match $x has title; get;': [{'x': 'Product'}],
+    }
+    session = server.client().session('ks')
+    server.round_trips.reset()
+
+    snapshot = snapshot_schema(session, 'ks')
+
+    product = snapshot.get('Product')
+    assert (product.kind, product.sup) == ('entity', None)
+    assert product.keys == ['item-id']
+    assert product.attributes == ['item-id', 'title']
+    assert product.plays == ['offered-item']
+    offer = snapshot.get('product-offer')
+    assert (offer.kind, offer.abstract) == ('relation', True)
+    assert offer.relates == ['offered-item']
+    assert snapshot.get('item-id').data_type == 'string'
+    assert snapshot.get('depth').data_type == 'long'
+    # a label per type, meta type and role, no other concept API calls
+    concept_calls = {
+        kind: n for kind, n in server.round_trips.counts.items()
+        if kind.startswith('concept.')}
+    assert concept_calls == {'concept.label': len(server.types) + 4 + 2}
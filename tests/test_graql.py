@@ -0,0 +1,113 @@
+import datetime
+
+import pytest
+from grakn.client import DataType
+
+from graql import InsertCompiler
+from graql import Ref
+from graql import Thing
+from graql import dependent
+from graql import escape
+from graql import literal
+
+DATA_TYPES = {
+    'adgroup-id': DataType.LONG,
+    'criterion-id': DataType.LONG,
+    'depth': DataType.LONG,
+    'title': DataType.STRING,
+    'dimension-value': DataType.STRING,
+    'item-id': DataType.STRING,
+}
+
+
+def partition(criterion_id):
+    return Thing(
+        'ProductPartition',
+        {'adgroup-id': 3, 'criterion-id': criterion_id},
+        key=('adgroup-id', 'criterion-id'))
+
+
+def test_escape_quotes_and_backslashes():
+    assert escape('a "b" \\c') == 'a \\"b\\" \\\\c'
+
+
+def test_literal_quotes_strings():
+    assert literal('Shoes "XL"\\', DataType.STRING) == '"Shoes \\"XL\\"\\\\"'
+    assert literal('two\nlines', DataType.STRING) == '"two\nlines"'
+    assert literal(12, DataType.STRING) == '"12"'
+
+
+def test_literal_renders_by_data_type():
+    assert literal('12', DataType.LONG) == '12'
+    assert literal(2 ** 40, DataType.LONG) == '1099511627776'
+    assert literal(1, DataType.DOUBLE) == '1.0'
+    assert literal(1, DataType.BOOLEAN) == 'true'
+    assert literal(0, DataType.BOOLEAN) == 'false'
+    assert literal(
+        datetime.datetime(2019, 1, 2, 3, 4, 5), DataType.DATE) == \
+        '2019-01-02T03:04:05'
+    assert literal(datetime.date(2019, 1, 2), DataType.DATE) == '2019-01-02'
+
+
+def test_literal_infers_the_data_type():
+    assert literal(True) == 'true'
+    assert literal(12) == '12'
+    assert literal(0.5) == '0.5'
+    assert literal('a"b') == '"a\\"b"'
+    assert literal(datetime.date(2019, 1, 2)) == '2019-01-02'
+
+
+def test_compile_inserts_a_record():
+    pp = partition(12)
+    cv = Thing(
+        'case-value', {'dimension-value': 'Shoes "XL"'},
+        [('product-dimension', Ref('V7', 'ProductDimension:Brand')),
+         ('product-partition', pp)])
+    compiler = InsertCompiler(DATA_TYPES.get)
+
+    assert compiler.compile([[pp, cv]]) == (
+        'match $r0 id V7;\n'
+        'insert\n'
+        '$t0 isa ProductPartition, has adgroup-id 3, has criterion-id 12;\n'
+        '$t1 (product-dimension: $r0, product-partition: $t0) '
+        'isa case-value, has dimension-value "Shoes \\"XL\\"";')
+    assert compiler.variables == {pp: '$t0', cv: '$t1'}
+
+
+def test_compile_skips_missing_attributes():
+    thing = Thing('Product', {'item-id': 'a', 'title': None})
+
+    assert InsertCompiler(DATA_TYPES.get).compile([[thing]]) == (
+        'insert\n$t0 isa Product, has item-id "a";')
+
+
+def test_compile_binds_dependent_records_by_id():
+    parent, child = partition(1), partition(2)
+    links = [
+        Thing(
+            'node-heirarchy', {},
+            [('parent-node', parent), ('child-node', child)],
+            anchor='child-node'),
+        Thing(
+            'ancestorship', {'depth': 1},
+            [('ancestor', parent), ('descedent', child)],
+            anchor='descedent')]
+    compiler = InsertCompiler(DATA_TYPES.get, {parent: 'V1', child: 'V2'})
+
+    assert dependent(links)
+    assert not dependent([parent])
+    assert compiler.compile([links]) == (
+        'match $r0 id V1; $r1 id V2;\n'
+        'insert\n'
+        '$t0 (parent-node: $r0, child-node: $r1) isa node-heirarchy;\n'
+        '$t1 (ancestor: $r0, descedent: $r1) isa ancestorship, has depth 1;')
+
+
+def test_compile_rejects_players_without_id():
+    parent, child = partition(1), partition(2)
+    relation = Thing(
+        'node-heirarchy', {},
+        [('parent-node', parent), ('child-node', child)])
+
+    with pytest.raises(ValueError):
+        InsertCompiler(DATA_TYPES.get, {child: 'V2'}).compile([[relation]])
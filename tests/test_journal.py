@@ -0,0 +1,81 @@
+import pytest
+
+from graql import Thing
+from journal import Journal
+from journal import resume_after
+from state import StateStore
+from sync import ADGROUP
+from writer import BatchConfig
+from writer import GraqlWriter
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = StateStore(str(tmp_path / 'state.db'))
+    yield store
+    store.close()
+
+
+def adgroup(adgroup_id):
+    return [Thing('AdGroup', {'adgroup-id': adgroup_id, 'status': 'Active'})]
+
+
+def test_rollback_deletes_the_pending_keys(server, store):
+    session = server.client().session('ks')
+    journal = Journal(store, 'ks', ADGROUP)
+    resume_after(journal, session)
+    journal.commit([adgroup(10)])
+    # committed to Grakn, the process died before journaling them
+    journal.pending([adgroup(9), adgroup(11)])
+
+    server.queries.clear()
+    resumed = Journal(store, 'ks', ADGROUP, resume=True)
+
+    assert resume_after(resumed, session) == [10]
+    assert server.queries == [
+        'match $x isa AdGroup, has adgroup-id 9; '
+        '$r ($x) isa product-offer; delete $r;',
+        'match $x isa AdGroup, has adgroup-id 9; delete $x;',
+        'match $x isa AdGroup, has adgroup-id 11; '
+        '$r ($x) isa product-offer; delete $r;',
+        'match $x isa AdGroup, has adgroup-id 11; delete $x;']
+    assert store.pending('ks', ADGROUP.label) == []
+
+
+def test_journaled_batches_are_not_rolled_back(server, store):
+    session = server.client().session('ks')
+    journal = Journal(store, 'ks', ADGROUP)
+    resume_after(journal, session)
+    with GraqlWriter(session, BatchConfig(2, 0), journal) as writer:
+        for adgroup_id in (1, 2, 3):
+            writer.add(adgroup(adgroup_id))
+
+    server.queries.clear()
+    resumed = Journal(store, 'ks', ADGROUP, resume=True)
+
+    assert resume_after(resumed, session) == [3]
+    assert resumed.rows == 3
+    assert not server.queries
+
+
+def test_resuming_with_other_shards_is_refused(server, store):
+    session = server.client().session('ks')
+    for shard in range(4):
+        journal = Journal(store, 'ks', ADGROUP).for_shard(shard, 4)
+        resume_after(journal, session)
+
+    resumed = Journal(store, 'ks', ADGROUP, resume=True)
+    assert resume_after(resumed.for_shard(1, 4), session) is None
+    with pytest.raises(ValueError):
+        resume_after(resumed.for_shard(1, 8), session)
+    with pytest.raises(ValueError):
+        resume_after(resumed, session)
+
+
+def test_starting_over_clears_the_shards(server, store):
+    for shard in range(4):
+        Journal(store, 'ks', ADGROUP).for_shard(shard, 4).start()
+
+    Journal(store, 'ks', ADGROUP)
+
+    assert store.scopes('ks', ADGROUP.label) == []
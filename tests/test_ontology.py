@@ -0,0 +1,41 @@
+import pytest
+
+import pooling
+from ontology import apply_schema
+
+
+@pytest.fixture
+def pool(server, monkeypatch):
+    monkeypatch.setattr(pooling, 'GraknClient', server.client)
+    pool = pooling.GraknPool()
+    monkeypatch.setattr(pooling, '_pool', pool)
+    yield pool
+    pool.close()
+
+
+def test_apply_undefines_optional_rules_not_asked_for(server, pool, tmp_path):
+    # a keyspace applied while the rules were part of the schema
+    server.define(
+        'infer-node-heirarchy sub rule;\n'
+        'transitive-ancestorship sub rule;\n'
+        'node-adjacency sub rule;')
+
+    apply_schema(
+        'ks', 'shopping', describe=False, snapshot_dir=str(tmp_path),
+        rules=['transitive-ancestorship'])
+
+    assert server.queries[-1] == (
+        'undefine\n\n'
+        'infer-node-heirarchy sub rule;\n'
+        'node-adjacency sub rule;\n')
+    assert server.types['transitive-ancestorship'] == 'rule'
+    assert 'node-adjacency' not in server.types
+
+
+def test_apply_keeps_the_rules_asked_for(server, pool, tmp_path):
+    apply_schema(
+        'ks', 'shopping', describe=False, snapshot_dir=str(tmp_path),
+        rules=['node-adjacency'])
+
+    assert not any(q.startswith('undefine') for q in server.queries)
+    assert server.types['node-adjacency'] == 'rule'
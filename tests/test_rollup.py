@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from models.compact_shopping_campaign import CompactShoppingCampaign
+from models.rollup import SubtreeRollup
+from models.shopping_campaign import ShoppingCampaign
+
+# root 1 -> 2 -> (4, 5), root 1 -> 3
+ROWS = [
+    {'id': 2, 'name': 'clothes', 'clicks': 1},
+    {'id': 3, 'name': 'toys', 'clicks': 10},
+    {'id': 4, 'name': 'shoes', 'parent': 2, 'clicks': 100},
+    {'id': 5, 'name': 'hats', 'parent': 2, 'clicks': 1000},
+]
+
+
+@pytest.fixture(params=[ShoppingCampaign, CompactShoppingCampaign])
+def campaign(request):
+    campaign = request.param()
+    assert campaign.create_nodes(ROWS).ok
+    return campaign
+
+
+def test_totals_sum_the_subtree(campaign):
+    rollup = SubtreeRollup(campaign)
+
+    assert len(rollup) == 5
+    # children before their parent
+    assert rollup.index[4] < rollup.index[2] < rollup.index[1]
+    assert rollup.total(2, 'clicks') == 1101
+    assert rollup.total(1, 'clicks') == 1111
+    assert rollup.total(3) == {
+        'clicks': 10, 'cost': 0, 'impressions': 0, 'conversions': 0}
+
+
+def test_update_matches_a_refresh(campaign):
+    rollup = SubtreeRollup(campaign)
+
+    rollup.update([4, 3], cost=[1.5, 2.0], clicks=[200, 20])
+    updated = rollup.totals.copy()
+    rollup.refresh()
+
+    np.testing.assert_allclose(updated, rollup.totals)
+    assert rollup.total(1, 'clicks') == 1221
+    assert rollup.total(2, 'cost') == 1.5
+    assert rollup.column('cost')[rollup.index[1]] == 3.5
+
+
+def test_load_sets_own_values(campaign):
+    rollup = SubtreeRollup(campaign)
+
+    rollup.load('impressions', [4, 5], [7, 8])
+
+    assert rollup.total(2, 'impressions') == 15
+    assert rollup.total(3, 'impressions') == 0
+
+
+def test_update_rejects_repeated_ids(campaign):
+    rollup = SubtreeRollup(campaign)
+
+    with pytest.raises(ValueError):
+        rollup.update([4, 4], cost=[1, 2])
@@ -0,0 +1,50 @@
+from models.shopping_campaign import ShoppingCampaign
+from models.shopping_campaign_node import ShoppingCampaignNode
+
+CATEGORY = ShoppingCampaignNode.NodeType.CATEGORY
+
+
+def test_build_nodes_adds_unordered_rows_parents_first():
+    campaign = ShoppingCampaign()
+    rows = [
+        {'id': 4, 'name': 'shoes', 'parent': 2},
+        {'id': 3, 'name': 'brand', 'parent': 2},
+        {'id': 2, 'name': 'clothes', 'node_type': CATEGORY},
+        {'id': 5, 'name': 'boots', 'parent': 4, 'node_type': CATEGORY},
+    ]
+
+    result = campaign.create_nodes(rows)
+
+    assert result.ok
+    assert result.created == [2, 4, 3, 5]
+    assert campaign.parent(5).identifier == 4
+    assert campaign.level(5) == 3
+    # categories above the node
+    assert campaign.get_category_level(5) == 1
+    assert campaign[5].name == 'boots'
+
+
+def test_build_nodes_reports_rows_it_cannot_place():
+    campaign = ShoppingCampaign()
+    rows = [
+        {'id': 2, 'name': 'placed'},
+        {'id': 3, 'name': 'orphan', 'parent': 9},
+        {'id': 4, 'name': 'below orphan', 'parent': 3},
+        {'id': 5, 'name': 'cycle', 'parent': 6},
+        {'id': 6, 'name': 'cycle', 'parent': 5},
+        {'id': 7, 'name': 'below cycle', 'parent': 6},
+        {'id': 2, 'name': 'duplicate'},
+        {'name': 'no id'},
+    ]
+
+    result = campaign.create_nodes(rows)
+
+    assert not result.ok
+    assert result.created == [2]
+    assert result.orphans == {3: 9}
+    assert [sorted(c) for c in result.cycles] == [[5, 6]]
+    assert sorted(result.detached) == [4, 7]
+    assert result.duplicates == [2]
+    assert result.malformed == [{'name': 'no id'}]
+    assert campaign[2].name == 'placed'
+    assert 3 not in campaign and 5 not in campaign
@@ -0,0 +1,42 @@
+from peewee import IntegerField
+from peewee import Model
+from peewee import SqliteDatabase
+
+from source import ReadConfig
+from source import id_chunks
+from source import stream_in
+
+db = SqliteDatabase(':memory:')
+
+
+class Partition(Model):
+    adgroup_id = IntegerField()
+    criterion_id = IntegerField()
+
+    class Meta:
+        database = db
+
+
+def setup_module():
+    db.connect()
+    db.create_tables([Partition])
+    Partition.insert_many(
+        [(a, c) for a in (1, 2, 3) for c in (10, 11, 12)],
+        fields=[Partition.adgroup_id, Partition.criterion_id]).execute()
+
+
+def teardown_module():
+    db.close()
+
+
+def test_id_chunks_keep_the_id_of_after():
+    assert id_chunks([4, 2, 3, 1, 3], 2, after=2) == [(2, 3), (4, )]
+
+
+def test_stream_in_continues_after_the_boundary_row():
+    keys = (Partition.adgroup_id, Partition.criterion_id)
+    read = ReadConfig(page_size=2, prefetch=0, id_chunk=1)
+    rows = stream_in(Partition.select(*keys), keys, [3, 2, 1], read, [2, 11])
+
+    assert [(r['adgroup_id'], r['criterion_id']) for r in rows] == [
+        (2, 12), (3, 10), (3, 11), (3, 12)]
@@ -0,0 +1,80 @@
+import pytest
+
+from models.compact_shopping_campaign import CompactShoppingCampaign
+from models.shopping_campaign import ShoppingCampaign
+from models.shopping_campaign_node import ShoppingCampaignNode
+from models.splitting import EVERYTHING_ELSE
+from models.splitting import split_leaves
+
+NodeType = ShoppingCampaignNode.NodeType
+
+
+def offer(category, brand, item_id):
+    return {'category': category, 'brand': brand, 'product': item_id}
+
+
+OFFERS = [
+    offer(['clothes', 'shoes'], 'acme', 'a'),
+    offer(['clothes', 'hats'], 'acme', 'b'),
+    offer(['clothes', 'shoes'], 'zeta', 'c'),
+    offer(['toys'], 'acme', 'd'),
+]
+
+
+@pytest.fixture(params=[ShoppingCampaign, CompactShoppingCampaign])
+def campaign(request):
+    campaign = request.param()
+    assert campaign.create_nodes([
+        {'id': 2, 'name': 'all', 'offers': OFFERS},
+        {'id': 3, 'name': 'few', 'offers': OFFERS[:1]}]).ok
+    return campaign
+
+
+def children(campaign, nid):
+    return [
+        (campaign[c].tag, campaign[c].node_type)
+        for c in campaign.is_branch(nid)]
+
+
+def test_leaves_above_the_threshold_are_split(campaign):
+    result = split_leaves(campaign, threshold=2)
+
+    assert result.split == {2: NodeType.CATEGORY}
+    assert result.unsplit == []
+    assert [row['name'] for row in result.created] == [
+        'clothes', 'toys', EVERYTHING_ELSE]
+    assert sorted(children(campaign, 2)) == [
+        (EVERYTHING_ELSE, NodeType.CATEGORY),
+        ('clothes', NodeType.CATEGORY),
+        ('toys', NodeType.CATEGORY)]
+    assert not campaign.is_branch(3)
+    assert [len(result.offers[row['id']]) for row in result.created] == [
+        3, 1, 0]
+
+
+def test_split_goes_one_category_level_deeper(campaign):
+    first = split_leaves(campaign, threshold=2)
+    clothes = first.created[0]['id']
+
+    second = split_leaves(campaign, first.offers, threshold=2)
+
+    assert second.split == {clothes: NodeType.CATEGORY}
+    assert [row['name'] for row in second.created] == [
+        'shoes', 'hats', EVERYTHING_ELSE]
+
+
+def test_max_children_leaves_the_rest_to_everything_else(campaign):
+    result = split_leaves(campaign, leaf_ids=[2], max_children=1)
+
+    assert [row['name'] for row in result.created] == [
+        'clothes', EVERYTHING_ELSE]
+    assert [len(result.offers[row['id']]) for row in result.created] == [
+        3, 1]
+
+
+def test_leaves_without_a_distinguishing_dimension_stay(campaign):
+    result = split_leaves(campaign, leaf_ids=[3])
+
+    assert result.unsplit == [3]
+    assert result.created == []
+    assert not campaign.is_branch(3)
@@ -0,0 +1,108 @@
+import pytest
+
+from graql import Thing
+from state import StateStore
+from sync import ADGROUP
+from sync import PRODUCT_PARTITION
+from sync import sync_records
+from writer import BatchConfig
+
+BATCH = BatchConfig(4, 0)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = StateStore(str(tmp_path / 'state.db'))
+    yield store
+    store.close()
+
+
+def adgroup(name):
+    return [Thing('AdGroup', {
+        'adgroup-id': 5, 'adgroup-name': name, 'status': 'Active'})]
+
+
+def partition(criterion_id, partition_type='Unit'):
+    return Thing(
+        'ProductPartition',
+        {'adgroup-id': 3, 'criterion-id': criterion_id,
+         'partition-type': partition_type},
+        key=PRODUCT_PARTITION.keys)
+
+
+def tree(changed=()):
+    """A parent with two children and their sibling-group."""
+    parent, a, b = [
+        partition(c, 'Changed' if c in changed else 'Unit')
+        for c in (1, 2, 3)]
+    group = Thing(
+        'sibling-group', {},
+        [('group-parent', parent), ('sibling', a), ('sibling', b)],
+        anchor='group-parent')
+    return [[parent], [a], [b], [group]]
+
+
+def sync(server, store, kind, records):
+    server.queries.clear()
+    session = server.client().session('ks')
+    return sync_records(session, store, 'ks', kind, records, BATCH)
+
+
+def test_unchanged_records_are_skipped(server, store):
+    first = sync(server, store, PRODUCT_PARTITION, tree())
+    again = sync(server, store, PRODUCT_PARTITION, tree())
+
+    assert (first.inserted, first.failed) == (4, 0)
+    assert (again.unchanged, again.updated) == (4, 0)
+    assert not server.queries
+
+
+def test_replacing_a_player_rewrites_its_relation_records(server, store):
+    sync(server, store, PRODUCT_PARTITION, tree())
+    # the unchanged players are looked up
+    server.found = True
+    stats = sync(server, store, PRODUCT_PARTITION, tree(changed=[3]))
+
+    # the child and the group of its parent, though the parent is the same
+    assert (stats.updated, stats.unchanged) == (2, 2)
+    assert (
+        'match $x isa ProductPartition, has adgroup-id 3, '
+        'has criterion-id 1; $r (group-parent: $x) isa sibling-group; '
+        'delete $r;') in server.queries
+    assert server.queries[-1].endswith('isa sibling-group;')
+
+
+def test_removed_records_are_deleted(server, store):
+    sync(server, store, PRODUCT_PARTITION, tree())
+    stats = sync(server, store, PRODUCT_PARTITION, tree()[:1])
+
+    assert stats.deleted == 3
+    assert (
+        'match $x isa ProductPartition, has adgroup-id 3, '
+        'has criterion-id 3; delete $x;') in server.queries
+
+
+def test_synced_adgroups_keep_their_offers(server, store):
+    sync(server, store, ADGROUP, [adgroup('Shoes')])
+    server.found = True
+    stats = sync(server, store, ADGROUP, [adgroup('Boots')])
+
+    match = 'match $x isa AdGroup, has adgroup-id 5;'
+    assert stats.updated == 1
+    assert server.queries == [
+        f'{match} get $x;',
+        f'{match} $x has adgroup-name $v via $h; delete $h;',
+        f'{match} $x has status $v via $h; delete $h;',
+        f'{match} insert $x has adgroup-name "Boots", has status "Active";',
+    ]
+
+
+def test_removed_adgroups_take_their_offers_along(server, store):
+    sync(server, store, ADGROUP, [adgroup('Shoes')])
+    sync(server, store, ADGROUP, [])
+
+    match = 'match $x isa AdGroup, has adgroup-id 5;'
+    assert server.queries == [
+        f'{match} $r ($x) isa product-offer; delete $r;',
+        f'{match} delete $x;',
+    ]
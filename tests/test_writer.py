@@ -0,0 +1,119 @@
+from graql import Thing
+from writer import BatchConfig
+from writer import BatchWriter
+from writer import GraqlWriter
+
+
+class RowWriter(BatchWriter):
+    """Writes nothing, fails batches with a `bad` row."""
+
+    def __init__(self, session, batch, bad=()):
+        super().__init__(session, batch)
+        self.bad = bad
+        self.written = []
+        self.settles = 0
+
+    def dependent(self, row):
+        return row.startswith('r')
+
+    def write_batch(self, tx, rows):
+        if any(row in self.bad for row in rows):
+            raise ValueError('bad row')
+
+    def committed(self, rows):
+        self.written.append(rows)
+
+    def settled(self):
+        self.settles += 1
+
+
+class FailingWriter(GraqlWriter):
+    """Fails the batches with the record of `broken`."""
+
+    def __init__(self, session, batch, broken):
+        super().__init__(session, batch)
+        self.broken = broken
+
+    def write_batch(self, tx, rows):
+        if any(self.broken in row for row in rows):
+            raise ValueError('broken')
+        return super().write_batch(tx, rows)
+
+
+def partition(criterion_id):
+    return Thing(
+        'ProductPartition',
+        {'adgroup-id': 3, 'criterion-id': criterion_id},
+        key=('adgroup-id', 'criterion-id'))
+
+
+def heirarchy(parent, child):
+    return [Thing(
+        'node-heirarchy', {},
+        [('parent-node', parent), ('child-node', child)],
+        anchor='child-node')]
+
+
+def test_failed_batches_are_bisected_to_the_bad_row(server):
+    session = server.client().session('ks')
+    with RowWriter(session, BatchConfig(4, 0), bad={'c'}) as writer:
+        for row in 'abcdefg':
+            writer.add(row)
+
+    assert writer.written == [['a', 'b'], ['d'], ['e', 'f', 'g']]
+    assert writer.stats.failed == ['c']
+    assert writer.stats.retries == 2
+    assert writer.stats.rows == 6
+
+
+def test_dependent_rows_follow_the_batch_before_them(server):
+    session = server.client().session('ks')
+    with RowWriter(session, BatchConfig(2, 0)) as writer:
+        for row in ['a', 'b', 'r1', 'c', 'r2', 'd']:
+            writer.add(row)
+
+    assert writer.written == [['a', 'b'], ['r1'], ['c', 'd'], ['r2']]
+    assert writer.settles == 2
+    assert (writer.stats.rows, writer.stats.dependent) == (4, 2)
+
+
+def test_dependent_records_bind_players_by_id(server):
+    session = server.client().session('ks')
+    parent, child = partition(1), partition(2)
+    with GraqlWriter(session, BatchConfig(2, 0)) as writer:
+        for record in [[parent], [child], heirarchy(parent, child)]:
+            writer.add(record)
+
+    ids = writer.ids.get(parent), writer.ids.get(child)
+    assert server.queries[-1] == (
+        f'match $r0 id {ids[0]}; $r1 id {ids[1]};\n'
+        'insert\n'
+        '$t0 (parent-node: $r0, child-node: $r1) isa node-heirarchy;')
+    assert not writer.stats.failed
+
+
+def test_records_of_failed_players_fail(server):
+    session = server.client().session('ks')
+    parent, child = partition(1), partition(2)
+    relation = heirarchy(parent, child)
+    with FailingWriter(session, BatchConfig(2, 0), broken=child) as writer:
+        for record in [[parent], [child], relation]:
+            writer.add(record)
+
+    assert writer.stats.failed == [[child], relation]
+    assert not any('get $x' in q for q in server.queries)
+
+
+def test_players_of_earlier_runs_are_looked_up(server):
+    session = server.client().session('ks')
+    parent, child = partition(1), partition(2)
+    relation = heirarchy(parent, child)
+    with GraqlWriter(session, BatchConfig(2, 0)) as writer:
+        writer.add([child])
+        writer.add(relation)
+
+    # the fake server finds nothing
+    assert server.queries[-1] == (
+        'match $x isa ProductPartition, has adgroup-id 3, '
+        'has criterion-id 1; get $x;')
+    assert writer.stats.failed == [relation]